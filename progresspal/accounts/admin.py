@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import CustomUser, LearningRecord, QuestionLog, QuizResult
+from .models import CustomUser, LearningRecord, QuestionLog, QuizResult, DailyLearningStats
 
 # 自訂使用者管理
 @admin.register(CustomUser)
@@ -33,3 +33,19 @@ class QuizResultAdmin(admin.ModelAdmin):
     list_filter = ('chapter_code',)
     search_fields = ('user__username',)
     readonly_fields = ('created_at',)
+
+# 每日學習統計（由紀錄寫入時累加或 rebuild_learning_rollups 重建，不手動編輯）
+@admin.register(DailyLearningStats)
+class DailyLearningStatsAdmin(admin.ModelAdmin):
+    list_display = ('user', 'date', 'chapter_code', 'study_minutes', 'questions',
+                    'high_engagement', 'low_engagement', 'quiz_count', 'quiz_average')
+    list_filter = ('date', 'chapter_code')
+    search_fields = ('user__username',)
+    date_hierarchy = 'date'
+    ordering = ('-date', 'user')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
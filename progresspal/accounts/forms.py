@@ -159,4 +159,20 @@ class AddMaterialForm(forms.Form):
             if cleaned_data.get('score') is None:
                 self.add_error('score', '測驗結果需要填寫分數')
 
-        return cleaned_data
\ No newline at end of file
+        return cleaned_data
+
+# 全班學習分析篩選表單
+class CohortFilterForm(forms.Form):
+    role = forms.ChoiceField(
+        choices=[('', '全部')] + CustomUser.ROLE_CHOICES,
+        required=False, label="身分別",
+        widget=forms.Select(attrs={'class': 'form-select'}),
+    )
+    grade = forms.CharField(
+        max_length=10, required=False, label="年級",
+        widget=forms.TextInput(attrs={'class': 'form-control'}),
+    )
+    days = forms.IntegerField(
+        min_value=1, max_value=365, initial=30, required=False, label="最近幾天",
+        widget=forms.NumberInput(attrs={'class': 'form-control'}),
+    )
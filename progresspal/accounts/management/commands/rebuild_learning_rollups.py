@@ -0,0 +1,35 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from accounts.models import CustomUser
+from accounts.services.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "由原始紀錄重建每日學習統計（DailyLearningStats），可定期執行以校正增量累加"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='只重建最近 N 天（含今天），預設全部')
+        parser.add_argument('--user', action='append', dest='usernames', metavar='USERNAME',
+                            help='只重建指定使用者（可重複）')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='串流讀取與寫入的批次大小')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['days'] is not None:
+            if options['days'] < 1:
+                raise CommandError("--days 必須 >= 1")
+            since = timezone.localdate() - timedelta(days=options['days'] - 1)
+
+        users = None
+        if options['usernames']:
+            users = list(CustomUser.objects.filter(username__in=options['usernames']))
+            missing = set(options['usernames']) - {u.username for u in users}
+            if missing:
+                raise CommandError(f"找不到使用者: {', '.join(sorted(missing))}")
+
+        total = rebuild_rollups(since=since, users=users, chunk_size=options['chunk_size'])
+        scope = f"{since} 之後" if since else "全部"
+        self.stdout.write(self.style.SUCCESS(f"已重建{scope}的每日學習統計，共 {total} 列"))
@@ -0,0 +1,25 @@
+# Generated by Django 3.2.25 on 2026-10-19 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_remove_quizresult_total_questions'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='learningrecord',
+            index=models.Index(fields=['user', 'start_time'], name='learning_user_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='questionlog',
+            index=models.Index(fields=['user', 'created_at'], name='question_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quizresult',
+            index=models.Index(fields=['user', 'created_at'], name='quiz_user_created_idx'),
+        ),
+    ]
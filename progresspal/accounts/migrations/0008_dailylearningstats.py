@@ -0,0 +1,105 @@
+# Generated by Django 3.2.25 on 2026-10-19 16:10
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import TruncDate
+import django.db.models.deletion
+
+
+# 建立資料表當時的情緒代碼（EmotionRecord.EMOTION_CHOICES），固定在這裡，之後修改模型不影響回填
+EMOTION_CODES = ('frustrated', 'confused', 'bored', 'engaged', 'surprised', 'happy')
+
+
+def backfill_rollups(apps, schema_editor):
+    """
+    以既有的學習、提問、測驗、情緒紀錄回填每日統計（學習歷程頁面只讀這張表）。
+    與 accounts.services.rollups.rebuild_rollups 相同的彙總，但只使用歷史模型，不隨服務程式碼變動。
+    """
+    DailyLearningStats = apps.get_model('accounts', 'DailyLearningStats')
+    LearningRecord = apps.get_model('accounts', 'LearningRecord')
+    QuestionLog = apps.get_model('accounts', 'QuestionLog')
+    QuizResult = apps.get_model('accounts', 'QuizResult')
+    EmotionRecord = apps.get_model('emotion', 'EmotionRecord')
+
+    stats = {}
+
+    def row(user_id, day, chapter_code):
+        key = (user_id, day, chapter_code or '')
+        if key not in stats:
+            stats[key] = DailyLearningStats(user_id=user_id, date=day, chapter_code=key[2])
+        return stats[key]
+
+    def aggregate(queryset, time_field, group, **aggregates):
+        return (
+            queryset.annotate(day=TruncDate(time_field))
+            .values('user_id', 'day', group)
+            .annotate(**aggregates)
+            .order_by()
+            .iterator(chunk_size=2000)
+        )
+
+    duration = ExpressionWrapper(F('end_time') - F('start_time'), output_field=models.DurationField())
+    for r in aggregate(LearningRecord.objects.filter(end_time__isnull=False), 'start_time', 'chapter_code',
+                       total=Sum(duration)):
+        row(r['user_id'], r['day'], r['chapter_code']).study_minutes = r['total'].total_seconds() / 60
+
+    for r in aggregate(QuestionLog.objects.all(), 'created_at', 'chapter_code',
+                       n=Count('id'), high=Count('id', filter=Q(engagement='high')),
+                       low=Count('id', filter=Q(engagement='low'))):
+        stat = row(r['user_id'], r['day'], r['chapter_code'])
+        stat.questions, stat.high_engagement, stat.low_engagement = r['n'], r['high'], r['low']
+
+    for r in aggregate(QuizResult.objects.all(), 'created_at', 'chapter_code', n=Count('id'), total=Sum('score')):
+        stat = row(r['user_id'], r['day'], r['chapter_code'])
+        stat.quiz_count, stat.quiz_score_sum = r['n'], r['total']
+
+    for r in aggregate(EmotionRecord.objects.filter(emotion__in=EMOTION_CODES), 'timestamp', 'emotion', n=Count('id')):
+        setattr(row(r['user_id'], r['day'], ''), f"emotion_{r['emotion']}", r['n'])
+
+    DailyLearningStats.objects.bulk_create(stats.values(), batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_user_time_indexes'),
+        ('emotion', '0004_emotionrecord_user_time_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyLearningStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('chapter_code', models.CharField(blank=True, default='', max_length=50)),
+                ('study_minutes', models.FloatField(default=0)),
+                ('questions', models.PositiveIntegerField(default=0)),
+                ('high_engagement', models.PositiveIntegerField(default=0)),
+                ('low_engagement', models.PositiveIntegerField(default=0)),
+                ('quiz_count', models.PositiveIntegerField(default=0)),
+                ('quiz_score_sum', models.PositiveIntegerField(default=0)),
+                ('emotion_frustrated', models.PositiveIntegerField(default=0)),
+                ('emotion_confused', models.PositiveIntegerField(default=0)),
+                ('emotion_bored', models.PositiveIntegerField(default=0)),
+                ('emotion_engaged', models.PositiveIntegerField(default=0)),
+                ('emotion_surprised', models.PositiveIntegerField(default=0)),
+                ('emotion_happy', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': '每日學習統計',
+                'verbose_name_plural': '每日學習統計',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='dailylearningstats',
+            index=models.Index(fields=['date'], name='daily_stats_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailylearningstats',
+            constraint=models.UniqueConstraint(fields=('user', 'date', 'chapter_code'), name='daily_stats_user_date_chapter'),
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -19,26 +19,27 @@ class CustomUser(AbstractUser):
     nickname = models.CharField(max_length=30, blank=True)
     email = models.EmailField(unique=True) 
 
+    EMOTION_MAP = {
+        "frustrated": "挫折",
+        "confused": "困惑",
+        "bored": "無聊",
+        "engaged": "投入",
+        "surprised": "驚訝",
+        "happy": "喜悅",
+    }
+
     def __str__(self):
         return f"{self.nickname} ({self.role})"
-    
-EMOTION_MAP = {
-    "frustrated": "挫折",
-    "confused": "困惑",
-    "bored": "無聊",
-    "engaged": "投入",
-    "surprised": "驚訝",
-    "happy": "喜悅",
-}
-
-@property
-def recent_emotion_history(self):
-    """
-    取得最近 6 筆情緒（由遠→近）並回傳中文清單
-    """
-    records = self.emotion_records.order_by('-timestamp')[:6]  # 最新6筆
-    records = reversed(records)  # 由遠到近
-    return [self.EMOTION_MAP.get(rec.emotion, "未知") for rec in records]
+
+    @property
+    def recent_emotion_history(self):
+        """
+        取得最近 6 筆情緒（由遠→近）並回傳中文清單；尚無紀錄時回傳 ["None"]
+        """
+        records = self.emotion_records.order_by('-timestamp')[:6]  # 最新6筆
+        records = reversed(records)  # 由遠到近
+        emotions = [self.EMOTION_MAP.get(rec.emotion, "未知") for rec in records]
+        return emotions or ["None"]
 
     
 # 學習紀錄
@@ -52,6 +53,12 @@ class LearningRecord(models.Model):
     start_time = models.DateTimeField(default=timezone.now)
     end_time = models.DateTimeField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            # 學習歷程依使用者篩選、依開始時間排序
+            models.Index(fields=['user', 'start_time'], name='learning_user_start_idx'),
+        ]
+
     @property
     def duration_minutes(self):
         """自動計算學習時長（分鐘）"""
@@ -76,6 +83,11 @@ class QuestionLog(models.Model):
     engagement = models.CharField(max_length=20, blank=True, null=True)  # 參與度，例如：high、low
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at'], name='question_user_created_idx'),
+        ]
+
     def __str__(self):
         return f"Q by {self.user.username} @ {self.unit_code or 'N/A'}"
 
@@ -94,6 +106,11 @@ class QuizResult(models.Model):
     score = models.IntegerField()  # 0~10 題得分
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at'], name='quiz_user_created_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.username} - {self.chapter_code}-{self.unit_code}: {self.score}分"
     
@@ -124,4 +141,48 @@ class QuizResultQuestion(models.Model):
     is_correct = models.BooleanField(verbose_name="是否正確")
 
     def __str__(self):
-        return f"{self.quiz_result.user.username} - Q{self.question.id} - {self.selected_answer}"
\ No newline at end of file
+        return f"{self.quiz_result.user.username} - Q{self.question.id} - {self.selected_answer}"
+
+# 每日學習統計（彙總表）
+class DailyLearningStats(models.Model):
+    """
+    每位使用者、每天、每章節的學習統計，由 accounts.services.rollups 在寫入紀錄時累加，
+    或以 manage.py rebuild_learning_rollups 從原始紀錄重建。
+    情緒紀錄沒有章節，記在 chapter_code = '' 的列。
+    """
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='daily_stats')
+    date = models.DateField()  # 當地日期（TIME_ZONE）
+    chapter_code = models.CharField(max_length=50, blank=True, default='')
+
+    study_minutes = models.FloatField(default=0)
+    questions = models.PositiveIntegerField(default=0)
+    high_engagement = models.PositiveIntegerField(default=0)
+    low_engagement = models.PositiveIntegerField(default=0)
+    quiz_count = models.PositiveIntegerField(default=0)
+    quiz_score_sum = models.PositiveIntegerField(default=0)  # 平均 = quiz_score_sum / quiz_count
+
+    # 情緒分布（欄位名稱為 emotion_ + EmotionRecord.emotion 代碼）
+    emotion_frustrated = models.PositiveIntegerField(default=0)
+    emotion_confused = models.PositiveIntegerField(default=0)
+    emotion_bored = models.PositiveIntegerField(default=0)
+    emotion_engaged = models.PositiveIntegerField(default=0)
+    emotion_surprised = models.PositiveIntegerField(default=0)
+    emotion_happy = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "每日學習統計"
+        verbose_name_plural = "每日學習統計"
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'date', 'chapter_code'], name='daily_stats_user_date_chapter'),
+        ]
+        indexes = [
+            # 全班依日期彙總
+            models.Index(fields=['date'], name='daily_stats_date_idx'),
+        ]
+
+    @property
+    def quiz_average(self):
+        return round(self.quiz_score_sum / self.quiz_count, 2) if self.quiz_count else None
+
+    def __str__(self):
+        return f"{self.user.username} - {self.date} {self.chapter_code or '全部'}"
@@ -0,0 +1,129 @@
+# accounts/services/cohort.py
+"""
+全班（多位學生）的學習分析
+
+所有數字都在資料庫彙總，結果以 iterator(chunk_size) 串流讀取；
+Python 端只保留要顯示的部分（每天一列、每單元前幾名、最難的幾題），記憶體不隨紀錄數成長。
+學生範圍以 CustomUser 的 queryset 傳入，查詢時為子查詢，不先載入 id 清單。
+"""
+from datetime import datetime, time
+
+from django.db.models import Count, ExpressionWrapper, F, FloatField, Q, Sum
+from django.db.models.functions import Trim
+from django.utils import timezone
+
+from accounts.models import CustomUser, DailyLearningStats, QuestionLog, QuizResultQuestion
+from accounts.services.rollups import EMOTION_FIELDS
+from learning.models import QuizQuestion
+
+CHUNK_SIZE = 2000
+TOP_QUESTIONS_PER_UNIT = 5
+HARDEST_LIMIT = 10
+MIN_ATTEMPTS = 5
+
+
+def get_cohort(role=None, grade=None):
+    """依身分、年級篩選學生（不含管理員）"""
+    users = CustomUser.objects.filter(is_superuser=False)
+    if role:
+        users = users.filter(role=role)
+    if grade:
+        users = users.filter(grade=grade)
+    return users
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def engagement_over_time(users, since=None, chunk_size=CHUNK_SIZE):
+    """每日全班統計（讀 DailyLearningStats）：活躍人數、學習分鐘、提問數、high 比例、情緒分布"""
+    stats = DailyLearningStats.objects.filter(user__in=users)
+    if since is not None:
+        stats = stats.filter(date__gte=since)
+    rows = (
+        stats.values("date")
+        .annotate(
+            students=Count("user", distinct=True),
+            minutes=Sum("study_minutes"),
+            questions=Sum("questions"),
+            high=Sum("high_engagement"),
+            low=Sum("low_engagement"),
+            **{field: Sum(field) for field in EMOTION_FIELDS.values()},
+        )
+        .order_by("date")
+    )
+    days = []
+    for row in rows.iterator(chunk_size=chunk_size):
+        rated = row["high"] + row["low"]
+        days.append({
+            "date": row["date"].isoformat(),
+            "students": row["students"],
+            "minutes": round(row["minutes"], 1),
+            "questions": row["questions"],
+            "high_ratio": round(row["high"] / rated, 2) if rated else None,
+            "emotions": {code: row[field] for code, field in EMOTION_FIELDS.items()},
+        })
+    return days
+
+
+def top_questions_per_unit(users, since=None, per_unit=TOP_QUESTIONS_PER_UNIT, chunk_size=CHUNK_SIZE):
+    """
+    各單元最常被問的問題（去除前後空白後完全相同視為同一題）。
+    資料庫依 (單元, 次數) 排序後串流，每個單元只保留前 per_unit 筆。
+    """
+    logs = QuestionLog.objects.filter(user__in=users)
+    if since is not None:
+        logs = logs.filter(created_at__gte=_day_start(since))
+    rows = (
+        logs.annotate(text=Trim("question"))
+        .values("unit_code", "text")
+        .annotate(count=Count("id"), students=Count("user", distinct=True))
+        .order_by("unit_code", "-count", "text")
+    )
+    units = {}
+    for row in rows.iterator(chunk_size=chunk_size):
+        top = units.setdefault(row["unit_code"] or "", [])
+        if len(top) < per_unit:
+            top.append({"question": row["text"], "count": row["count"], "students": row["students"]})
+    return units
+
+
+def hardest_questions(users, since=None, limit=HARDEST_LIMIT, min_attempts=MIN_ATTEMPTS, chunk_size=CHUNK_SIZE):
+    """答錯率最高的題目（作答次數至少 min_attempts），依 QuizResultQuestion 彙總"""
+    answers = QuizResultQuestion.objects.filter(quiz_result__user__in=users)
+    if since is not None:
+        answers = answers.filter(quiz_result__created_at__gte=_day_start(since))
+    rows = (
+        answers.values("question_id", "question__chapter__chapter_number", "question__difficulty")
+        .annotate(attempts=Count("id"), wrong=Count("id", filter=Q(is_correct=False)))
+        .filter(attempts__gte=min_attempts)
+        .annotate(error_rate=ExpressionWrapper(F("wrong") * 1.0 / F("attempts"), output_field=FloatField()))
+        .order_by("-error_rate", "-attempts", "question_id")[:limit]
+    )
+    hardest = [
+        {
+            "question_id": row["question_id"],
+            "chapter": row["question__chapter__chapter_number"],
+            "difficulty": row["question__difficulty"],
+            "attempts": row["attempts"],
+            "wrong": row["wrong"],
+            "error_rate": round(row["error_rate"], 2),
+        }
+        for row in rows.iterator(chunk_size=chunk_size)
+    ]
+    # 題目內容只讀取最後選出的幾題
+    texts = dict(QuizQuestion.objects.filter(id__in=[q["question_id"] for q in hardest]).values_list("id", "question"))
+    for item in hardest:
+        item["question"] = texts.get(item["question_id"], "")
+    return hardest
+
+
+def cohort_summary(users, since=None):
+    """全班分析頁面的資料（固定次數的查詢）"""
+    return {
+        "student_count": users.count(),
+        "days": engagement_over_time(users, since),
+        "top_questions": top_questions_per_unit(users, since),
+        "hardest_questions": hardest_questions(users, since),
+    }
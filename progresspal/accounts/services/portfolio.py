@@ -0,0 +1,163 @@
+# accounts/services/portfolio.py
+"""
+學習歷程頁面的資料
+
+- 圖表：讀取每日彙總表 DailyLearningStats（見 rollups.py），不掃描原始紀錄
+- 紀錄列表：keyset 分頁（依時間、id 由新到舊），每頁查詢一次並走 (user, 時間) 複合索引
+"""
+from datetime import datetime
+
+from django.db.models import F, Q, Sum
+
+from accounts.models import DailyLearningStats, LearningRecord, QuestionLog, QuizResult
+
+# 趨勢圖最多顯示最近幾天（有紀錄的日子）
+TREND_DAYS = 30
+
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def _ratio(numerator, denominator):
+    return round(numerator / denominator, 2)
+
+
+# ===================== Charts =====================
+
+def chapter_summary(user):
+    """各章節學習時間（分鐘）與提問平均參與度（high 的比例），回傳 (minutes, engagement) 兩個 dict"""
+    rows = (
+        DailyLearningStats.objects.filter(user=user)
+        .exclude(chapter_code="")
+        .values("chapter_code")
+        .annotate(minutes=Sum("study_minutes"), high=Sum("high_engagement"), low=Sum("low_engagement"))
+        .order_by("chapter_code")
+    )
+    minutes, engagement = {}, {}
+    for row in rows:
+        if row["minutes"]:
+            minutes[row["chapter_code"]] = round(row["minutes"], 1)
+        if row["high"] + row["low"]:
+            engagement[row["chapter_code"]] = _ratio(row["high"], row["high"] + row["low"])
+    return minutes, engagement
+
+
+def _daily_trend(user, numerator, denominator, days=TREND_DAYS):
+    """依日期彙總 numerator / denominator，回傳最近 days 天 (labels, values)，由舊到新"""
+    rows = list(
+        DailyLearningStats.objects.filter(user=user)
+        .values("date")
+        .annotate(num=Sum(numerator), den=Sum(denominator))
+        .filter(den__gt=0)
+        .order_by("-date")[:days]
+    )
+    rows.reverse()
+    return [row["date"].isoformat() for row in rows], [_ratio(row["num"], row["den"]) for row in rows]
+
+
+def engagement_trend(user, days=TREND_DAYS):
+    # 分母為有參與度的提問數（high + low）
+    return _daily_trend(user, "high_engagement", F("high_engagement") + F("low_engagement"), days)
+
+
+def quiz_trend(user, days=TREND_DAYS):
+    return _daily_trend(user, "quiz_score_sum", "quiz_count", days)
+
+
+def portfolio_summary(user):
+    """學習歷程頁面圖表資料（固定 4 次彙總查詢）"""
+    minutes, engagement = chapter_summary(user)
+    engagement_labels, engagement_values = engagement_trend(user)
+    quiz_labels, quiz_scores = quiz_trend(user)
+    counts = DailyLearningStats.objects.filter(user=user).aggregate(
+        questions=Sum("questions"), high=Sum("high_engagement"))
+    return {
+        "chapter_labels": list(minutes),
+        "chapter_times": list(minutes.values()),
+        "engagement_labels": engagement_labels,
+        "engagement_values": engagement_values,
+        # 同時有學習時間與參與度的章節
+        "scatter_data": [
+            {"x": minutes[chapter], "y": engagement[chapter], "label": chapter}
+            for chapter in minutes if chapter in engagement
+        ],
+        "quiz_labels": quiz_labels,
+        "quiz_scores": quiz_scores,
+        "question_count": counts["questions"] or 0,
+        "high_engagement_count": counts["high"] or 0,
+    }
+
+
+# ===================== Logs =====================
+
+def _question_row(log):
+    return {
+        "chapter_code": log.chapter_code,
+        "unit_code": log.unit_code,
+        "question": log.question,
+        "answer": log.answer,
+        "engagement": log.engagement,
+        "created_at": log.created_at.isoformat(),
+    }
+
+
+def _learning_row(record):
+    return {
+        "chapter_code": record.chapter_code,
+        "unit_code": record.unit_code,
+        "start_time": record.start_time.isoformat(),
+        "end_time": record.end_time.isoformat() if record.end_time else None,
+        "duration_minutes": record.duration_minutes,
+    }
+
+
+def _quiz_row(result):
+    return {
+        "chapter_code": result.chapter_code,
+        "score": result.score,
+        "created_at": result.created_at.isoformat(),
+    }
+
+
+# 紀錄種類 -> (model, 排序的時間欄位, 轉成 dict)
+LOG_KINDS = {
+    "questions": (QuestionLog, "created_at", _question_row),
+    "learning": (LearningRecord, "start_time", _learning_row),
+    "quizzes": (QuizResult, "created_at", _quiz_row),
+}
+
+
+def encode_cursor(timestamp, pk):
+    return f"{timestamp.isoformat()}_{pk}"
+
+
+def decode_cursor(cursor):
+    """cursor 格式錯誤時拋出 ValueError"""
+    timestamp, _, pk = cursor.rpartition("_")
+    return datetime.fromisoformat(timestamp), int(pk)
+
+
+def get_log_page(user, kind, cursor=None, limit=PAGE_SIZE):
+    """
+    回傳 {"results": [...], "next": cursor 或 None}，由新到舊。
+    cursor 為上一頁最後一筆的 (時間, id)，下一頁從它之後開始；kind 或 cursor 不合法時拋出 ValueError。
+    """
+    if kind not in LOG_KINDS:
+        raise ValueError(f"未知紀錄種類: {kind}")
+    model, time_field, to_row = LOG_KINDS[kind]
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    queryset = model.objects.filter(user=user)
+    if cursor:
+        timestamp, pk = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(**{f"{time_field}__lt": timestamp}) | Q(**{time_field: timestamp, "pk__lt": pk})
+        )
+    # 多取一筆判斷是否還有下一頁
+    items = list(queryset.order_by(f"-{time_field}", "-pk")[:limit + 1])
+    has_next = len(items) > limit
+    items = items[:limit]
+    return {
+        "results": [to_row(item) for item in items],
+        "next": encode_cursor(getattr(items[-1], time_field), items[-1].pk) if has_next else None,
+    }
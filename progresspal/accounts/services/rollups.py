@@ -0,0 +1,142 @@
+# accounts/services/rollups.py
+"""
+每日學習統計（DailyLearningStats）的維護
+
+- 增量：寫入學習、提問、測驗、情緒紀錄時呼叫 record_*，以 F() 累加對應的 (使用者, 日期, 章節) 列
+- 重建：rebuild_rollups 以 SQL 彙總原始紀錄後整段取代（manage.py rebuild_learning_rollups，可定期執行）
+  migration 0008 內有建立資料表當時的一份彙總邏輯，用來回填既有紀錄，修改這裡不影響該 migration
+
+日期一律取紀錄開始時間的當地日期（TIME_ZONE），與 TruncDate 相同。
+"""
+from collections import Counter, defaultdict
+from datetime import datetime, time
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from accounts.models import DailyLearningStats, LearningRecord, QuestionLog, QuizResult
+from emotion.models import EmotionRecord
+
+# EmotionRecord.emotion 代碼 -> DailyLearningStats 欄位
+EMOTION_FIELDS = {code: f"emotion_{code}" for code, _ in EmotionRecord.EMOTION_CHOICES}
+
+
+def _bump(user_id, day, chapter_code, **increments):
+    """累加一列的計數；列不存在時建立（同時建立的競爭以唯一限制處理）"""
+    increments = {field: value for field, value in increments.items() if value}
+    if not increments:
+        return
+    key = {"user_id": user_id, "date": day, "chapter_code": chapter_code or ""}
+    updates = {field: F(field) + value for field, value in increments.items()}
+    # 大多數情況列已存在，只需一次 UPDATE
+    if DailyLearningStats.objects.filter(**key).update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            DailyLearningStats.objects.create(**key, **increments)
+    except IntegrityError:
+        # 其他請求剛建立了同一列
+        DailyLearningStats.objects.filter(**key).update(**updates)
+
+
+# ===================== Incremental =====================
+
+def record_study(record):
+    """學習紀錄結束（end_time 由 NULL 變為有值）時呼叫，每筆紀錄只能呼叫一次"""
+    if record.end_time is None:
+        return
+    minutes = (record.end_time - record.start_time).total_seconds() / 60
+    _bump(record.user_id, timezone.localdate(record.start_time), record.chapter_code, study_minutes=minutes)
+
+
+def record_question(log):
+    _bump(
+        log.user_id, timezone.localdate(log.created_at), log.chapter_code,
+        questions=1,
+        high_engagement=int(log.engagement == "high"),
+        low_engagement=int(log.engagement == "low"),
+    )
+
+
+def record_quiz(result):
+    _bump(result.user_id, timezone.localdate(result.created_at), result.chapter_code,
+          quiz_count=1, quiz_score_sum=result.score)
+
+
+def record_emotions(records):
+    """EmotionRecord 批次寫入後呼叫；每個 (使用者, 日期) 一次更新"""
+    counts = defaultdict(Counter)
+    for record in records:
+        if record.emotion in EMOTION_FIELDS:
+            counts[(record.user_id, timezone.localdate(record.timestamp))][EMOTION_FIELDS[record.emotion]] += 1
+    for (user_id, day), fields in counts.items():
+        _bump(user_id, day, "", **fields)
+
+
+# ===================== Rebuild =====================
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _aggregate(queryset, time_field, group, since, chunk_size, **aggregates):
+    """依 (使用者, 當地日期, group) 彙總，串流讀取結果"""
+    if since is not None:
+        queryset = queryset.filter(**{f"{time_field}__gte": _day_start(since)})
+    rows = (
+        queryset.annotate(day=TruncDate(time_field))
+        .values("user_id", "day", group)
+        .annotate(**aggregates)
+        .order_by()
+    )
+    return rows.iterator(chunk_size=chunk_size)
+
+
+def rebuild_rollups(since=None, users=None, chunk_size=2000):
+    """
+    由原始紀錄重建 since（date，含）之後的統計；since 為 None 時重建全部。
+    users 指定時只重建這些使用者。回傳寫入的列數。
+    """
+    def scoped(model):
+        queryset = model.objects.all()
+        return queryset if users is None else queryset.filter(user__in=users)
+
+    stats = {}
+
+    def row(user_id, day, chapter_code):
+        key = (user_id, day, chapter_code or "")
+        if key not in stats:
+            stats[key] = DailyLearningStats(user_id=user_id, date=day, chapter_code=key[2])
+        return stats[key]
+
+    duration = ExpressionWrapper(F("end_time") - F("start_time"), output_field=DurationField())
+    for r in _aggregate(scoped(LearningRecord).filter(end_time__isnull=False), "start_time", "chapter_code",
+                        since, chunk_size, total=Sum(duration)):
+        row(r["user_id"], r["day"], r["chapter_code"]).study_minutes = r["total"].total_seconds() / 60
+
+    for r in _aggregate(scoped(QuestionLog), "created_at", "chapter_code", since, chunk_size,
+                        n=Count("id"), high=Count("id", filter=Q(engagement="high")),
+                        low=Count("id", filter=Q(engagement="low"))):
+        stat = row(r["user_id"], r["day"], r["chapter_code"])
+        stat.questions, stat.high_engagement, stat.low_engagement = r["n"], r["high"], r["low"]
+
+    for r in _aggregate(scoped(QuizResult), "created_at", "chapter_code", since, chunk_size,
+                        n=Count("id"), total=Sum("score")):
+        stat = row(r["user_id"], r["day"], r["chapter_code"])
+        stat.quiz_count, stat.quiz_score_sum = r["n"], r["total"]
+
+    for r in _aggregate(scoped(EmotionRecord), "timestamp", "emotion", since, chunk_size, n=Count("id")):
+        if r["emotion"] in EMOTION_FIELDS:
+            setattr(row(r["user_id"], r["day"], ""), EMOTION_FIELDS[r["emotion"]], r["n"])
+
+    existing = DailyLearningStats.objects.all()
+    if since is not None:
+        existing = existing.filter(date__gte=since)
+    if users is not None:
+        existing = existing.filter(user__in=users)
+    with transaction.atomic():
+        existing.delete()
+        DailyLearningStats.objects.bulk_create(stats.values(), batch_size=chunk_size)
+    return len(stats)
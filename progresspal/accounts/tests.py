@@ -1,3 +1,246 @@
-from django.test import TestCase
+import importlib
+import json
+from datetime import datetime, timedelta
+from io import StringIO
+from unittest import skipUnless
+from django.apps import apps
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from emotion.models import EmotionRecord
+from learning.models import Chapter, QuizQuestion
+from learning.views import end_study
+from .models import CustomUser, LearningRecord, QuestionLog, QuizResult, QuizResultQuestion, DailyLearningStats
+from .services import cohort, portfolio, rollups
 
-# Create your tests here.
+
+@skipUnless(connection.vendor == 'sqlite', "查詢計畫格式依資料庫而異")
+class TestUserTimeIndexes(TestCase):
+    """各使用者依時間排序的查詢要走複合索引，不需要額外排序"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='plan_user', email='plan@example.com', password='pw123456')
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan)
+        self.assertNotIn('TEMP B-TREE', plan)  # 沒有為 ORDER BY 另外排序
+
+    def test_recent_emotion_history(self):
+        self.assertUsesIndex(self.user.emotion_records.order_by('-timestamp')[:6], 'emotion_user_time_idx')
+        self.assertUsesIndex(EmotionRecord.objects.filter(user=self.user).order_by('timestamp'), 'emotion_user_time_idx')
+
+    def test_learning_portfolio(self):
+        self.assertUsesIndex(
+            LearningRecord.objects.filter(user=self.user).order_by('-start_time'), 'learning_user_start_idx')
+        self.assertUsesIndex(
+            QuestionLog.objects.filter(user=self.user).order_by('-created_at'), 'question_user_created_idx')
+        self.assertUsesIndex(
+            QuizResult.objects.filter(user=self.user).order_by('-created_at'), 'quiz_user_created_idx')
+
+
+class TestLearningPortfolio(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='folio', email='folio@example.com', password='pw123456')
+        self.other = CustomUser.objects.create_user(username='other', email='other@example.com', password='pw123456')
+        now = timezone.make_aware(datetime(2025, 1, 10, 12, 0))  # 固定在中午，趨勢依日期分組不受執行時間影響
+        for chapter, minutes in (('CH1', 30), ('CH1', 15), ('CH2', 60)):
+            LearningRecord.objects.create(user=self.user, chapter_code=chapter, start_time=now,
+                                          end_time=now + timedelta(minutes=minutes))
+        LearningRecord.objects.create(user=self.user, chapter_code='CH3', start_time=now)  # 尚未結束不計
+        for i, (chapter, engagement) in enumerate([('CH1', 'high'), ('CH1', 'low'), ('CH2', 'high')] * 9):
+            log = QuestionLog.objects.create(user=self.user, chapter_code=chapter, question=f'Q{i}',
+                                             answer='A', engagement=engagement)
+            # 每三筆同一時間，測試 keyset 分頁的 id 排序
+            QuestionLog.objects.filter(pk=log.pk).update(created_at=now - timedelta(days=2, minutes=i // 3))
+        for days, score in ((1, 6), (1, 8), (0, 10)):
+            quiz = QuizResult.objects.create(user=self.user, chapter_code='CH1', score=score)
+            QuizResult.objects.filter(pk=quiz.pk).update(created_at=now - timedelta(days=days))
+        rollups.rebuild_rollups()
+
+    def test_summary(self):
+        with self.assertNumQueries(4):
+            summary = portfolio.portfolio_summary(self.user)
+        self.assertEqual(summary['chapter_labels'], ['CH1', 'CH2'])
+        self.assertEqual(summary['chapter_times'], [45.0, 60.0])
+        self.assertEqual(summary['scatter_data'], [
+            {'x': 45.0, 'y': 0.5, 'label': 'CH1'}, {'x': 60.0, 'y': 1.0, 'label': 'CH2'},
+        ])
+        self.assertEqual(summary['engagement_values'], [0.67])
+        self.assertEqual(summary['quiz_scores'], [7.0, 10.0])
+        self.assertEqual(summary['question_count'], 27)
+        self.assertEqual(portfolio.portfolio_summary(self.other)['chapter_labels'], [])
+
+    def test_keyset_pages_cover_all_logs(self):
+        seen, cursor = [], None
+        while True:
+            with self.assertNumQueries(1):
+                page = portfolio.get_log_page(self.user, 'questions', cursor=cursor, limit=4)
+            seen += [row['question'] for row in page['results']]
+            cursor = page['next']
+            if cursor is None:
+                break
+        self.assertEqual(len(seen), 27)
+        self.assertEqual(set(seen), {f'Q{i}' for i in range(27)})
+        with self.assertRaises(ValueError):
+            portfolio.get_log_page(self.user, 'questions', cursor='bad')
+
+    def test_views(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('learning-portfolio-self'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'Q0')  # 紀錄不在頁面中，由 API 載入
+
+        response = self.client.get(reverse('portfolio-logs', args=['quizzes']), {'limit': 2})
+        self.assertEqual([row['score'] for row in response.json()['results']], [10, 8])
+        self.assertIsNotNone(response.json()['next'])
+        self.assertEqual(self.client.get(reverse('portfolio-logs', args=['unknown'])).status_code, 400)
+
+        self.client.force_login(self.other)
+        response = self.client.get(reverse('portfolio-logs', args=['questions']), {'username': 'folio'})
+        self.assertEqual(response.status_code, 403)
+
+
+class TestDailyRollups(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='rollup', email='rollup@example.com', password='pw123456')
+
+    def snapshot(self):
+        fields = [f.name for f in DailyLearningStats._meta.fields if f.name != 'id']
+        return sorted(DailyLearningStats.objects.values_list(*fields))
+
+    def test_incremental_matches_rebuild(self):
+        now = timezone.now()
+        for minutes in (20, 40):
+            record = LearningRecord.objects.create(user=self.user, chapter_code='CH1', start_time=now,
+                                                   end_time=now + timedelta(minutes=minutes))
+            rollups.record_study(record)
+        for chapter, engagement in (('CH1', 'high'), ('CH1', 'low'), ('CH2', 'high'), ('CH2', None)):
+            rollups.record_question(QuestionLog.objects.create(
+                user=self.user, chapter_code=chapter, question='Q', engagement=engagement))
+        for score in (7, 9):
+            rollups.record_quiz(QuizResult.objects.create(user=self.user, chapter_code='CH2', score=score))
+        records = EmotionRecord.objects.bulk_create([
+            EmotionRecord(user=self.user, emotion=code, timestamp=now)
+            for code in ('happy', 'happy', 'bored', 'confused')
+        ])
+        rollups.record_emotions(records)
+
+        incremental = self.snapshot()
+        ch1 = DailyLearningStats.objects.get(user=self.user, chapter_code='CH1')
+        self.assertEqual((ch1.study_minutes, ch1.questions, ch1.high_engagement, ch1.low_engagement), (60, 2, 1, 1))
+        self.assertEqual(DailyLearningStats.objects.get(user=self.user, chapter_code='CH2').quiz_average, 8)
+        overall = DailyLearningStats.objects.get(user=self.user, chapter_code='')
+        self.assertEqual((overall.emotion_happy, overall.emotion_bored, overall.emotion_confused), (2, 1, 1))
+
+        rollups.rebuild_rollups()
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_end_study_counts_once(self):
+        record = LearningRecord.objects.create(user=self.user, chapter_code='CH1',
+                                               start_time=timezone.now() - timedelta(minutes=30))
+        request = RequestFactory().post('/lesson/end/', json.dumps({'id': record.id}), content_type='application/json')
+        for _ in range(3):  # 重複送出只算第一次
+            self.assertEqual(end_study(request).status_code, 200)
+        record.refresh_from_db()
+        self.assertIsNotNone(record.end_time)
+        minutes = DailyLearningStats.objects.get(user=self.user, chapter_code='CH1').study_minutes
+        self.assertAlmostEqual(minutes, (record.end_time - record.start_time).total_seconds() / 60)
+
+    def test_migration_backfills_existing_records(self):
+        migration = importlib.import_module('accounts.migrations.0008_dailylearningstats')
+        now = timezone.now()
+        LearningRecord.objects.create(user=self.user, chapter_code='CH1', start_time=now,
+                                      end_time=now + timedelta(minutes=25))
+        QuestionLog.objects.create(user=self.user, chapter_code='CH1', question='Q', engagement='high')
+        QuizResult.objects.create(user=self.user, chapter_code='CH1', score=6)
+        EmotionRecord.objects.bulk_create([EmotionRecord(user=self.user, emotion=code, timestamp=now)
+                                           for code in ('happy', 'bored', 'happy')])
+
+        migration.backfill_rollups(apps, None)
+
+        stat = DailyLearningStats.objects.get(user=self.user, chapter_code='CH1')
+        self.assertEqual((stat.study_minutes, stat.questions, stat.high_engagement, stat.quiz_score_sum), (25, 1, 1, 6))
+        backfilled = self.snapshot()
+        rollups.rebuild_rollups()
+        self.assertEqual(self.snapshot(), backfilled)  # 與目前的重建邏輯結果相同
+
+    def test_command_rebuilds_recent_days(self):
+        old = timezone.now() - timedelta(days=10)
+        log = QuestionLog.objects.create(user=self.user, chapter_code='CH1', question='Q', engagement='high')
+        QuestionLog.objects.filter(pk=log.pk).update(created_at=old)
+        QuestionLog.objects.create(user=self.user, chapter_code='CH1', question='Q', engagement='low')
+
+        call_command('rebuild_learning_rollups', '--days', '1', stdout=StringIO())
+        self.assertEqual(list(DailyLearningStats.objects.values_list('date', 'low_engagement')),
+                         [(timezone.localdate(), 1)])
+        call_command('rebuild_learning_rollups', stdout=StringIO())
+        self.assertEqual(DailyLearningStats.objects.count(), 2)
+
+
+class TestCohortAnalytics(TestCase):
+
+    def setUp(self):
+        self.students = [
+            CustomUser.objects.create_user(username=f's{i}', email=f's{i}@example.com', password='pw123456',
+                                           role='mis_student' if i < 3 else 'normal_student')
+            for i in range(4)
+        ]
+        self.admin = CustomUser.objects.create_superuser(username='teacher', email='t@example.com', password='pw123456')
+        chapter = Chapter.objects.create(chapter_number=1, title="陣列(Array)")
+        self.questions = [
+            QuizQuestion.objects.create(chapter=chapter, difficulty=difficulty, question=f"{difficulty}-q",
+                                        option_a="a", option_b="b", option_c="c", option_d="d",
+                                        answer="A", explanation="")
+            for difficulty in ('easy', 'hard')
+        ]
+        for i, student in enumerate(self.students):
+            for text in (' 什麼是陣列？', '什麼是陣列？ ', f'問題{i}'):
+                rollups.record_question(QuestionLog.objects.create(
+                    user=student, unit_code='CH1-U1', question=text, engagement='high' if i % 2 else 'low'))
+            result = QuizResult.objects.create(user=student, chapter_code='1', score=1)
+            QuizResultQuestion.objects.bulk_create([
+                QuizResultQuestion(quiz_result=result, question=self.questions[0], selected_answer='A', is_correct=True),
+                QuizResultQuestion(quiz_result=result, question=self.questions[1], selected_answer='B',
+                                   is_correct=i == 0),
+            ])
+
+    def test_summary(self):
+        users = cohort.get_cohort()
+        with CaptureQueriesContext(connection) as queries:
+            summary = cohort.cohort_summary(users, since=timezone.localdate())
+        self.assertLessEqual(len(queries), 5)  # 查詢次數固定，與紀錄數無關
+        self.assertEqual(summary['student_count'], 4)
+        [day] = summary['days']
+        self.assertEqual((day['students'], day['questions'], day['high_ratio']), (4, 12, 0.5))
+
+        top = summary['top_questions']['CH1-U1']
+        self.assertEqual(top[0], {'question': '什麼是陣列？', 'count': 8, 'students': 4})
+        self.assertEqual(len(top), cohort.TOP_QUESTIONS_PER_UNIT)
+
+        self.assertEqual(cohort.hardest_questions(users, min_attempts=4), [
+            {'question_id': self.questions[1].id, 'chapter': 1, 'difficulty': 'hard', 'attempts': 4, 'wrong': 3,
+             'error_rate': 0.75, 'question': 'hard-q'},
+            {'question_id': self.questions[0].id, 'chapter': 1, 'difficulty': 'easy', 'attempts': 4, 'wrong': 0,
+             'error_rate': 0.0, 'question': 'easy-q'},
+        ])
+        self.assertEqual(cohort.hardest_questions(users, min_attempts=5), [])
+
+    def test_role_filter(self):
+        users = cohort.get_cohort(role='normal_student')
+        self.assertEqual(cohort.engagement_over_time(users)[0]['students'], 1)
+        self.assertEqual(cohort.hardest_questions(users, min_attempts=1)[0]['wrong'], 1)
+
+    def test_view_requires_superuser(self):
+        self.client.force_login(self.students[0])
+        self.assertEqual(self.client.get(reverse('cohort-analytics')).status_code, 302)
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('cohort-analytics'), {'role': 'mis_student', 'days': 7})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['student_count'], 3)
+        self.assertContains(response, '什麼是陣列？')
@@ -4,11 +4,12 @@ from django.contrib.auth import login, authenticate, logout, get_user_model, upd
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.decorators import user_passes_test
 from django.contrib import messages
-from django.db.models import Sum, F, ExpressionWrapper, DurationField
+from django.http import JsonResponse
 from .models import LearningRecord, QuestionLog, QuizResult
 from accounts.models import CustomUser
 from django.utils import timezone
-from .forms import RegisterForm, LoginForm, ProfileUpdateForm, PasswordChangeForm, AddMaterialForm
+from .services import cohort, portfolio, rollups
+from .forms import RegisterForm, LoginForm, ProfileUpdateForm, PasswordChangeForm, AddMaterialForm, CohortFilterForm
 import json
 
 User = get_user_model()
@@ -125,6 +126,7 @@ def learning_portfolio(request, username=None):
     學習歷程頁面：
     - 若未傳入 username → 顯示自己的學習歷程。
     - 若傳入 username → 僅 superuser 可查看他人。
+    圖表資料在資料庫彙總；紀錄列表由前端向 portfolio_logs 分頁取得。
     """
     # 判斷目標使用者
     if username:
@@ -136,27 +138,63 @@ def learning_portfolio(request, username=None):
     else:
         target_user = request.user
 
-    # 取得該使用者的紀錄
-    learning_records = LearningRecord.objects.filter(user=target_user).order_by('-start_time')
-    question_logs = QuestionLog.objects.filter(user=target_user).order_by('-created_at')
-    quiz_results = QuizResult.objects.filter(user=target_user).order_by('-created_at')
-
-    # 統計章節與單元學習時間
-    chapter_data = (
-        learning_records.values('chapter_code')
-        .annotate(total_time=Sum('end_time') - Sum('start_time'))
-    )
-
+    summary = portfolio.portfolio_summary(target_user)
     context = {
         'target_user': target_user,
-        'learning_records': learning_records,
-        'question_logs': question_logs,
-        'quiz_results': quiz_results,
+        'question_count': summary['question_count'],
+        'high_engagement_count': summary['high_engagement_count'],
     }
+    # 圖表資料轉成 JSON 字串給模板
+    for key in ('chapter_labels', 'chapter_times', 'engagement_labels', 'engagement_values',
+                'scatter_data', 'quiz_labels', 'quiz_scores'):
+        context[key] = json.dumps(summary[key], ensure_ascii=False)
 
     return render(request, 'accounts/learning-portfolio.html', context)
 
 
+@login_required(login_url='login')
+def portfolio_logs(request, kind):
+    """
+    學習歷程紀錄（JSON，keyset 分頁）
+    GET 參數：cursor（上一頁回傳的 next）、limit、username（僅 superuser 可查看他人）
+    """
+    username = request.GET.get('username')
+    if username and username != request.user.username:
+        if not request.user.is_superuser:
+            return JsonResponse({"error": "Permission denied"}, status=403)
+        target_user = get_object_or_404(CustomUser, username=username)
+    else:
+        target_user = request.user
+
+    try:
+        limit = int(request.GET.get('limit', portfolio.PAGE_SIZE))
+        page = portfolio.get_log_page(target_user, kind, cursor=request.GET.get('cursor'), limit=limit)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    return JsonResponse(page)
+
+
+# 全班學習分析（僅 superuser 可用）
+@user_passes_test(lambda u: u.is_superuser)
+def cohort_analytics(request):
+    """全班參與度趨勢、各單元常見提問、最難的測驗題目"""
+    form = CohortFilterForm(request.GET or None)
+    filters = form.cleaned_data if form.is_valid() else {}
+    days = filters.get('days') or 30
+    since = timezone.localdate() - timezone.timedelta(days=days - 1)
+
+    users = cohort.get_cohort(role=filters.get('role'), grade=filters.get('grade'))
+    summary = cohort.cohort_summary(users, since=since)
+    return render(request, 'accounts/cohort-analytics.html', {
+        'form': form if form.is_bound else CohortFilterForm(initial={'days': days}),
+        'since': since,
+        'student_count': summary['student_count'],
+        'top_questions': summary['top_questions'],
+        'hardest_questions': summary['hardest_questions'],
+        'days_json': json.dumps(summary['days'], ensure_ascii=False),
+    })
+
+
 # 新增假資料頁面（僅 superuser 可用）
 @user_passes_test(lambda u: u.is_superuser)
 def add_material(request):
@@ -170,17 +208,18 @@ def add_material(request):
             unit_code = form.cleaned_data['unit_code']
 
             if data_type == 'learning':
-                LearningRecord.objects.create(
+                record = LearningRecord.objects.create(
                     user=user,
                     chapter_code=chapter_code,
                     unit_code=unit_code,
                     start_time=timezone.now(),
                     end_time=timezone.now() + timezone.timedelta(minutes=30),
                 )
+                rollups.record_study(record)
                 messages.success(request, f"成功新增學習紀錄給 {user.username}")
 
             elif data_type == 'question':
-                QuestionLog.objects.create(
+                log = QuestionLog.objects.create(
                     user=user,
                     chapter_code=chapter_code,
                     unit_code=unit_code,
@@ -188,15 +227,17 @@ def add_material(request):
                     answer=form.cleaned_data['answer'],
                     engagement=form.cleaned_data['engagement'],
                 )
+                rollups.record_question(log)
                 messages.success(request, f"成功新增提問紀錄給 {user.username}")
 
             elif data_type == 'quiz':
-                QuizResult.objects.create(
+                result = QuizResult.objects.create(
                     user=user,
                     chapter_code=chapter_code,
                     unit_code=unit_code,
                     score=form.cleaned_data['score'],
                 )
+                rollups.record_quiz(result)
                 messages.success(request, f"成功新增測驗結果給 {user.username}")
 
             return redirect('add-material')
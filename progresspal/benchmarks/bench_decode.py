@@ -0,0 +1,63 @@
+# benchmarks/bench_decode.py
+'''
+比較影像解碼方式的每張耗時與記憶體：
+color：IMREAD_COLOR 解碼後轉灰階（原本做法）
+reduced：依 JPEG 標頭尺寸選擇 IMREAD_REDUCED_GRAYSCALE_2/4（或 IMREAD_GRAYSCALE）
+記憶體以 tracemalloc 量測 Python/numpy 配置的峰值（即解碼輸出與中間影像）。
+執行方式（於 progresspal/ 目錄下）：
+    python benchmarks/bench_decode.py
+    python benchmarks/bench_decode.py path/to/frames/*.jpg
+'''
+import glob
+import os
+import sys
+import time
+import tracemalloc
+
+import django
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'progresspal.settings')
+django.setup()
+
+import cv2
+from django.test import override_settings
+from emotion.services.preprocess import decode_frame
+
+RUNS = 30
+
+
+def bench_mode(mode, data):
+    with override_settings(EMOTION_DECODE_MODE=mode):
+        decode_frame(data)
+        times = []
+        for _ in range(RUNS):
+            start = time.perf_counter()
+            frame, factor = decode_frame(data)
+            times.append((time.perf_counter() - start) * 1000)
+
+        tracemalloc.start()
+        decode_frame(data)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return float(np.median(times)), peak, frame.shape, factor
+
+
+def main():
+    paths = sys.argv[1:] or sorted(glob.glob(os.path.join(BASE_DIR, "emotion", "tests", "images", "*.jpg")))
+    print(f"每種方式 {RUNS} 次，時間為中位數\n")
+    print(f"{'file':<18}{'mode':<9}{'ms':>8}{'peak KiB':>11}  output")
+    for path in paths:
+        with open(path, "rb") as f:
+            data = f.read()
+        results = {mode: bench_mode(mode, data) for mode in ("color", "reduced")}
+        for mode, (ms, peak, shape, factor) in results.items():
+            print(f"{os.path.basename(path):<18}{mode:<9}{ms:8.2f}{peak / 1024:11.1f}  {shape[1]}x{shape[0]} (1/{factor})")
+        (c_ms, c_peak, _, _), (r_ms, r_peak, _, _) = results["color"], results["reduced"]
+        print(f"{'':<18}{'saved':<9}{c_ms - r_ms:8.2f}{(c_peak - r_peak) / 1024:11.1f}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# benchmarks/bench_emotion_inference.py
+'''
+比較單張影像在不同推論方式下的延遲 (p50 / p99) 與 Python 記憶體配置。
+執行方式（於 progresspal/ 目錄下）：
+    python benchmarks/bench_emotion_inference.py
+    python benchmarks/bench_emotion_inference.py --synthetic   # 沒有模型檔時改用相同輸入形狀的小型 CNN
+'''
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import django
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'progresspal.settings')
+django.setup()
+
+import keras
+from emotion import emotion_model
+
+
+def build_synthetic_model():
+    """與正式模型相同輸入/輸出形狀的小型 CNN"""
+    return keras.Sequential([
+        keras.Input(shape=emotion_model.get_input_shape()),
+        keras.layers.Conv2D(16, 3, strides=2, activation="relu"),
+        keras.layers.Conv2D(32, 3, strides=2, activation="relu"),
+        keras.layers.GlobalAveragePooling2D(),
+        keras.layers.Dense(len(emotion_model.EMOTION_LABELS), activation="softmax"),
+    ])
+
+
+def bench_mode(name, infer_fn, frame, runs, warmup):
+    for _ in range(warmup):
+        infer_fn(frame)
+
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        infer_fn(frame)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    infer_fn(frame)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies = np.array(latencies)
+    print(f"{name:<18} p50 {np.percentile(latencies, 50):8.2f} ms   "
+          f"p99 {np.percentile(latencies, 99):8.2f} ms   "
+          f"peak alloc {peak / 1024:8.1f} KiB")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default=emotion_model.get_model_path())
+    parser.add_argument("--synthetic", action="store_true")
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        emotion_model.model = build_synthetic_model()
+        print("使用合成模型 (輸入形狀相同)")
+    else:
+        emotion_model.model = keras.models.load_model(args.model)
+        print(f"模型: {args.model}")
+    print(f"Keras backend: {keras.backend.backend()}，每種方式 {args.runs} 次\n")
+
+    frame = np.random.randint(0, 256, (1, *emotion_model.get_input_shape())).astype("float32")
+    for name, infer_fn in emotion_model.INFERENCE_MODES.items():
+        bench_mode(name, infer_fn, frame, args.runs, args.warmup)
+
+
+if __name__ == "__main__":
+    main()
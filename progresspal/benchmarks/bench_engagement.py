@@ -0,0 +1,51 @@
+# benchmarks/bench_engagement.py
+'''
+比較整個群組參與度軌跡的計算時間：
+scalar：每位使用者、每個時間點呼叫 compute_engagement(最近 6 筆)（原本做法）
+batch：engagement_batch.windowed_engagement 一次計算整個矩陣
+執行方式（於 progresspal/ 目錄下）：
+    python benchmarks/bench_engagement.py
+    python benchmarks/bench_engagement.py 2000 300   # 使用者數、每人筆數
+'''
+import os
+import random
+import sys
+import time
+
+import django
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'progresspal.settings')
+django.setup()
+
+from emotion.services.engagement_batch import LABELS, encode_sequences, windowed_engagement, engagement_levels
+from emotion.services.utils import compute_engagement
+
+
+def main():
+    n_users = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    length = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    rng = random.Random(0)
+    sequences = [[rng.choice(LABELS) for _ in range(rng.randint(length // 2, length))] for _ in range(n_users)]
+
+    start = time.perf_counter()
+    scalar = [[compute_engagement(seq[max(0, t - 5):t + 1]) for t in range(len(seq))] for seq in sequences]
+    scalar_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    codes = encode_sequences(sequences)
+    levels = engagement_levels(windowed_engagement(codes))
+    batch_ms = (time.perf_counter() - start) * 1000
+
+    same = all(list(levels[i, :len(row)]) == row for i, row in enumerate(scalar))
+    total = sum(map(len, sequences))
+    print(f"{n_users} 位使用者，共 {total} 筆情緒（矩陣 {codes.shape[0]}x{codes.shape[1]}）")
+    print(f"scalar {scalar_ms:10.1f} ms")
+    print(f"batch  {batch_ms:10.1f} ms  ({scalar_ms / batch_ms:.1f}x)")
+    print(f"結果一致：{same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# benchmarks/bench_face_detection.py
+'''
+人臉偵測各階段耗時（ms，中位數）：
+全解析度 Haar（原本做法）、縮小後偵測、追蹤上一張臉位置、DNN（有模型檔時）。
+執行方式（於 progresspal/ 目錄下）：
+    python benchmarks/bench_face_detection.py
+    python benchmarks/bench_face_detection.py path/to/frames/*.jpg
+'''
+import glob
+import os
+import sys
+import time
+
+import django
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'progresspal.settings')
+django.setup()
+
+import cv2
+from django.test import override_settings
+from emotion.services import preprocess
+
+RUNS = 20
+USER_ID = "bench"
+
+
+def timed(fn, *args):
+    """回傳 (最後一次結果, 中位數 ms)"""
+    result, times = None, []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        try:
+            result = fn(*args)
+        except preprocess.NoFaceDetectedError:
+            result = None
+        times.append((time.perf_counter() - start) * 1000)
+    return result, float(np.median(times))
+
+
+def full_res_haar(gray):
+    boxes = preprocess.FACE_CASCADE.detectMultiScale(gray, 1.1, 5, minSize=(60, 60))
+    return tuple(max(boxes, key=lambda b: b[2] * b[3])) if len(boxes) else None
+
+
+def detect(gray, detector, user_id=None):
+    with override_settings(EMOTION_FACE_DETECTOR=detector):
+        return preprocess.detect_face(gray, user_id)
+
+
+def bench_frame(path):
+    with open(path, "rb") as f:
+        data = f.read()
+
+    (gray, _), t_decode = timed(preprocess.decode_frame, data)
+
+    row = {"decode": t_decode}
+    box, row["haar_full"] = timed(full_res_haar, gray)
+    box, row["haar_small"] = timed(detect, gray, "haar")
+
+    if box is not None:
+        detect(gray, "haar", USER_ID)  # 記住位置
+        _, row["haar_tracked"] = timed(detect, gray, "haar", USER_ID)
+        preprocess.cache.delete(preprocess._track_key(USER_ID))
+
+        x, y, w, h = box
+        aligned, row["align"] = timed(preprocess._align_by_eyes, gray[y:y + h, x:x + w])
+        img_h, img_w, _ = preprocess.get_input_shape()
+        _, row["resize"] = timed(cv2.resize, aligned, (img_w, img_h), None, 0, 0, cv2.INTER_AREA)
+
+    if os.path.exists(preprocess.DNN_MODEL_PATH):
+        _, row["dnn_small"] = timed(detect, gray, "dnn")
+
+    h_img, w_img = gray.shape
+    print(f"{os.path.basename(path)} ({w_img}x{h_img}) face={box}")
+    for stage, ms in row.items():
+        print(f"    {stage:<14}{ms:9.2f} ms")
+
+
+def main():
+    paths = sys.argv[1:] or sorted(glob.glob(os.path.join(BASE_DIR, "emotion", "tests", "images", "*.jpg")))
+    print(f"縮小寬度 EMOTION_DETECT_MAX_WIDTH={getattr(django.conf.settings, 'EMOTION_DETECT_MAX_WIDTH', 320)}，每階段 {RUNS} 次\n")
+    for path in paths:
+        bench_frame(path)
+
+
+if __name__ == "__main__":
+    main()
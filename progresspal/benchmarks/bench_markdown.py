@@ -0,0 +1,110 @@
+# benchmarks/bench_markdown.py
+'''
+比較 Markdown 轉換與回應解析的前後效能。
+執行方式（於 progresspal/ 目錄下）：
+    python benchmarks/bench_markdown.py
+'''
+import csv
+import glob
+import os
+import re
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+from markdown import markdown
+from learning.services import utils
+
+TUTORING_RESPONSE = """
+### 教學重點
+陣列是由**相同型別**元素組成的線性資料結構，所有元素存放於連續記憶體中。
+
+| 操作 | 時間複雜度 |
+| --- | --- |
+| 存取 | O(1) |
+| 插入 | O(n) |
+
+### 範例
+```python
+scores = [90, 85, 77]
+print(scores[1])
+```
+
+### 總結
+• 索引從 0 開始
+• 存取快速，插入與刪除較慢
+
+### 引導提問
+1. 為什麼陣列的存取是 O(1)？
+2. 陣列與串列有什麼差別？
+3. 何時不適合使用陣列？
+"""
+
+
+def load_quiz_payloads():
+    """讀取題庫 CSV，回傳每題需轉換的 5 段文字（題目 + 4 選項）與解析"""
+    payloads = []
+    for path in glob.glob(os.path.join(BASE_DIR, 'learning', 'resources', '*.csv')):
+        with open(path, encoding='utf-8-sig') as f:
+            for row in csv.DictReader(f):
+                payloads.append([
+                    row.get('question', ''),
+                    row.get('option_A', ''),
+                    row.get('option_B', ''),
+                    row.get('option_C', ''),
+                    row.get('option_D', ''),
+                    row.get('explanation', ''),
+                ])
+    return payloads
+
+
+def legacy_to_markdown(text):
+    text = text.replace('•', '  *')
+    return markdown(text, extensions=['fenced_code', 'nl2br', 'tables'])
+
+
+def legacy_clean_text_tutoring(raw_text):
+    raw_text = raw_text.strip() + "\n"
+    pattern = r"###\s*(教學重點|範例|總結|引導提問)\s*([\s\S]*?)(?=\n###|\Z)"
+    return re.findall(pattern, raw_text)
+
+
+def bench(label, func, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<32} {elapsed * 1000:>9.1f} ms  ({elapsed / rounds * 1000:.3f} ms/round)")
+    return elapsed
+
+
+def main(rounds=20):
+    payloads = load_quiz_payloads()
+    texts = [t for row in payloads for t in row]
+    print(f"題庫 {len(payloads)} 題，每輪轉換 {len(texts)} 段文字，共 {rounds} 輪\n")
+
+    # 確認輸出一致
+    for t in texts:
+        assert utils.to_markdown(t) == legacy_to_markdown(t)
+    assert utils.to_markdown(TUTORING_RESPONSE) == legacy_to_markdown(TUTORING_RESPONSE)
+
+    print("[to_markdown] 題庫")
+    before = bench("  每次新建 Markdown", lambda: [legacy_to_markdown(t) for t in texts], rounds)
+    after = bench("  執行緒共用 Markdown.reset()", lambda: [utils.to_markdown(t) for t in texts], rounds)
+    print(f"  加速 {before / after:.2f}x\n")
+
+    print("[to_markdown] 教材回應")
+    before = bench("  每次新建 Markdown", lambda: legacy_to_markdown(TUTORING_RESPONSE), rounds * 50)
+    after = bench("  執行緒共用 Markdown.reset()", lambda: utils.to_markdown(TUTORING_RESPONSE), rounds * 50)
+    print(f"  加速 {before / after:.2f}x\n")
+
+    print("[clean_text_tutoring]")
+    before = bench("  字串 pattern", lambda: legacy_clean_text_tutoring(TUTORING_RESPONSE), rounds * 500)
+    after = bench("  預先編譯 pattern", lambda: utils.TUTORING_SECTION_PATTERN.findall(TUTORING_RESPONSE.strip() + "\n"), rounds * 500)
+    print(f"  加速 {before / after:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
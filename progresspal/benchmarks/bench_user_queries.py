@@ -0,0 +1,129 @@
+# benchmarks/bench_user_queries.py
+'''
+以大量假資料量測各使用者、依時間排序的查詢（學習歷程、最近情緒），比較有無複合索引：
+learning_user_start_idx、question_user_created_idx、quiz_user_created_idx、emotion_user_time_idx
+資料寫在另建的測試資料庫（結束後刪除），不會動到開發資料庫。
+執行方式（於 progresspal/ 目錄下）：
+    python benchmarks/bench_user_queries.py
+    python benchmarks/bench_user_queries.py 500 400   # 使用者數、每人情緒筆數
+'''
+import os
+import random
+import sys
+import time
+from datetime import timedelta
+
+import django
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'progresspal.settings')
+django.setup()
+
+from django.db import connection
+from django.test.utils import setup_test_environment
+from django.utils import timezone
+from accounts.models import CustomUser, LearningRecord, QuestionLog, QuizResult
+from accounts.services.portfolio import LOG_KINDS, get_log_page, portfolio_summary
+from accounts.services.rollups import rebuild_rollups
+from emotion.models import EmotionRecord
+from emotion.services.engagement import load_state_from_db
+
+INDEXED_MODELS = [EmotionRecord, LearningRecord, QuestionLog, QuizResult]
+RUNS = 5
+SAMPLE_USERS = 50
+
+
+def seed(n_users, n_emotions):
+    rng = random.Random(0)
+    now = timezone.now()
+    codes = [code for code, _ in EmotionRecord.EMOTION_CHOICES]
+    CustomUser.objects.bulk_create([
+        CustomUser(username=f'bench{i}', email=f'bench{i}@example.com') for i in range(n_users)
+    ])
+    users = list(CustomUser.objects.order_by('id'))
+
+    # 各使用者的紀錄交錯寫入（模擬多人同時使用），同一使用者的資料散在整張表
+    emotions, learning, questions, quizzes = [], [], [], []
+    for step in range(n_emotions):
+        for user in users:
+            at = now - timedelta(seconds=(n_emotions - step) * 5)
+            emotions.append(EmotionRecord(user=user, emotion=rng.choice(codes), confidence=rng.random(), timestamp=at))
+            if step % 5 == 0:
+                learning.append(LearningRecord(user=user, chapter_code='CH1', unit_code='CH1-U1',
+                                               start_time=at, end_time=at + timedelta(minutes=30)))
+                questions.append(QuestionLog(user=user, chapter_code='CH1', unit_code='CH1-U1',
+                                             question='Q', answer='A', engagement='high'))
+                quizzes.append(QuizResult(user=user, chapter_code='CH1', score=rng.randint(0, 10)))
+    for model, rows in ((EmotionRecord, emotions), (LearningRecord, learning),
+                        (QuestionLog, questions), (QuizResult, quizzes)):
+        model.objects.bulk_create(rows, batch_size=2000)
+    rebuild_rollups()
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    return users
+
+
+def portfolio(user):
+    # 學習歷程頁面的圖表（讀每日統計），加上各種紀錄的第一頁
+    portfolio_summary(user)
+    for kind in LOG_KINDS:
+        get_log_page(user, kind)
+
+
+def engagement(user):
+    user.recent_emotion_history
+    load_state_from_db(user.pk)
+
+
+def bench(func, users):
+    times = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        for user in users:
+            func(user)
+        times.append((time.perf_counter() - start) * 1000 / len(users))
+    return float(np.median(times))
+
+
+def set_indexes(enabled):
+    with connection.schema_editor() as editor:
+        for model in INDEXED_MODELS:
+            for index in model._meta.indexes:
+                if enabled:
+                    editor.add_index(model, index)
+                else:
+                    editor.remove_index(model, index)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def main():
+    n_users = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    n_emotions = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        start = time.perf_counter()
+        users = seed(n_users, n_emotions)
+        print(f'{n_users} 位使用者，EmotionRecord {EmotionRecord.objects.count()} 筆，'
+              f'建立耗時 {time.perf_counter() - start:.1f}s')
+        sample = random.Random(1).sample(users, min(SAMPLE_USERS, len(users)))
+
+        results = {}
+        for label, enabled in (('without', False), ('with', True)):
+            set_indexes(enabled)
+            results[label] = (bench(portfolio, sample), bench(engagement, sample))
+
+        print(f"\n每位使用者的查詢時間（ms，{RUNS} 次中位數）")
+        print(f"{'indexes':<10}{'portfolio':>11}{'engagement':>12}")
+        for label, (p_ms, e_ms) in results.items():
+            print(f'{label:<10}{p_ms:11.3f}{e_ms:12.3f}')
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class EmotionConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'emotion'
+
+    def ready(self):
+        # 啟動時預載模型、Haar cascades 與 embeddings（EMOTION_PRELOAD 控制）
+        from .services.warmup import should_preload, start_preload
+        if should_preload():
+            start_preload()
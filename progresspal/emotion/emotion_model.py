@@ -1,65 +1,192 @@
 # emotion/emotion_model.py
 import os
+import logging
+import threading
 import numpy as np
 import traceback
-import keras 
+import keras
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
 
 class InputShapeError(Exception):
     """輸入影像尺寸錯誤"""
     pass
 
+MODEL_DIR = os.path.dirname(__file__)
+
+# 可選用的模型版本（由 EMOTION_MODEL_VARIANT 設定），非原始版本以
+# `python manage.py export_emotion_model --variant <name>` 產生
+MODEL_VARIANTS = {
+    # 原始模型：224×224 灰階、float32
+    "float32": {"file": "small_label5_aug_best_model_fold_8_v94.74.keras", "input_size": 224},
+    # Dense 權重 int8 量化
+    "int8": {"file": "small_label5_aug_best_model_fold_8_v94.74_int8.keras", "input_size": 224},
+    # 輸入降為 112×112，卷積運算量約為 1/4
+    "half_res": {"file": "small_label5_aug_best_model_fold_8_v94.74_112.keras", "input_size": 112},
+}
+
 # 模型檔案路徑
-MODEL_PATH = os.path.join(
-    os.path.dirname(__file__),
-    "small_label5_aug_best_model_fold_8_v94.74.keras"
-)
+MODEL_PATH = os.path.join(MODEL_DIR, MODEL_VARIANTS["float32"]["file"])
 
 EMOTION_LABELS = ["挫折", "困惑", "無聊", "喜悅", "投入", "驚訝"]
 
 # 全域變數
 model = None
+_remote_predictor = None
+_model_lock = threading.Lock()  # 避免啟動預載與第一個請求同時載入模型
+
+def get_model_variant():
+    variant = getattr(settings, "EMOTION_MODEL_VARIANT", "float32")
+    if variant not in MODEL_VARIANTS:
+        raise RuntimeError(f"未知的模型版本: {variant}，可用版本: {', '.join(MODEL_VARIANTS)}")
+    return variant
+
+def get_model_path(variant=None):
+    return os.path.join(MODEL_DIR, MODEL_VARIANTS[variant or get_model_variant()]["file"])
+
+def get_input_shape(variant=None):
+    """模型輸入 (H, W, C)"""
+    size = MODEL_VARIANTS[variant or get_model_variant()]["input_size"]
+    return (size, size, 1)
 
 def load_emotion_model():
     global model
-    if model is None:
+    if model is not None:
+        return
+    with _model_lock:
+        if model is not None:
+            return
+        model_path = get_model_path()
         try:
-            model = keras.models.load_model(MODEL_PATH)
-            print("模型載入成功 (Grayscale Mode)")
+            loaded = keras.models.load_model(model_path)
+            print(f"模型載入成功 (Grayscale Mode, {get_model_variant()})")
         except Exception as e:
             print(f"模型載入失敗: {e}")
             raise RuntimeError(f"載入模型時發生錯誤：{str(e)}")
+        model = loaded
+        warm_up_model()
 
-def predict_emotion(face_input: np.ndarray) -> dict:
-    load_emotion_model()
+# ===================== 推論方式 =====================
+# predict：每次呼叫都會建立 dataset 與 callbacks，單張影像時額外負擔大
+# predict_on_batch：重用已編譯的 predict function，直接推論一個 batch
+# direct：直接呼叫模型 (training=False)，不經過編譯流程
 
-    # 1. 基本檢查
-    if face_input is None:
-        raise InputShapeError("輸入影像為 None")
+def _infer_predict(x):
+    return model.predict(x, verbose=0)
+
+def _infer_on_batch(x):
+    return keras.ops.convert_to_numpy(model.predict_on_batch(x))
 
-    # 2. 轉 float32 
-    x = face_input.astype("float32")
+def _infer_direct(x):
+    return keras.ops.convert_to_numpy(model(x, training=False))
 
+INFERENCE_MODES = {
+    "predict": _infer_predict,
+    "predict_on_batch": _infer_on_batch,
+    "direct": _infer_direct,
+}
+
+def get_infer_fn():
+    """依 EMOTION_INFERENCE_MODE 取得推論函式"""
+    mode = getattr(settings, "EMOTION_INFERENCE_MODE", "predict_on_batch")
+    return INFERENCE_MODES.get(mode, _infer_on_batch)
+
+def warm_up_model(batch_size=1):
+    """以空白影像推論一次，讓第一個請求不必等待 graph 建立"""
     try:
-        # 3. 模型推論
-        preds = model.predict(x, verbose=0)
-        preds_vector = preds[0] # 取出第一筆
+        get_infer_fn()(np.zeros((batch_size, *get_input_shape()), dtype="float32"))
+    except Exception as e:
+        logger.warning(f"Model warm-up failed: {e}")
 
-        # 4. 解析結果
-        max_idx = np.argmax(preds_vector)
-        
-        if max_idx < len(EMOTION_LABELS):
-            emotion = EMOTION_LABELS[max_idx]
-        else:
-            emotion = "Unknown"
+def _decode_prediction(preds_vector) -> dict:
+    """將單張影像的機率向量轉成 {"emotion", "confidence"}"""
+    max_idx = int(np.argmax(preds_vector))
 
-        confidence = float(preds_vector[max_idx])
+    if max_idx < len(EMOTION_LABELS):
+        emotion = EMOTION_LABELS[max_idx]
+    else:
+        emotion = "Unknown"
 
-        return {
-            "emotion": emotion,
-            "confidence": confidence
-        }
+    return {
+        "emotion": emotion,
+        "confidence": float(preds_vector[max_idx])
+    }
 
+def aggregate_predictions(results) -> dict:
+    """
+    合併多張影像的結果：以信心分數加權投票選出情緒，
+    confidence 為該情緒各張的平均信心分數，counts 為各情緒張數
+    """
+    if not results:
+        return None
+    weights, counts = {}, {}
+    for r in results:
+        weights[r["emotion"]] = weights.get(r["emotion"], 0.0) + r["confidence"]
+        counts[r["emotion"]] = counts.get(r["emotion"], 0) + 1
+    emotion = max(weights, key=weights.get)
+    return {
+        "emotion": emotion,
+        "confidence": weights[emotion] / counts[emotion],
+        "counts": counts,
+    }
+
+def check_input_shape(frames):
+    input_shape = get_input_shape()
+    if frames.ndim != 4 or tuple(frames.shape[1:]) != input_shape:
+        raise InputShapeError(f"輸入影像形狀錯誤: {frames.shape}，需為 (N, {input_shape[0]}, {input_shape[1]}, {input_shape[2]})")
+
+def predict_batch(frames: np.ndarray) -> list:
+    """
+    一次推論多張影像。
+    frames: (N, H, W, 1)，H、W 依模型版本而定（預設 224）
+    回傳長度 N 的 [{"emotion", "confidence"}, ...]
+    """
+    check_input_shape(frames)
+    load_emotion_model()
+
+    x = np.asarray(frames, dtype="float32")
+    try:
+        preds = get_infer_fn()(x)
+        return [_decode_prediction(p) for p in preds]
     except Exception as e:
         print(f"推論錯誤: {e}")
         traceback.print_exc()
-        raise RuntimeError(f"模型推論失敗: {str(e)}")
\ No newline at end of file
+        raise RuntimeError(f"模型推論失敗: {str(e)}")
+
+def get_remote_predictor():
+    """
+    若設定了 EMOTION_INFERENCE_SOCKET，回傳連線共用推論服務的 client；否則回傳 None
+    """
+    global _remote_predictor
+    socket_path = getattr(settings, "EMOTION_INFERENCE_SOCKET", "")
+    if not socket_path:
+        return None
+    if _remote_predictor is None or _remote_predictor.socket_path != socket_path:
+        from .services.inference import RemotePredictor
+        _remote_predictor = RemotePredictor(socket_path)
+    return _remote_predictor
+
+def predict_emotions(frames: np.ndarray) -> list:
+    """
+    推論 (N, H, W, 1) 影像，回傳長度 N 的結果。
+    優先交給共用推論服務（與其他請求合併成批次），無法連線時才退回本機推論；
+    服務回傳的錯誤（InferenceServiceError，為 RuntimeError）直接拋給呼叫端，不在 worker 載入模型
+    """
+    if frames is None:
+        raise InputShapeError("輸入影像為 None")
+    check_input_shape(frames)
+
+    remote = get_remote_predictor()
+    if remote is not None:
+        from .services.inference import InferenceConnectionError
+        try:
+            return remote.predict(frames)
+        except InferenceConnectionError as e:
+            # 服務未啟動或連線中斷時退回本機推論
+            logger.warning(f"Inference service unavailable, fallback to local model: {e}")
+
+    return predict_batch(frames)
+
+def predict_emotion(face_input: np.ndarray) -> dict:
+    return predict_emotions(face_input)[0]
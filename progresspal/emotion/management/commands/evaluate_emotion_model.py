@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from emotion.emotion_model import MODEL_VARIANTS
+from emotion.services.model_variants import evaluate_variants, load_eval_images
+
+
+class Command(BaseCommand):
+    help = "比較各模型版本與原始模型的準確率、吞吐量與記憶體"
+
+    def add_arguments(self, parser):
+        parser.add_argument('data_dir', help='人臉圖片資料夾（子資料夾以情緒命名時會計算準確率）')
+        parser.add_argument('--variants', nargs='+', default=list(MODEL_VARIANTS), choices=list(MODEL_VARIANTS))
+
+    def handle(self, *args, **options):
+        images, labels = load_eval_images(options['data_dir'])
+        if not images:
+            raise CommandError(f"{options['data_dir']} 中沒有可讀取的圖片")
+        self.stdout.write(f"評估圖片 {len(images)} 張（已標註 {int((labels >= 0).sum())} 張）\n")
+
+        header = f"{'版本':<10}{'一致率':>8}{'準確率':>8}{'p50(ms)':>10}{'幀/秒':>10}{'權重(MB)':>10}{'檔案(MB)':>10}"
+        self.stdout.write(header)
+        for r in evaluate_variants(images, labels, options['variants']):
+            if "error" in r:
+                self.stdout.write(f"{r['variant']:<10}{r['error']}")
+                continue
+            agreement = f"{r['agreement']:.2%}" if r['agreement'] is not None else "-"
+            accuracy = f"{r['accuracy']:.2%}" if r['accuracy'] is not None else "-"
+            self.stdout.write(
+                f"{r['variant']:<10}{agreement:>8}{accuracy:>8}{r['latency_p50_ms']:>10.2f}"
+                f"{r['frames_per_sec']:>10.1f}{r['weights_mb']:>10.2f}{r['file_mb']:>10.2f}"
+            )
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+from emotion.emotion_model import MODEL_VARIANTS
+from emotion.services.model_variants import VariantExportError, export_variant
+
+
+class Command(BaseCommand):
+    help = "由原始情緒模型產生較小的版本（int8 量化或降低解析度）"
+
+    def add_arguments(self, parser):
+        choices = [v for v in MODEL_VARIANTS if v != "float32"]
+        parser.add_argument('--variant', required=True, choices=choices, help='要產生的版本')
+        parser.add_argument('--source', default=None, help='原始模型路徑（預設為 float32 版本）')
+
+    def handle(self, *args, **options):
+        try:
+            output_path = export_variant(options['variant'], options['source'])
+        except VariantExportError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f"已輸出 {output_path}"))
+        self.stdout.write(f"在 settings 設定 EMOTION_MODEL_VARIANT = '{options['variant']}' 即可使用")
@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from emotion.emotion_model import check_input_shape, load_emotion_model, predict_batch
+from emotion.services.inference import serve
+
+
+class Command(BaseCommand):
+    help = "啟動共用的情緒辨識批次推論服務（Unix socket）"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--socket', default=settings.EMOTION_INFERENCE_SOCKET, help='Unix socket 路徑')
+        parser.add_argument('--window-ms', type=float, default=settings.EMOTION_BATCH_WINDOW_MS, help='合併批次的等待時間')
+        parser.add_argument('--max-batch-size', type=int, default=settings.EMOTION_MAX_BATCH_SIZE, help='單次推論最多張數')
+
+    def handle(self, *args, **options):
+        socket_path = options['socket']
+        if not socket_path:
+            raise CommandError("請以 --socket 或 EMOTION_INFERENCE_SOCKET 指定 socket 路徑")
+
+        load_emotion_model()
+        self.stdout.write(self.style.SUCCESS(f"推論服務啟動：{socket_path}"))
+        try:
+            serve(socket_path, predict_batch,
+                  max_batch_size=options['max_batch_size'],
+                  window_ms=options['window_ms'],
+                  check_fn=check_input_shape)
+        except KeyboardInterrupt:
+            self.stdout.write("推論服務已停止")
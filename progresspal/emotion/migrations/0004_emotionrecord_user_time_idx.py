@@ -0,0 +1,17 @@
+# Generated by Django 3.2.25 on 2026-10-19 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('emotion', '0003_alter_emotionrecord_emotion'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='emotionrecord',
+            index=models.Index(fields=['user', 'timestamp'], name='emotion_user_time_idx'),
+        ),
+    ]
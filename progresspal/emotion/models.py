@@ -26,6 +26,12 @@ class EmotionRecord(models.Model):
     confidence = models.FloatField(default=0.0)  # 模型信心分數
     timestamp = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        indexes = [
+            # 最近情緒、參與度重建：依使用者篩選、依時間排序
+            models.Index(fields=['user', 'timestamp'], name='emotion_user_time_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.username} - {self.emotion} ({self.confidence:.2f})"
 
@@ -0,0 +1,170 @@
+# emotion/services/engagement.py
+"""
+每位使用者的參與度狀態（存在 Django cache）
+
+偵測到新情緒時以 O(1) 更新：
+- recent：最近 6 筆情緒（ring buffer，由遠到近）
+- ema：參與度分數的指數平滑值
+- pending_confused：最後一筆為困惑時，其分數要等下一筆情緒才能決定（與 compute_engagement 相同規則）
+
+讀取參與度不查資料庫；cache 沒有狀態時才以資料庫最近 6 筆（加上本行程緩衝區中尚未寫入的紀錄）重建。
+由最近 6 筆重建的結果與 compute_engagement 相同；之後持續累加的 EMA 也包含更早的情緒，
+但第 7 筆以前的權重合計不到 5%（0.6^6）。
+
+狀態存在 CACHES['shared']（所有行程共用），所有 worker 看到同一份；
+更新時以 cache.add 取得每位使用者的鎖（指數退避，最多等 LOCK_WAIT 秒），同時偵測的請求不會互相覆蓋。
+鎖只在 add 為跨行程原子操作的 backend 上有效：
+- Memcached（正式環境，MEMCACHED_LOCATION）：add 由伺服器原子執行
+- DatabaseCache：add 在交易中先查後寫，SQLite 寫入互斥因此成立，但每次嘗試都是一次寫入，只適合開發環境（learning.W002）
+- LocMemCache：只在同一行程內有效（測試用）
+狀態保存 EMOTION_ENGAGEMENT_STATE_TIMEOUT 秒（遠大於緩衝區的 flush_interval），
+過期重建時其他 worker 緩衝區中的紀錄早已寫入資料庫。
+"""
+import logging
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.connection import ConnectionProxy
+
+from emotion.models import EmotionRecord
+from emotion.services.recorder import pending_emotions
+from emotion.services.utils import EMA_ALPHA, EMOTION_TO_ENGAGEMENT, confused_score, engagement_level
+
+logger = logging.getLogger(__name__)
+
+# 各 worker 都會更新同一位使用者的狀態，放在所有行程共用的 cache
+cache = ConnectionProxy(caches, "shared")
+
+HISTORY_SIZE = 6
+CONFUSED = "困惑"
+
+LOCK_TIMEOUT = 2         # 持有鎖的行程異常結束時，鎖自動過期的秒數（更新本身只需幾毫秒）
+LOCK_WAIT = 0.2          # 等待鎖的最長秒數，逾時仍照常更新（寧可少數更新覆蓋，也不讓偵測請求變慢）
+LOCK_BACKOFF = 0.005     # 第一次重試前等待的秒數，之後每次加倍
+LOCK_BACKOFF_MAX = 0.05
+
+# EmotionRecord.emotion 代碼 -> 中文情緒
+CODE_TO_LABEL = dict(EmotionRecord.EMOTION_CHOICES)
+
+
+def _key(user_id):
+    return f"emotion:engagement:{user_id}"
+
+
+def _timeout():
+    return getattr(settings, "EMOTION_ENGAGEMENT_STATE_TIMEOUT", 30 * 60)
+
+
+@contextmanager
+def _user_lock(user_id):
+    """每位使用者的更新鎖：cache.add 失敗時以指數退避重試，最多 LOCK_WAIT 秒（預設約 6 次重試）"""
+    lock_key = f"{_key(user_id)}:lock"
+    deadline = time.monotonic() + LOCK_WAIT
+    delay = LOCK_BACKOFF
+    acquired = cache.add(lock_key, 1, LOCK_TIMEOUT)
+    while not acquired:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, LOCK_BACKOFF_MAX)
+        acquired = cache.add(lock_key, 1, LOCK_TIMEOUT)
+    if not acquired:
+        logger.warning(f"Engagement state lock timeout, updating without lock (user {user_id})")
+    try:
+        yield
+    finally:
+        if acquired:
+            cache.delete(lock_key)
+
+
+def new_state():
+    return {"recent": deque(maxlen=HISTORY_SIZE), "ema": None, "pending_confused": False}
+
+
+def _fold(state, score):
+    ema = state["ema"]
+    state["ema"] = score if ema is None else EMA_ALPHA * score + (1 - EMA_ALPHA) * ema
+
+
+def apply_emotion(state, emotion):
+    """把一筆情緒加入狀態（就地修改並回傳）；未知情緒拋出 ValueError"""
+    if emotion != CONFUSED and emotion not in EMOTION_TO_ENGAGEMENT:
+        raise ValueError(f"未知情緒: {emotion}")
+
+    # 上一筆困惑的分數由這一筆決定
+    if state["pending_confused"]:
+        _fold(state, confused_score(emotion))
+        state["pending_confused"] = False
+
+    if emotion == CONFUSED:
+        state["pending_confused"] = True
+    else:
+        _fold(state, EMOTION_TO_ENGAGEMENT[emotion])
+    state["recent"].append(emotion)
+    return state
+
+
+def current_ema(state):
+    """目前的 EMA；最後一筆為困惑時以 0.5 計（同 compute_engagement）"""
+    if not state["pending_confused"]:
+        return state["ema"]
+    if state["ema"] is None:
+        return confused_score(None)
+    return EMA_ALPHA * confused_score(None) + (1 - EMA_ALPHA) * state["ema"]
+
+
+def state_level(state):
+    """狀態對應的參與度等級；尚無任何情緒時為 high（剛進入系統）"""
+    ema = current_ema(state)
+    return "high" if ema is None else engagement_level(ema)
+
+
+def build_state(emotions):
+    state = new_state()
+    for emotion in emotions:
+        if emotion == "None":
+            continue
+        apply_emotion(state, emotion)
+    return state
+
+
+def load_state_from_db(user_id):
+    """由資料庫最近 6 筆重建狀態（一次查詢），接上本行程緩衝區中還沒寫入的紀錄"""
+    rows = EmotionRecord.objects.filter(user_id=user_id).order_by("-timestamp").values_list("emotion", flat=True)
+    codes = (list(rows[:HISTORY_SIZE])[::-1] + pending_emotions(user_id))[-HISTORY_SIZE:]
+    return build_state(CODE_TO_LABEL[code] for code in codes if code in CODE_TO_LABEL)
+
+
+def get_state(user):
+    """從 cache 取得狀態；沒有時才查資料庫並寫回 cache"""
+    key = _key(user.pk)
+    state = cache.get(key)
+    if state is None:
+        state = load_state_from_db(user.pk)
+        cache.set(key, state, _timeout())
+    return state
+
+
+def update_engagement(user_id, emotion):
+    """偵測到新情緒時呼叫（讀取、更新、寫回在使用者鎖內完成）"""
+    key = _key(user_id)
+    with _user_lock(user_id):
+        state = cache.get(key)
+        if state is None:
+            state = load_state_from_db(user_id)
+        apply_emotion(state, emotion)
+        cache.set(key, state, _timeout())
+    return state
+
+
+def get_engagement(user):
+    return state_level(get_state(user))
+
+
+def get_recent_emotions(user):
+    """最近 6 筆情緒（由遠到近），尚無紀錄時回傳 ["None"]"""
+    return list(get_state(user)["recent"]) or ["None"]
@@ -0,0 +1,140 @@
+# emotion/services/engagement_batch.py
+"""
+多位使用者的參與度批次計算（NumPy，供分析用）
+
+輸入為補齊後的情緒代碼矩陣（使用者 × 時間，int8）：
+- 代碼為 LABELS 的索引，PAD（-1）表示補齊的空位；每列的資料靠左、PAD 只出現在右側
+- 輸出與輸入同形狀的 float 矩陣，PAD 位置為 NaN
+
+分數規則與 utils.map_emotion_to_score / compute_engagement 相同，困惑依下一筆決定：
+下一筆正向 1.0、負向 0.0、困惑或沒有下一筆（PAD / 結尾）0.5。
+"""
+import numpy as np
+
+from emotion.models import EmotionRecord
+from emotion.services.utils import EMA_ALPHA, EMOTION_TO_ENGAGEMENT, confused_score
+
+PAD = -1
+HISTORY_SIZE = 6
+
+# 代碼順序與 EmotionRecord.EMOTION_CHOICES 相同
+LABELS = [label for _, label in EmotionRecord.EMOTION_CHOICES]
+LABEL_TO_INDEX = {label: i for i, label in enumerate(LABELS)}
+RECORD_CODE_TO_INDEX = {code: i for i, (code, _) in enumerate(EmotionRecord.EMOTION_CHOICES)}
+CONFUSED = LABEL_TO_INDEX["困惑"]
+
+# 查表用：長度為 len(LABELS) + 1，最後一格對應 PAD（codes 為 -1 時取到最後一格）
+_BASE_SCORE = np.array([EMOTION_TO_ENGAGEMENT.get(label, np.nan) for label in LABELS] + [np.nan])
+_NEXT_SCORE = np.array([confused_score(label) for label in LABELS] + [confused_score(None)])
+_IS_PAD = np.array([False] * len(LABELS) + [True])
+
+
+def encode_sequences(sequences, length=None):
+    """
+    中文情緒序列的 list 轉成補齊的代碼矩陣；length 預設為最長序列長度（較長的序列保留最後 length 筆）。
+    "None"（尚無紀錄）略過，未知情緒拋出 ValueError。
+    """
+    sequences = [[e for e in seq if e != "None"] for seq in sequences]
+    if length is None:
+        length = max((len(seq) for seq in sequences), default=0)
+    codes = np.full((len(sequences), length), PAD, dtype=np.int8)
+    for row, seq in enumerate(sequences):
+        seq = seq[-length:] if length else []
+        try:
+            codes[row, :len(seq)] = [LABEL_TO_INDEX[e] for e in seq]
+        except KeyError as e:
+            raise ValueError(f"未知情緒: {e.args[0]}")
+    return codes
+
+
+def sequence_lengths(codes):
+    return (codes != PAD).sum(axis=1)
+
+
+def score_matrix(codes):
+    """每一筆情緒的參與度分數（同 map_emotion_to_score），PAD 為 NaN"""
+    codes = np.asarray(codes)
+    # 下一筆的代碼，最後一欄之後視為 PAD
+    next_codes = np.full_like(codes, PAD)
+    next_codes[:, :-1] = codes[:, 1:]
+    return np.where(codes == CONFUSED, _NEXT_SCORE[next_codes], _BASE_SCORE[codes])
+
+
+def ema_trajectories(codes, alpha=EMA_ALPHA):
+    """
+    每位使用者整段歷史的 EMA 軌跡：第 t 欄為前 t+1 筆分數的 EMA，
+    分數依整段序列計算（困惑看實際的下一筆），最後一筆有效值等於對整段序列做 compute_engagement 的 EMA。
+    迴圈只沿時間軸，每一步同時更新所有使用者。
+    """
+    scores = score_matrix(codes)
+    trajectories = np.empty_like(scores)
+    if scores.shape[1] == 0:
+        return trajectories
+    ema = scores[:, 0]
+    trajectories[:, 0] = ema
+    for t in range(1, scores.shape[1]):
+        # PAD 的分數為 NaN，EMA 隨之成為 NaN，與 PAD 位置一致
+        ema = alpha * scores[:, t] + (1 - alpha) * ema
+        trajectories[:, t] = ema
+    return trajectories
+
+
+def windowed_engagement(codes, window=HISTORY_SIZE, alpha=EMA_ALPHA):
+    """
+    線上系統在每個時間點會得到的 EMA：第 t 欄等於 compute_engagement(最近 window 筆) 使用的 EMA。
+    視窗內最後一筆若為困惑，還看不到下一筆，以 0.5 計；其餘困惑看視窗內的下一筆。
+    迴圈只有 window 次（每次處理整個矩陣的一個位移）。
+    """
+    codes = np.asarray(codes)
+    full = score_matrix(codes)
+    last = np.where(codes == CONFUSED, confused_score(None), full)
+    n_steps = codes.shape[1]
+    t = np.arange(n_steps)
+    # 每個時間點的視窗往回幾筆（視窗第一筆的權重為 (1-alpha)^d，其餘為 alpha(1-alpha)^d）
+    first = np.minimum(t, window - 1)
+
+    result = np.zeros(full.shape)
+    for d in range(min(window, n_steps)):
+        shifted = last if d == 0 else np.pad(full[:, :n_steps - d], ((0, 0), (d, 0)))
+        weight = np.where(first == d, (1 - alpha) ** d, alpha * (1 - alpha) ** d)
+        weight[first < d] = 0.0
+        result += weight * shifted
+    result[_IS_PAD[codes]] = np.nan
+    return result
+
+
+def engagement_levels(ema):
+    """EMA 矩陣轉成等級（同 utils.engagement_level），NaN 位置為 None"""
+    ema = np.asarray(ema)
+    levels = np.where(ema >= 0.5, "high", "low").astype(object)
+    levels[np.isnan(ema)] = None
+    return levels
+
+
+def load_emotion_matrix(users=None, since=None, until=None, chunk_size=2000):
+    """
+    由 EmotionRecord 建立代碼矩陣（依使用者、時間排序的單次查詢，串流讀取）。
+    回傳 (user_ids, codes)，codes 的列與 user_ids 對應。
+    """
+    queryset = EmotionRecord.objects.all()
+    if users is not None:
+        queryset = queryset.filter(user__in=users)
+    if since is not None:
+        queryset = queryset.filter(timestamp__gte=since)
+    if until is not None:
+        queryset = queryset.filter(timestamp__lt=until)
+
+    user_ids, rows = [], []
+    rows_by_user = queryset.order_by("user_id", "timestamp", "id").values_list("user_id", "emotion")
+    for user_id, code in rows_by_user.iterator(chunk_size=chunk_size):
+        if code not in RECORD_CODE_TO_INDEX:
+            continue
+        if not user_ids or user_ids[-1] != user_id:
+            user_ids.append(user_id)
+            rows.append([])
+        rows[-1].append(RECORD_CODE_TO_INDEX[code])
+
+    codes = np.full((len(rows), max(map(len, rows), default=0)), PAD, dtype=np.int8)
+    for i, row in enumerate(rows):
+        codes[i, :len(row)] = row
+    return user_ids, codes
@@ -0,0 +1,304 @@
+# emotion/services/inference.py
+"""
+批次推論服務
+
+- BatchingPredictor：執行緒 + 佇列，把短時間窗內收到的影像合併成一次模型推論
+- serve()：以 Unix socket 對外提供推論，讓多個 Django worker 共用同一份模型
+- RemotePredictor：Django worker 端連線推論服務的 client
+
+啟動方式：python manage.py run_emotion_server
+"""
+import json
+import logging
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 訊息格式：!II (header 長度, payload 長度) + JSON header + payload
+_PREFIX = struct.Struct("!II")
+_STOP = object()
+
+
+class InferenceServiceError(RuntimeError):
+    """推論服務回傳錯誤或逾時（服務仍在運作，不應退回本機推論）"""
+    pass
+
+
+class InferenceConnectionError(InferenceServiceError):
+    """無法連線推論服務（未啟動或連線中斷），呼叫端可退回本機推論"""
+    pass
+
+
+# ===================== Batching =====================
+
+class BatchingPredictor:
+    """
+    收集 window_ms 內送達的影像（最多 max_batch_size 張），合併成一次 predict_fn 呼叫。
+
+    predict_fn: 接收 (N, H, W, C) 陣列，回傳長度 N 的結果 list
+    check_fn: 送入前檢查單一請求（例如影像形狀），拋出例外時只有該請求失敗，不會進入批次
+    合併後的批次推論失敗時，改為逐一推論各請求，錯誤只回給有問題的請求。
+    """
+
+    def __init__(self, predict_fn, max_batch_size=32, window_ms=20, metrics_size=1000, check_fn=None):
+        self.predict_fn = predict_fn
+        self.check_fn = check_fn
+        self.max_batch_size = max_batch_size
+        self.window = window_ms / 1000.0
+
+        self._queue = queue.Queue()
+        self._metrics_lock = threading.Lock()
+        self._batch_sizes = deque(maxlen=metrics_size)
+        self._latencies = deque(maxlen=metrics_size)  # 每張影像從送入到完成的秒數
+        self._total_frames = 0
+        self._total_batches = 0
+
+        self._thread = threading.Thread(target=self._run, name="emotion-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, frames):
+        """送入 (n, H, W, C) 影像，回傳 Future，結果為長度 n 的 list"""
+        future = Future()
+        if self.check_fn is not None:
+            try:
+                self.check_fn(frames)
+            except Exception as e:
+                future.set_exception(e)
+                return future
+        self._queue.put((frames, future, time.perf_counter()))
+        return future
+
+    def predict(self, frames, timeout=None):
+        return self.submit(frames).result(timeout)
+
+    def stop(self):
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def _collect(self):
+        """取出一批待推論的請求；收到停止訊號時回傳 (items, True)"""
+        first = self._queue.get()
+        if first is _STOP:
+            return [], True
+
+        items = [first]
+        count = len(first[0])
+        deadline = time.perf_counter() + self.window
+        while count < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return items, True
+            items.append(item)
+            count += len(item[0])
+        return items, False
+
+    def _run(self):
+        while True:
+            items, stopping = self._collect()
+            if items:
+                self._process(items)
+            if stopping:
+                return
+
+    def _process(self, items):
+        try:
+            batch = np.concatenate([frames for frames, _, _ in items], axis=0)
+            results = self.predict_fn(batch)
+        except Exception as e:
+            if len(items) > 1:
+                logger.warning(f"Batch inference error, retrying {len(items)} requests one by one: {e}")
+                for item in items:
+                    self._process([item])
+                return
+            logger.error(f"Batch inference error: {e}")
+            items[0][1].set_exception(e)
+            return
+
+        done = time.perf_counter()
+        offset = 0
+        for frames, future, submitted in items:
+            n = len(frames)
+            future.set_result(results[offset:offset + n])
+            offset += n
+
+        with self._metrics_lock:
+            self._total_batches += 1
+            self._total_frames += len(batch)
+            self._batch_sizes.append(len(batch))
+            for frames, _, submitted in items:
+                self._latencies.extend([done - submitted] * len(frames))
+
+    def metrics(self):
+        """批次大小與延遲統計（延遲單位：毫秒，取最近的樣本）"""
+        with self._metrics_lock:
+            sizes = np.array(self._batch_sizes, dtype=np.float64)
+            latencies = np.array(self._latencies, dtype=np.float64) * 1000
+            data = {
+                "total_frames": self._total_frames,
+                "total_batches": self._total_batches,
+                "queue_depth": self._queue.qsize(),
+                "max_batch_size": self.max_batch_size,
+                "window_ms": self.window * 1000,
+            }
+        data["avg_batch_size"] = float(sizes.mean()) if sizes.size else 0.0
+        data["max_observed_batch_size"] = int(sizes.max()) if sizes.size else 0
+        for p in (50, 95, 99):
+            data[f"latency_p{p}_ms"] = float(np.percentile(latencies, p)) if latencies.size else 0.0
+        return data
+
+
+# ===================== Socket protocol =====================
+
+def _recv_exact(sock, size):
+    buf = bytearray(size)
+    view = memoryview(buf)
+    received = 0
+    while received < size:
+        n = sock.recv_into(view[received:], size - received)
+        if n == 0:
+            raise ConnectionError("socket closed")
+        received += n
+    return buf
+
+
+def send_message(sock, header, payload=b""):
+    header_bytes = json.dumps(header).encode("utf-8")
+    sock.sendall(_PREFIX.pack(len(header_bytes), len(payload)) + header_bytes)
+    if payload:
+        sock.sendall(payload)
+
+
+def recv_message(sock):
+    header_len, payload_len = _PREFIX.unpack(_recv_exact(sock, _PREFIX.size))
+    header = json.loads(bytes(_recv_exact(sock, header_len)).decode("utf-8"))
+    payload = _recv_exact(sock, payload_len) if payload_len else b""
+    return header, payload
+
+
+# ===================== Server =====================
+
+class _InferenceHandler(socketserver.BaseRequestHandler):
+    """每個連線可連續送出多筆請求（worker 端會重用連線）"""
+
+    def handle(self):
+        while True:
+            try:
+                header, payload = recv_message(self.request)
+            except (ConnectionError, struct.error):
+                return
+            try:
+                send_message(self.request, self._dispatch(header, payload))
+            except OSError:
+                return
+
+    def _dispatch(self, header, payload):
+        op = header.get("op")
+        try:
+            if op == "predict":
+                frames = np.frombuffer(payload, dtype=header["dtype"]).reshape(header["shape"])
+                results = self.server.batcher.predict(frames, timeout=self.server.request_timeout)
+                return {"ok": True, "results": results}
+            if op == "metrics":
+                return {"ok": True, "metrics": self.server.batcher.metrics()}
+            return {"ok": False, "error": f"unknown op: {op}"}
+        except Exception as e:
+            return {"ok": False, "error": str(e)}
+
+
+class InferenceServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path, batcher, request_timeout=10.0):
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)  # 上次未正常關閉留下的 socket 檔
+        self.batcher = batcher
+        self.request_timeout = request_timeout
+        super().__init__(socket_path, _InferenceHandler)
+
+
+def serve(socket_path, predict_fn, max_batch_size=32, window_ms=20, check_fn=None):
+    """啟動批次推論服務（阻塞直到中斷）"""
+    batcher = BatchingPredictor(predict_fn, max_batch_size=max_batch_size, window_ms=window_ms, check_fn=check_fn)
+    server = InferenceServer(socket_path, batcher)
+    logger.info(f"Emotion inference server listening on {socket_path}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        batcher.stop()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+# ===================== Client =====================
+
+class RemotePredictor:
+    """Django worker 端 client，每個執行緒各自保留一條連線"""
+
+    def __init__(self, socket_path, timeout=10.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        return sock
+
+    def _close(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+    def _request(self, header, payload=b""):
+        """
+        連不上服務時拋出 InferenceConnectionError；
+        服務回傳錯誤或逾時拋出 InferenceServiceError（服務仍在運作，由呼叫端回報錯誤）
+        """
+        # 重用的連線可能已被服務端關閉，失敗時重連一次
+        for attempt in range(2):
+            if getattr(self._local, "sock", None) is None:
+                try:
+                    self._local.sock = self._connect()
+                except OSError as e:
+                    raise InferenceConnectionError(f"推論服務連線失敗: {e}") from e
+            try:
+                send_message(self._local.sock, header, payload)
+                response, _ = recv_message(self._local.sock)
+                break
+            except socket.timeout as e:
+                self._close()
+                raise InferenceServiceError(f"推論服務逾時: {e}") from e
+            except (OSError, ConnectionError, struct.error) as e:
+                self._close()
+                if attempt == 1:
+                    raise InferenceConnectionError(f"推論服務連線中斷: {e}") from e
+        if not response.get("ok"):
+            raise InferenceServiceError(response.get("error", "unknown error"))
+        return response
+
+    def predict(self, frames):
+        frames = np.ascontiguousarray(frames)
+        header = {"op": "predict", "shape": list(frames.shape), "dtype": frames.dtype.str}
+        return self._request(header, memoryview(frames).cast("B"))["results"]
+
+    def metrics(self):
+        return self._request({"op": "metrics"})["metrics"]
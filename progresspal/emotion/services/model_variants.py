@@ -0,0 +1,152 @@
+# emotion/services/model_variants.py
+"""
+產生與評估較小的模型版本（int8 量化、降低輸入解析度）
+"""
+import os
+import time
+
+import cv2
+import keras
+import numpy as np
+
+from emotion.emotion_model import EMOTION_LABELS, MODEL_VARIANTS, get_input_shape, get_model_path
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+class VariantExportError(Exception):
+    """模型架構無法轉成指定版本"""
+    pass
+
+
+# ===================== Export =====================
+
+def export_int8(model):
+    """
+    Dense 類權重量化為 int8（per-channel scale）。
+    Keras 目前不量化卷積層，這些層維持 float32。
+    """
+    model.quantize("int8")
+    return model
+
+
+def export_resized(model, input_size):
+    """
+    以相同權重建立輸入為 input_size×input_size 的模型。
+    只適用於全卷積 + global pooling 的架構；含 Flatten 等與解析度相關的層會失敗。
+    """
+    config = model.get_config()
+    layers = config.get("layers", [])
+    if not layers or layers[0].get("class_name") != "InputLayer":
+        raise VariantExportError("找不到 InputLayer，無法調整輸入尺寸")
+
+    batch_shape = list(layers[0]["config"]["batch_shape"])
+    batch_shape[1:3] = [input_size, input_size]
+    layers[0]["config"]["batch_shape"] = batch_shape
+
+    try:
+        resized = model.__class__.from_config(config)
+        resized.set_weights(model.get_weights())
+    except ValueError as e:
+        raise VariantExportError(f"權重形狀與解析度相關，無法直接降低解析度: {e}")
+    return resized
+
+
+def export_variant(variant, source_path=None):
+    """由原始模型產生指定版本並存檔，回傳輸出路徑"""
+    if variant not in MODEL_VARIANTS or variant == "float32":
+        raise VariantExportError(f"無法匯出版本: {variant}")
+
+    model = keras.models.load_model(source_path or get_model_path("float32"))
+    if variant == "int8":
+        exported = export_int8(model)
+    else:
+        exported = export_resized(model, MODEL_VARIANTS[variant]["input_size"])
+
+    output_path = get_model_path(variant)
+    exported.save(output_path)
+    return output_path
+
+
+# ===================== Evaluate =====================
+
+def load_eval_images(data_dir):
+    """
+    讀取評估用的人臉灰階圖片。
+    若圖片放在以情緒名稱命名的子資料夾中（例如 data/投入/xxx.jpg），會一併回傳標籤索引。
+    回傳 (images, labels)，labels 中未標註的為 -1。
+    """
+    images, labels = [], []
+    for root, _, files in os.walk(data_dir):
+        folder = os.path.basename(root)
+        label = EMOTION_LABELS.index(folder) if folder in EMOTION_LABELS else -1
+        for name in sorted(files):
+            if not name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            img = cv2.imread(os.path.join(root, name), cv2.IMREAD_GRAYSCALE)
+            if img is None:
+                continue
+            images.append(img)
+            labels.append(label)
+    return images, np.array(labels, dtype=np.int64)
+
+
+def prepare_batch(images, variant):
+    h, w, _ = get_input_shape(variant)
+    resized = [cv2.resize(img, (w, h), interpolation=cv2.INTER_AREA) for img in images]
+    return np.stack(resized).astype("float32")[..., None]
+
+
+def weights_nbytes(model):
+    return int(sum(np.asarray(w).nbytes for w in model.get_weights()))
+
+
+def measure_throughput(model, batch, rounds=3):
+    """回傳 (單張 p50 延遲 ms, 整批 frames/sec)"""
+    single = batch[:1]
+    model.predict_on_batch(single)  # warm-up
+    latencies = []
+    for _ in range(max(10, rounds * 10)):
+        start = time.perf_counter()
+        model.predict_on_batch(single)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        model.predict_on_batch(batch)
+    elapsed = time.perf_counter() - start
+    return float(np.percentile(latencies, 50)), len(batch) * rounds / elapsed
+
+
+def evaluate_variants(images, labels, variants):
+    """
+    以 float32 原始模型為基準，回傳各版本的：
+    與原始模型預測一致率、標註準確率（有標註時）、單張延遲、吞吐量、權重記憶體、檔案大小。
+    找不到 float32 模型檔時沒有基準，各版本的一致率為 None（不以其他版本代替）。
+    """
+    reports = []
+    reference = None
+    for variant in ["float32"] + [v for v in variants if v != "float32"]:
+        path = get_model_path(variant)
+        if not os.path.exists(path):
+            reports.append({"variant": variant, "error": f"找不到模型檔 {path}"})
+            continue
+
+        model = keras.models.load_model(path)
+        batch = prepare_batch(images, variant)
+        preds = np.argmax(keras.ops.convert_to_numpy(model.predict_on_batch(batch)), axis=1)
+        if variant == "float32":
+            reference = preds
+
+        labelled = labels >= 0
+        latency_ms, fps = measure_throughput(model, batch)
+        reports.append({
+            "variant": variant,
+            "agreement": float(np.mean(preds == reference)) if reference is not None else None,
+            "accuracy": float(np.mean(preds[labelled] == labels[labelled])) if labelled.any() else None,
+            "latency_p50_ms": latency_ms,
+            "frames_per_sec": fps,
+            "weights_mb": weights_nbytes(model) / 1024 / 1024,
+            "file_mb": os.path.getsize(path) / 1024 / 1024,
+        })
+    return reports
@@ -4,13 +4,16 @@ import cv2
 import math
 import logging
 import os
+import threading
 import time
+from django.conf import settings
+from django.core.cache import cache
 from django.core.files.uploadedfile import InMemoryUploadedFile, TemporaryUploadedFile
+from emotion.emotion_model import get_input_shape
 
 logger = logging.getLogger(__name__)
 
 # ===================== Config =====================
-IMG_W, IMG_H = 224, 224
 HAAR_DIR = cv2.data.haarcascades
 FACE_CASCADE = cv2.CascadeClassifier(os.path.join(HAAR_DIR, "haarcascade_frontalface_default.xml"))
 EYE_CASCADE = cv2.CascadeClassifier(os.path.join(HAAR_DIR, "haarcascade_eye.xml"))
@@ -22,6 +25,24 @@ if FACE_CASCADE.empty():
 if EYE_CASCADE.empty():
     logger.critical(f"無法載入眼睛偵測模型！請檢查路徑 ")
 
+# OpenCV DNN 人臉偵測 (YuNet)，EMOTION_FACE_DETECTOR = 'dnn' 時使用；檔案不存在時退回 Haar
+DNN_MODEL_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "face_detection_yunet_2023mar.onnx")
+DNN_SCORE_THRESHOLD = 0.8
+
+MIN_FACE_SIZE = 60      # 原始解析度下的最小臉部尺寸
+HAAR_WINDOW_SIZE = 24   # frontalface_default 的最小偵測視窗
+TRACK_MARGIN = 0.5      # 追蹤區域向外擴張的比例（相對於上一張臉的寬高）
+EYE_DETECT_WIDTH = 200  # 眼睛偵測前臉部影像縮小到的寬度
+
+_local = threading.local()
+
+def warm_up_cascades():
+    """以空白影像跑一次偵測，讓 OpenCV 預先配置影像金字塔與特徵快取"""
+    blank = np.zeros((240, 320), dtype=np.uint8)
+    FACE_CASCADE.detectMultiScale(blank, 1.1, 5, minSize=(60, 60))
+    if not EYE_CASCADE.empty():
+        EYE_CASCADE.detectMultiScale(blank[:120, :120], scaleFactor=1.1, minNeighbors=3, minSize=(10, 10))
+
 # ===================== Custom Exceptions =====================
 class InvalidImageError(Exception):
     """當影像無法讀取、解碼或格式錯誤時拋出"""
@@ -35,7 +56,10 @@ class NoFaceDetectedError(Exception):
 
 def _align_by_eyes(face_gray):
     h, w = face_gray.shape
-    eyes = EYE_CASCADE.detectMultiScale(face_gray, scaleFactor=1.1, minNeighbors=3, minSize=(10, 10))
+    # 眼睛偵測在縮小的臉部影像上進行，角度不受縮放影響
+    scale = min(1.0, EYE_DETECT_WIDTH / w)
+    small = face_gray if scale == 1.0 else cv2.resize(face_gray, (round(w * scale), round(h * scale)), interpolation=cv2.INTER_AREA)
+    eyes = EYE_CASCADE.detectMultiScale(small, scaleFactor=1.1, minNeighbors=3, minSize=(10, 10))
     if len(eyes) < 2: 
         return face_gray
     eyes = sorted(eyes, key=lambda b: b[1])[:2]
@@ -47,18 +71,182 @@ def _align_by_eyes(face_gray):
     return cv2.warpAffine(face_gray, M, (w, h), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
 
 
+# ===================== Face Detection =====================
+
+def _get_dnn_detector():
+    """每個執行緒各自建立 FaceDetectorYN（detect 會改變 input size，不可共用）"""
+    if not hasattr(_local, "dnn_detector"):
+        _local.dnn_detector = None
+        if os.path.exists(DNN_MODEL_PATH):
+            _local.dnn_detector = cv2.FaceDetectorYN.create(DNN_MODEL_PATH, "", (320, 320), DNN_SCORE_THRESHOLD)
+        else:
+            logger.warning(f"找不到 DNN 人臉偵測模型 {DNN_MODEL_PATH}，改用 Haar Cascade")
+    return _local.dnn_detector
+
+
+def _detect_haar(gray, min_size):
+    min_size = max(HAAR_WINDOW_SIZE, int(min_size))
+    return [tuple(b) for b in FACE_CASCADE.detectMultiScale(gray, 1.1, 5, minSize=(min_size, min_size))]
+
+
+def _detect_dnn(detector, gray, min_size):
+    h, w = gray.shape
+    detector.setInputSize((w, h))
+    _, faces = detector.detect(cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR))
+    if faces is None:
+        return []
+    return [tuple(f[:4]) for f in faces if min(f[2], f[3]) >= min_size]
+
+
+def _detect_boxes(gray, min_face_size=MIN_FACE_SIZE):
+    """
+    先把影像縮小到 EMOTION_DETECT_MAX_WIDTH 再偵測，再把框換算回原始座標。
+    回傳 [(x, y, w, h), ...]
+    """
+    max_width = getattr(settings, "EMOTION_DETECT_MAX_WIDTH", 320)
+    h, w = gray.shape
+    scale = min(1.0, max_width / w) if max_width else 1.0
+    small = gray if scale == 1.0 else cv2.resize(gray, (round(w * scale), round(h * scale)), interpolation=cv2.INTER_AREA)
+
+    detector = _get_dnn_detector() if getattr(settings, "EMOTION_FACE_DETECTOR", "haar") == "dnn" else None
+    if detector is not None:
+        boxes = _detect_dnn(detector, small, min_face_size * scale)
+    else:
+        boxes = _detect_haar(small, min_face_size * scale)
+
+    results = []
+    for bx, by, bw, bh in boxes:
+        x, y = max(0, int(bx / scale)), max(0, int(by / scale))
+        results.append((x, y, min(int(bw / scale), w - x), min(int(bh / scale), h - y)))
+    return results
+
+
+def _track_key(user_id):
+    return f"emotion:face_box:{user_id}"
+
+
+def _expand_box(box, shape):
+    """以上一張臉為中心向外擴張 TRACK_MARGIN，限制在影像範圍內"""
+    x, y, w, h = box
+    img_h, img_w = shape
+    mx, my = int(w * TRACK_MARGIN), int(h * TRACK_MARGIN)
+    x0, y0 = max(0, x - mx), max(0, y - my)
+    return x0, y0, min(img_w, x + w + mx), min(img_h, y + h + my)
+
+
+def detect_face(frame_gray, user_id=None, min_face_size=MIN_FACE_SIZE):
+    """
+    回傳最大的一張臉 (x, y, w, h)，找不到時拋出 NoFaceDetectedError。
+    有 user_id 時會記住上一張臉的位置，下一張影像先只在該位置附近搜尋，找不到再搜尋全圖。
+    min_face_size: frame_gray 座標下的最小臉部尺寸（解碼時已縮小的影像要等比例縮小）
+    """
+    box = None
+    last = cache.get(_track_key(user_id)) if user_id is not None else None
+    if last is not None:
+        x0, y0, x1, y1 = _expand_box(last, frame_gray.shape)
+        region = frame_gray[y0:y1, x0:x1]
+        if region.size:
+            boxes = _detect_boxes(region, min_face_size)
+            if boxes:
+                bx, by, bw, bh = max(boxes, key=lambda b: b[2] * b[3])
+                box = (bx + x0, by + y0, bw, bh)
+
+    if box is None:
+        boxes = _detect_boxes(frame_gray, min_face_size)
+        if not boxes:
+            if user_id is not None:
+                cache.delete(_track_key(user_id))
+            raise NoFaceDetectedError("no face")
+        # 取面積最大的一張臉
+        box = max(boxes, key=lambda b: b[2] * b[3])
+
+    box = tuple(int(v) for v in box)
+    if user_id is not None:
+        cache.set(_track_key(user_id), box, getattr(settings, "EMOTION_FACE_TRACK_TIMEOUT", 30))
+    return box
+
+
+# ===================== Decode =====================
+
+# JPEG Start Of Frame 標記（C4 / C8 / CC 為其他用途）
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+_REDUCED_FLAGS = ((4, cv2.IMREAD_REDUCED_GRAYSCALE_4), (2, cv2.IMREAD_REDUCED_GRAYSCALE_2))
+
+
+def jpeg_dimensions(buf):
+    """
+    只讀 JPEG 標頭取得 (width, height)，不解碼影像；不是 JPEG 或標頭不完整時回傳 None
+    """
+    data = memoryview(buf).cast("B")
+    if len(data) < 4 or data[0] != 0xFF or data[1] != 0xD8:
+        return None
+    pos = 2
+    while pos + 4 <= len(data):
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+        if marker == 0xFF:  # 填充位元組
+            pos += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD7:  # 沒有長度欄位的標記
+            pos += 2
+            continue
+        length = (data[pos + 2] << 8) | data[pos + 3]
+        if marker in _JPEG_SOF_MARKERS:
+            if pos + 9 > len(data):
+                return None
+            height = (data[pos + 5] << 8) | data[pos + 6]
+            width = (data[pos + 7] << 8) | data[pos + 8]
+            return width, height
+        pos += 2 + length
+    return None
+
+
+def choose_decode_flag(buf):
+    """
+    依 JPEG 標頭尺寸選擇解碼方式，回傳 (imread flag, 縮小倍率)。
+    在縮小後寬度仍不小於 EMOTION_DECODE_MIN_WIDTH 的前提下選最大的倍率，
+    讓 libjpeg 在解碼時直接輸出縮小的灰階影像（DCT 縮放，不另外產生全尺寸 BGR 影像）。
+    """
+    if getattr(settings, "EMOTION_DECODE_MODE", "reduced") == "color":
+        return cv2.IMREAD_COLOR, 1
+
+    dims = jpeg_dimensions(buf)
+    if dims is not None:
+        min_width = getattr(settings, "EMOTION_DECODE_MIN_WIDTH", 640)
+        for factor, flag in _REDUCED_FLAGS:
+            if dims[0] // factor >= min_width:
+                return flag, factor
+    return cv2.IMREAD_GRAYSCALE, 1
+
+
+def decode_frame(buf):
+    """
+    解碼為灰階影像，回傳 (frame_gray, 縮小倍率)；無法解碼時拋出 InvalidImageError
+    """
+    np_arr = np.frombuffer(buf, np.uint8)
+    flag, factor = choose_decode_flag(np_arr)
+    frame = cv2.imdecode(np_arr, flag)
+    if frame is None:
+        logger.error("cv2.imdecode returned None. Image format might be invalid.")
+        raise InvalidImageError("無法解碼影像")
+    if frame.ndim == 3:
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return frame, factor
+
 
 # ===================== Main Process =====================
 
-def preprocess_frame(uploaded_file):
+def extract_face(uploaded_file, user_id=None):
     """
-    主函式：接收 Django UploadedFile -> 預處理 -> Keras Model Input Format
+    接收 Django UploadedFile -> 解碼、偵測、對齊 -> 模型輸入尺寸的灰階臉部影像
     
     Args:
         uploaded_file: Django 的 InMemoryUploadedFile 物件 (前端上傳的圖片)
+        user_id: 使用者 id，用來追蹤上一張臉的位置以縮小搜尋範圍 (可省略)
     
     Returns:
-        face_final: 預處理完成的 numpy array，形狀為 (1, 224, 224, 1)
+        resized: uint8 numpy array，形狀為 (H, W)，預設 (224, 224)
     """
     
     # # 建立 debug 資料夾
@@ -78,8 +266,11 @@ def preprocess_frame(uploaded_file):
         if hasattr(uploaded_file, 'seek'):
             uploaded_file.seek(0)
             
-        # [Step B] 讀取 Bytes
-        file_content = uploaded_file.read()
+        # [Step B] 讀取 Bytes（FrameUpload 直接取 memoryview，不複製）
+        if hasattr(uploaded_file, 'getbuffer'):
+            file_content = uploaded_file.getbuffer()
+        else:
+            file_content = uploaded_file.read()
         file_size = len(file_content)
         logger.info(f"Preprocess received file size: {file_size} bytes")
 
@@ -92,22 +283,17 @@ def preprocess_frame(uploaded_file):
         # with open(raw_filename, "wb") as f:
         #     f.write(file_content)
         
-        # [Step D] 解碼
-        np_arr = np.frombuffer(file_content, np.uint8)
-        frame_bgr = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
-
-        if frame_bgr is None:
-            logger.error("cv2.imdecode returned None. Image format might be invalid.")
-            raise InvalidImageError("無法解碼影像")
+        # [Step D] 解碼 (直接解碼為灰階，大圖在解碼時就縮小)
+        frame_gray, decode_factor = decode_frame(file_content)
 
         # # [Step E] 檢查解碼後的亮度
-        # avg_brightness = np.mean(frame_bgr)
+        # avg_brightness = np.mean(frame_gray)
         # logger.info(f"Decoded Image Brightness: {avg_brightness:.2f}")
         
         # # 存下解碼後的圖
         # # 如果 raw 是好的，但這張是黑的，代表 OpenCV 解碼有問題
         # decoded_filename = f"{debug_dir}/step2_decoded_{timestamp}.jpg"
-        # cv2.imwrite(decoded_filename, frame_bgr)
+        # cv2.imwrite(decoded_filename, frame_gray)
 
         # if avg_brightness < 5:
         #     logger.warning("警告：解碼後的影像極暗 (全黑)")
@@ -117,21 +303,12 @@ def preprocess_frame(uploaded_file):
         raise InvalidImageError(f"讀取影像失敗: {e}")
 
     logger.info("Info: 影像讀取與解碼成功")
-    
-    h_img, w_img, _ = frame_bgr.shape
 
 
     # -----------------------------------------------------------
-    # Step 2: 臉部偵測 (Haar Cascade)+灰階
+    # Step 2: 臉部偵測 (縮小後偵測，框換算回原圖)
     # -----------------------------------------------------------
-    frame_gray = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY)
-   
-    results = FACE_CASCADE.detectMultiScale(frame_gray, 1.1, 5, minSize=(60,60))
-    if len(results) == 0:
-        raise NoFaceDetectedError("no face")
-
-    # 取信心度最高的一張臉
-    x,y,w,h = max(results, key=lambda b:b[2]*b[3])
+    x, y, w, h = detect_face(frame_gray, user_id, min_face_size=MIN_FACE_SIZE / decode_factor)
     roi = frame_gray[y:y+h, x:x+w]
     
     # -----------------------------------------------------------
@@ -141,16 +318,53 @@ def preprocess_frame(uploaded_file):
     # -----------------------------------------------------------
     # Step 4: Resize & Normalize (Model Prep)
     # -----------------------------------------------------------
+    # 輸入尺寸依模型版本而定 (預設 224×224)
+    img_h, img_w, _ = get_input_shape()
     try:
-        resized = cv2.resize(aligned, (IMG_W, IMG_H), interpolation=cv2.INTER_AREA)
+        resized = cv2.resize(aligned, (img_w, img_h), interpolation=cv2.INTER_AREA)
     except Exception:
         raise NoFaceDetectedError("Resize failed")
 
-    # 轉換格式給模型 (1, 224, 224, 1)
-    # 1. 轉 float32
-    # 2. 增加通道維度 (H, W) -> (H, W, 1)
-    # 3. 增加 Batch 維度 (H, W, 1) -> (1, H, W, 1)
-    face_res = resized.astype(np.float32)[..., None]
-    face_final = np.expand_dims(face_res, axis=0)
+    return resized
+
 
-    return face_final
\ No newline at end of file
+def to_model_input(faces):
+    """
+    轉換格式給模型：N 張 (H, W) uint8 -> (N, H, W, 1) float32
+    只有堆疊與轉型是整批進行，各張的 resize 已在 extract_face 完成
+    """
+    return np.stack(faces).astype(np.float32)[..., None]
+
+
+def preprocess_frame(uploaded_file, user_id=None):
+    """
+    主函式：接收 Django UploadedFile -> 預處理 -> Keras Model Input Format
+    
+    Returns:
+        face_final: 預處理完成的 numpy array，形狀為 (1, H, W, 1)，預設 (1, 224, 224, 1)
+    """
+    return to_model_input([extract_face(uploaded_file, user_id)])
+
+
+def preprocess_frames(uploaded_files, user_id=None):
+    """
+    預處理多張影像（同一使用者依序拍攝，臉部追蹤可沿用上一張的位置）。
+    解碼、偵測、對齊與 resize 逐張進行（各張臉的大小不同，無法合併成一個陣列處理），
+    最後以 to_model_input 一次堆疊並轉型；省下的是每張一次的請求與模型推論成本，而非預處理本身。
+    單張失敗不影響其他張。
+
+    Returns:
+        (batch, indices, errors)
+        batch: (N, H, W, 1) float32，沒有任何成功的影像時為 None
+        indices: batch 中每一張對應的原始索引
+        errors: {原始索引: NoFaceDetectedError / InvalidImageError}
+    """
+    faces, indices, errors = [], [], {}
+    for i, uploaded_file in enumerate(uploaded_files):
+        try:
+            faces.append(extract_face(uploaded_file, user_id))
+            indices.append(i)
+        except (NoFaceDetectedError, InvalidImageError) as e:
+            errors[i] = e
+    batch = to_model_input(faces) if faces else None
+    return batch, indices, errors
\ No newline at end of file
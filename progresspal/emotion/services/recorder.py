@@ -0,0 +1,186 @@
+# emotion/services/recorder.py
+"""
+EmotionRecord 非同步批次寫入（write-behind）
+
+偵測結果先放進記憶體緩衝區，累積 flush_size 筆或每 flush_interval 秒，
+由背景執行緒以一次 bulk_create 寫入；行程結束時（atexit）寫入剩餘資料。
+
+寫入失敗時：
+- 整批失敗就逐筆重試，資料本身有問題的紀錄（IntegrityError / DataError，例如使用者已刪除）丟棄並記錄錯誤
+- 其他錯誤（例如資料庫暫時無法連線）保留在緩衝區，下次再寫
+- 緩衝區最多 max_pending 筆，超過時丟棄最舊的紀錄
+"""
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.db import DataError, IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+
+from accounts.services import rollups
+from emotion.models import EmotionRecord
+
+logger = logging.getLogger(__name__)
+
+# 模型輸出的中文情緒 -> EmotionRecord.emotion 的代碼
+LABEL_TO_CODE = {label: code for code, label in EmotionRecord.EMOTION_CHOICES}
+
+DEFAULTS = {
+    "enabled": True,
+    "flush_size": 50,
+    "flush_interval": 10,
+    "max_pending": 5000,
+}
+
+
+def get_buffer_config():
+    return {**DEFAULTS, **getattr(settings, "EMOTION_RECORD_BUFFER", {})}
+
+
+class EmotionRecordBuffer:
+
+    def __init__(self, flush_size=50, flush_interval=10, max_pending=5000):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_pending = max(max_pending, flush_size)
+        self._pending = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # 同一時間只有一個 bulk_create
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def __len__(self):
+        return len(self._pending)
+
+    def add(self, user_id, emotion, confidence, timestamp=None):
+        code = LABEL_TO_CODE.get(emotion)
+        if code is None:
+            logger.warning(f"Unknown emotion label, not recorded: {emotion}")
+            return
+        record = EmotionRecord(
+            user_id=user_id,
+            emotion=code,
+            confidence=confidence,
+            timestamp=timestamp or timezone.now(),
+        )
+        with self._lock:
+            self._pending.append(record)
+            self._trim()
+            full = len(self._pending) >= self.flush_size
+        self._ensure_thread()
+        if full:
+            self._wakeup.set()
+
+    def pending_for(self, user_id):
+        """緩衝區中該使用者尚未寫入的情緒代碼（由舊到新）"""
+        with self._lock:
+            return [r.emotion for r in self._pending if r.user_id == user_id]
+
+    def _trim(self):
+        """超過 max_pending 時丟棄最舊的紀錄（呼叫端持有 _lock）"""
+        overflow = len(self._pending) - self.max_pending
+        if overflow > 0:
+            del self._pending[:overflow]
+            logger.warning(f"EmotionRecord buffer full ({self.max_pending}), dropped {overflow} oldest records")
+
+    def flush(self):
+        """把目前緩衝區內容寫入資料庫，回傳寫入筆數"""
+        with self._flush_lock:
+            with self._lock:
+                records, self._pending = self._pending, []
+            if not records:
+                return 0
+            try:
+                EmotionRecord.objects.bulk_create(records, batch_size=self.flush_size)
+                written = records
+            except Exception as e:
+                logger.error(f"EmotionRecord bulk_create failed ({len(records)} records), retrying one by one: {e}")
+                written = self._write_one_by_one(records)
+            _update_rollups(written)
+            return len(written)
+
+    def _write_one_by_one(self, records):
+        """逐筆寫入，丟棄資料有問題的紀錄；遇到其他錯誤時把尚未寫入的紀錄放回緩衝區。回傳已寫入的紀錄"""
+        written = []
+        for i, record in enumerate(records):
+            try:
+                with transaction.atomic():
+                    record.save(force_insert=True)
+            except (IntegrityError, DataError) as e:
+                logger.error(f"Dropped invalid EmotionRecord (user {record.user_id}, {record.emotion}): {e}")
+                continue
+            except Exception as e:
+                logger.error(f"EmotionRecord write failed, keeping {len(records) - i} records: {e}")
+                with self._lock:
+                    self._pending[:0] = records[i:]
+                    self._trim()
+                break
+            written.append(record)
+        return written
+
+    def stop(self):
+        """停止背景執行緒並寫入剩餘資料"""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval + 5)
+        return self.flush()
+
+    def _ensure_thread(self):
+        if self._thread is None and not self._stopped.is_set():
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="emotion-record-writer", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            finally:
+                # 背景執行緒有自己的 DB 連線，寫完後依 CONN_MAX_AGE 關閉
+                close_old_connections()
+
+
+def _update_rollups(records):
+    # 紀錄已寫入，統計失敗只記錄錯誤（可用 rebuild_learning_rollups 重建）
+    try:
+        rollups.record_emotions(records)
+    except Exception as e:
+        logger.error(f"Daily emotion rollup failed ({len(records)} records): {e}")
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_record_buffer():
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                config = get_buffer_config()
+                _buffer = EmotionRecordBuffer(config["flush_size"], config["flush_interval"], config["max_pending"])
+                atexit.register(_buffer.stop)
+    return _buffer
+
+
+def pending_emotions(user_id):
+    """本行程緩衝區中該使用者尚未寫入資料庫的情緒代碼（由舊到新）；緩衝區尚未建立時為空"""
+    buffer = _buffer
+    return buffer.pending_for(user_id) if buffer is not None else []
+
+
+def record_emotion(user_id, emotion, confidence):
+    """記錄一次偵測結果；EMOTION_RECORD_BUFFER['enabled'] 為 False 時直接寫入"""
+    if not get_buffer_config()["enabled"]:
+        code = LABEL_TO_CODE.get(emotion)
+        if code is not None:
+            record = EmotionRecord.objects.create(user_id=user_id, emotion=code, confidence=confidence)
+            _update_rollups([record])
+        return
+    get_record_buffer().add(user_id, emotion, confidence)
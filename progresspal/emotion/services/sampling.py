@@ -0,0 +1,82 @@
+# emotion/services/sampling.py
+"""
+依情緒穩定度與伺服器負載建議下一次取樣間隔
+
+- 情緒連續相同且信心分數高：間隔逐步拉長（backoff），最多 max_ms
+- 情緒改變：立即縮短為 min_ms
+- 其他（信心低、找不到臉）：回到 base_ms
+- 全域負載係數：最近的處理延遲（EMA）超過 target_latency_ms 時，所有人的間隔依比例放大
+
+負載係數與各使用者的狀態存在預設的行程內 cache（CACHES['default']），每次偵測不必碰資料庫。
+每個 worker 依自己處理的請求估計延遲並放大間隔；同一使用者的請求分到不同 worker 時，
+backoff 各自從 base_ms 開始，只影響建議間隔，不影響辨識結果。
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+DEFAULTS = {
+    "base_ms": 5000,
+    "min_ms": 2000,
+    "max_ms": 30000,
+    "backoff": 1.5,
+    "stable_confidence": 0.7,
+    "target_latency_ms": 300,
+    "max_load_factor": 4.0,
+    "latency_alpha": 0.2,
+    "state_timeout": 600,
+}
+
+LATENCY_KEY = "emotion:sampling:latency_ema"
+
+
+def get_sampling_config():
+    return {**DEFAULTS, **getattr(settings, "EMOTION_SAMPLING", {})}
+
+
+def _state_key(user_id):
+    return f"emotion:sampling:{user_id}"
+
+
+# ===================== Load =====================
+
+def record_latency(latency_ms):
+    """以 EMA 累計本 worker 每次偵測的處理時間"""
+    alpha = get_sampling_config()["latency_alpha"]
+    ema = cache.get(LATENCY_KEY)
+    ema = latency_ms if ema is None else (1 - alpha) * ema + alpha * latency_ms
+    cache.set(LATENCY_KEY, ema, timeout=None)
+
+
+def get_load_factor():
+    """處理延遲 / 目標延遲，限制在 [1, max_load_factor]"""
+    config = get_sampling_config()
+    ema = cache.get(LATENCY_KEY)
+    if ema is None:
+        return 1.0
+    return min(config["max_load_factor"], max(1.0, ema / config["target_latency_ms"]))
+
+
+# ===================== Interval =====================
+
+def next_interval(user_id, emotion=None, confidence=0.0):
+    """
+    依本次結果更新使用者的取樣狀態，回傳建議的下一次間隔（毫秒）。
+    emotion 為 None 表示本次沒有可用結果（例如找不到臉）。
+    """
+    config = get_sampling_config()
+    key = _state_key(user_id)
+    state = cache.get(key) or {"emotion": None, "interval": config["base_ms"]}
+
+    if emotion is None:
+        interval = config["base_ms"]
+    elif state["emotion"] is not None and emotion != state["emotion"]:
+        interval = config["min_ms"]
+    elif emotion == state["emotion"] and confidence >= config["stable_confidence"]:
+        interval = state["interval"] * config["backoff"]
+    else:
+        interval = config["base_ms"]
+
+    interval = min(config["max_ms"], max(config["min_ms"], interval))
+    cache.set(key, {"emotion": emotion or state["emotion"], "interval": interval}, config["state_timeout"])
+
+    return int(min(config["max_ms"], interval * get_load_factor()))
@@ -0,0 +1,54 @@
+# emotion/services/stats.py
+"""
+影像處理計數：伺服器收到、拒絕（依原因）以及前端預先略過的張數。
+計數存在預設的行程內 cache（CACHES['default']），每次偵測不必碰資料庫；
+各 worker 各自累計，inference_metrics 回傳的是處理該請求的 worker 自啟動以來的計數，作為監控用的取樣。
+"""
+from django.core.cache import cache
+
+ACCEPTED = "accepted"
+NO_FACE = "no_face"
+INVALID_IMAGE = "invalid_image"
+TOO_LARGE = "too_large"
+CLIENT_SKIPPED = "client_skipped"  # 前端預檢（無變化、過暗、無臉）未上傳的張數
+
+FRAME_COUNTERS = (ACCEPTED, NO_FACE, INVALID_IMAGE, TOO_LARGE, CLIENT_SKIPPED)
+REJECTED = (NO_FACE, INVALID_IMAGE, TOO_LARGE)
+
+
+def _key(name):
+    return f"emotion:frames:{name}"
+
+
+def record_frames(name, count=1):
+    if count <= 0:
+        return
+    key = _key(name)
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key, count)
+    except ValueError:
+        # 在 add 與 incr 之間被清除
+        cache.set(key, count, timeout=None)
+
+
+def record_client_skipped(request):
+    """前端以 X-Emotion-Skipped header 回報自上次上傳後略過的張數"""
+    try:
+        skipped = int(request.headers.get("X-Emotion-Skipped", 0))
+    except ValueError:
+        return
+    record_frames(CLIENT_SKIPPED, min(skipped, 1000))
+
+
+def get_frame_counters():
+    values = cache.get_many([_key(name) for name in FRAME_COUNTERS])
+    counters = {name: values.get(_key(name), 0) for name in FRAME_COUNTERS}
+    received = counters[ACCEPTED] + sum(counters[name] for name in REJECTED)
+    counters["rejected"] = received - counters[ACCEPTED]
+    counters["rejected_ratio"] = counters["rejected"] / received if received else 0.0
+    return counters
+
+
+def reset_frame_counters():
+    cache.delete_many([_key(name) for name in FRAME_COUNTERS])
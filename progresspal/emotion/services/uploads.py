@@ -0,0 +1,159 @@
+# emotion/services/uploads.py
+"""
+情緒辨識影像上傳：不落地、不多餘複製
+
+- FrameUploadHandler：multipart 上傳時，依 Content-Length 預先配置一塊 bytearray，
+  各檔案的資料直接寫入其中的一段，不經過 BytesIO / 暫存檔
+- read_raw_frame：Content-Type 為 image/jpeg 的原始 body 直接讀進預先配置的緩衝區
+- FrameUpload：以 memoryview 提供資料，交給 np.frombuffer / cv2.imdecode 時不複製
+"""
+from django.conf import settings
+from django.http import QueryDict
+from django.utils.datastructures import MultiValueDict
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopFutureHandlers, StopUpload
+
+RAW_CONTENT_TYPES = ("image/jpeg", "image/png")
+RAW_CHUNK_SIZE = 64 * 1024
+
+
+class FrameTooLargeError(Exception):
+    """上傳的影像超過 EMOTION_MAX_UPLOAD_BYTES"""
+    pass
+
+
+def get_max_upload_bytes():
+    return getattr(settings, "EMOTION_MAX_UPLOAD_BYTES", 2 * 1024 * 1024)
+
+
+def get_content_length(request):
+    try:
+        return int(request.META.get("CONTENT_LENGTH") or 0)
+    except ValueError:
+        return 0
+
+
+def check_content_length(request):
+    """在讀取 body 之前依 Content-Length 拒絕過大的請求"""
+    if get_content_length(request) > get_max_upload_bytes():
+        raise FrameTooLargeError(f"影像超過上限 {get_max_upload_bytes()} bytes")
+
+
+class FrameUpload(UploadedFile):
+    """資料存放在共用緩衝區中一段的上傳檔案"""
+
+    def __init__(self, view, name, content_type, charset=None, content_type_extra=None):
+        super().__init__(None, name, content_type, len(view), charset, content_type_extra)
+        self._view = view
+        self._pos = 0
+
+    def getbuffer(self):
+        """回傳 memoryview（不複製）"""
+        return self._view
+
+    def open(self, mode=None):
+        self._pos = 0
+        return self
+
+    def seek(self, pos, whence=0):
+        self._pos = pos
+        return pos
+
+    def read(self, size=-1):
+        end = self.size if size is None or size < 0 else min(self.size, self._pos + size)
+        data = bytes(self._view[self._pos:end])
+        self._pos = end
+        return data
+
+    def chunks(self, chunk_size=None):
+        yield bytes(self._view)
+
+    def multiple_chunks(self, chunk_size=None):
+        return False
+
+    def close(self):
+        pass
+
+
+class FrameUploadHandler(FileUploadHandler):
+    """
+    只用於情緒辨識的上傳 view（取代預設 handlers）。
+    整個請求只配置一次緩衝區。Content-Length 超過上限時完全不讀取 body；
+    未帶長度的請求寫滿緩衝區時以 StopUpload 中止。兩者 request.FILES 皆為空，
+    view 依 self.too_large 回傳 413。
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.max_bytes = get_max_upload_bytes()
+        self.too_large = False
+        self.buffer = None
+        self.offset = 0   # 目前檔案在緩衝區中的起點
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        if content_length > self.max_bytes:
+            # 視為已處理並回傳空結果，不讀取 body
+            self.too_large = True
+            return QueryDict(encoding=encoding), MultiValueDict()
+        # 檔案內容必定小於整個 body，一次配置即可
+        self.buffer = bytearray(content_length or self.max_bytes)
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        raise StopFutureHandlers()
+
+    def receive_data_chunk(self, raw_data, start):
+        end = self.offset + start + len(raw_data)
+        if end > len(self.buffer):
+            self.too_large = True
+            raise StopUpload(connection_reset=True)
+        self.buffer[self.offset + start:end] = raw_data
+        return None
+
+    def file_complete(self, file_size):
+        view = memoryview(self.buffer)[self.offset:self.offset + file_size]
+        self.offset += file_size
+        return FrameUpload(view, self.file_name, self.content_type, self.charset, self.content_type_extra)
+
+
+def read_raw_frame(request):
+    """
+    讀取 Content-Type 為 image/jpeg（或 image/png）的原始 body，回傳 FrameUpload。
+    需有 Content-Length；超過上限時拋出 FrameTooLargeError。
+    """
+    check_content_length(request)
+    length = get_content_length(request)
+    if length == 0:
+        return None
+
+    buffer = bytearray(length)
+    view = memoryview(buffer)
+    received = 0
+    while received < length:
+        chunk = request.read(min(RAW_CHUNK_SIZE, length - received))
+        if not chunk:
+            break
+        view[received:received + len(chunk)] = chunk
+        received += len(chunk)
+    return FrameUpload(view[:received], "frame", request.content_type)
+
+
+def get_uploaded_frame(request, field_name="image"):
+    """
+    取得上傳的影像：原始 image/jpeg body 或 multipart 欄位 field_name。
+    沒有影像時回傳 None；過大時拋出 FrameTooLargeError。
+    """
+    if request.content_type in RAW_CONTENT_TYPES:
+        return read_raw_frame(request)
+
+    frames = get_uploaded_frames(request, field_name)
+    return frames[0] if frames else None
+
+
+def get_uploaded_frames(request, field_name="frames"):
+    """取得 multipart 欄位 field_name 的所有影像；過大時拋出 FrameTooLargeError"""
+    check_content_length(request)
+    frames = request.FILES.getlist(field_name)
+    if not frames and any(getattr(h, "too_large", False) for h in request.upload_handlers):
+        raise FrameTooLargeError(f"影像超過上限 {get_max_upload_bytes()} bytes")
+    return frames
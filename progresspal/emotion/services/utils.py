@@ -11,6 +11,21 @@ EMOTION_TO_ENGAGEMENT = {
 POSITIVE = {"喜悅", "投入", "驚訝"}
 NEGATIVE = {"無聊", "挫折"}
 
+#指數平滑係數，越大越重視最近的情緒
+EMA_ALPHA = 0.4
+
+#困惑情緒依下一個情緒決定分數（next_e 為 None 表示困惑是最後一個）
+def confused_score(next_e):
+  if next_e in POSITIVE: #後續為正向
+    return 1.0
+  if next_e in NEGATIVE: #後續為負向
+    return 0.0
+  return 0.5 #後續為困惑或沒有後續
+
+#EMA 分數轉成參與度等級
+def engagement_level(ema):
+  return "high" if ema >= 0.5 else "low"
+
 #情緒字串轉成對應的參與度分數
 def map_emotion_to_score(emotion):
   scores = []
@@ -19,16 +34,7 @@ def map_emotion_to_score(emotion):
   for i, e in enumerate(emotion):
     #困惑情緒處理
     if e == "困惑":
-      if i + 1 < n: #有下一個情緒
-        next_e = emotion[i + 1]
-        if next_e in POSITIVE: #後續為正向
-          scores.append(1.0) #分數設為1.0
-        elif next_e in NEGATIVE: #後續為負向
-          scores.append(0.0) #分數設為0.0
-        else: #後續為困惑
-          scores.append(0.5) #分數設為0.5
-      else: #最後一個為困惑
-        scores.append(0.5) #設為0.5
+      scores.append(confused_score(emotion[i + 1] if i + 1 < n else None))
     else:
       if e not in EMOTION_TO_ENGAGEMENT:
         raise ValueError(f"未知情緒: {e}")
@@ -56,12 +62,8 @@ def compute_engagement(emotions):
     #return sum(scores) / len(scores)
 
   #指數平滑法
-  alpha = 0.4  #越大越重視最近的情緒
   ema = scores[0]
   for x in scores[1:]:
-    ema = alpha * x + (1 - alpha) * ema
+    ema = EMA_ALPHA * x + (1 - EMA_ALPHA) * ema
 
-  if ema >= 0.5:
-    return "high"
-  else:
-    return "low"
\ No newline at end of file
+  return engagement_level(ema)
\ No newline at end of file
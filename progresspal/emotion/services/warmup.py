@@ -0,0 +1,183 @@
+# emotion/services/warmup.py
+"""
+啟動預載與就緒狀態
+
+由 EmotionConfig.ready() 依 EMOTION_PRELOAD 設定呼叫 start_preload()，
+依序載入並預熱：情緒模型、Haar cascades、RAG embeddings。
+/emotion/ready/ 以 get_readiness() 回報各元件狀態。
+載入失敗的元件（例如推論服務比 worker 晚啟動）在背景以指數退避重試，成功後即回報就緒，不必重啟 worker。
+"""
+import logging
+import os
+import sys
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+PRELOAD_MODES = ("off", "background", "blocking")
+
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+LAZY = "lazy"  # EMOTION_PRELOAD=off：第一次使用時才載入
+
+RETRY_BASE_SECONDS = 5
+RETRY_MAX_SECONDS = 300
+
+_state_lock = threading.Lock()
+_state = {}
+_preload_thread = None
+_stop_retry = threading.Event()
+
+
+# ===================== Components =====================
+
+def _warm_model():
+    from emotion.emotion_model import get_remote_predictor, load_emotion_model
+
+    remote = get_remote_predictor()
+    if remote is not None:
+        # 由共用推論服務持有模型，只確認服務可連線
+        remote.metrics()
+        return
+    load_emotion_model()
+
+
+def _warm_cascades():
+    from emotion.services.preprocess import warm_up_cascades
+    warm_up_cascades()
+
+
+def _warm_embeddings():
+    from rag.services.rag import warm_up_embeddings
+    warm_up_embeddings()
+
+
+COMPONENTS = {
+    "model": _warm_model,
+    "haar_cascades": _warm_cascades,
+    "embeddings": _warm_embeddings,
+}
+
+
+def _set_state(name, status, **extra):
+    with _state_lock:
+        _state[name] = {"status": status, **extra}
+
+
+def reset_state():
+    """清除狀態並停止進行中的重試"""
+    global _stop_retry
+    _stop_retry.set()
+    _stop_retry = threading.Event()
+    with _state_lock:
+        _state.clear()
+
+
+# ===================== Preload =====================
+
+def get_preload_mode():
+    mode = getattr(settings, "EMOTION_PRELOAD", "background")
+    if mode not in PRELOAD_MODES:
+        raise RuntimeError(f"未知的 EMOTION_PRELOAD: {mode}，可用: {', '.join(PRELOAD_MODES)}")
+    return mode
+
+
+# 會處理請求的 server 程式（sys.argv[0] 的檔名）
+SERVER_PROGRAMS = ("gunicorn", "uwsgi", "daphne", "uvicorn", "hypercorn", "waitress-serve", "mod_wsgi")
+
+
+def should_preload(argv=None):
+    """
+    只在實際提供服務的行程預載：
+    WSGI / ASGI server，或 runserver 的子行程（autoreload 的父行程不處理請求）。
+    migrate、test 等管理指令與 benchmark 等獨立腳本不預載。
+    """
+    argv = sys.argv if argv is None else argv
+    if not argv:
+        return True  # 內嵌於 web server 的直譯器（例如 mod_wsgi）
+    if os.path.basename(argv[0]).startswith(SERVER_PROGRAMS):
+        return True
+    if len(argv) < 2 or argv[1] != "runserver":
+        return False
+    return "--noreload" in argv or os.environ.get("RUN_MAIN") == "true"
+
+
+def preload_components(names=None):
+    """依序載入並預熱各元件，單一元件失敗不影響其他元件。回傳失敗的元件名稱"""
+    failed = []
+    for name in names or COMPONENTS:
+        _set_state(name, LOADING)
+        start = time.perf_counter()
+        try:
+            COMPONENTS[name]()
+        except Exception as e:
+            logger.error(f"Preload {name} failed: {e}")
+            _set_state(name, FAILED, error=str(e))
+            failed.append(name)
+            continue
+        seconds = round(time.perf_counter() - start, 3)
+        logger.info(f"Preload {name} ready in {seconds}s")
+        _set_state(name, READY, seconds=seconds)
+    return failed
+
+
+def retry_failed(names, stop):
+    """以指數退避（RETRY_BASE_SECONDS 起，最多 RETRY_MAX_SECONDS）重試失敗的元件，直到全部就緒或 stop 被設定"""
+    delay = RETRY_BASE_SECONDS
+    while names and not stop.wait(delay):
+        names = preload_components(names)
+        delay = min(delay * 2, RETRY_MAX_SECONDS)
+
+
+def _preload_with_retry(names, stop):
+    retry_failed(preload_components(names), stop)
+
+
+def start_preload(mode=None):
+    """
+    background：在背景執行緒預載，不延遲 worker 啟動，就緒前 /emotion/ready/ 回傳 503
+    blocking：預載完成才繼續啟動
+    兩者失敗的元件都在背景執行緒重試；回傳背景執行緒（沒有時為 None）
+    """
+    global _preload_thread
+    mode = mode or get_preload_mode()
+    if mode == "off":
+        return None
+
+    for name in COMPONENTS:
+        _set_state(name, PENDING)
+    if mode == "blocking":
+        failed = preload_components()
+        if not failed:
+            return None
+        # 失敗的元件改在背景重試，不擋住啟動
+        _preload_thread = threading.Thread(target=retry_failed, args=(failed, _stop_retry),
+                                           name="emotion-preload-retry", daemon=True)
+    else:
+        _preload_thread = threading.Thread(target=_preload_with_retry, args=(list(COMPONENTS), _stop_retry),
+                                           name="emotion-preload", daemon=True)
+    _preload_thread.start()
+    return _preload_thread
+
+
+# ===================== Readiness =====================
+
+def get_readiness():
+    """
+    回傳 {"ready": bool, "preload": mode, "components": {name: {"status", ...}}}
+    未預載過的元件視為 pending；EMOTION_PRELOAD=off 時不預載，元件為 lazy，不影響就緒
+    """
+    mode = getattr(settings, "EMOTION_PRELOAD", "background")
+    default = LAZY if mode == "off" else PENDING
+    with _state_lock:
+        components = {name: dict(_state.get(name, {"status": default})) for name in COMPONENTS}
+    return {
+        "ready": all(c["status"] in (READY, LAZY) for c in components.values()),
+        "preload": mode,
+        "components": components,
+    }
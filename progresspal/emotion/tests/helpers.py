@@ -0,0 +1,30 @@
+# emotion/tests/helpers.py
+import os
+from unittest.mock import patch
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+IMAGE_DIR = os.path.join(os.path.dirname(__file__), "images")
+
+
+def read_image(name):
+    with open(os.path.join(IMAGE_DIR, name), "rb") as f:
+        return f.read()
+
+
+def create_student(username):
+    return get_user_model().objects.create_user(
+        username=username, email=f"{username}@example.com", password="pw123456", role="student")
+
+
+class EmotionViewTestCase(TestCase):
+    """以已登入學生呼叫 emotion 的 view；不寫入 EmotionRecord（self.mock_record 記錄呼叫）"""
+
+    username = "emotion_user"
+
+    def setUp(self):
+        patcher = patch("emotion.views.record_emotion")
+        self.mock_record = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = create_student(self.username)
+        self.client.force_login(self.user)
@@ -0,0 +1,64 @@
+# emotion/tests/test_batch.py
+import unittest
+from unittest.mock import patch
+from django.test import override_settings
+from django.urls import reverse
+from django.core.files.uploadedfile import SimpleUploadedFile
+from emotion.emotion_model import aggregate_predictions
+from emotion.tests.helpers import EmotionViewTestCase, read_image
+
+
+def fake_predictions(frames):
+    return [{"emotion": "投入", "confidence": 0.8} for _ in frames]
+
+
+class TestAggregatePredictions(unittest.TestCase):
+
+    def test_weighted_vote(self):
+        """以信心分數加權，兩張低信心的無聊輸給一張高信心的投入"""
+        results = [
+            {"emotion": "無聊", "confidence": 0.3},
+            {"emotion": "無聊", "confidence": 0.3},
+            {"emotion": "投入", "confidence": 0.9},
+        ]
+        aggregate = aggregate_predictions(results)
+        self.assertEqual(aggregate["emotion"], "投入")
+        self.assertAlmostEqual(aggregate["confidence"], 0.9)
+        self.assertEqual(aggregate["counts"], {"無聊": 2, "投入": 1})
+        self.assertIsNone(aggregate_predictions([]))
+
+
+class TestDetectEmotionBatch(EmotionViewTestCase):
+
+    def upload(self, name):
+        return SimpleUploadedFile(name, read_image(name), content_type="image/jpeg")
+
+    @patch("emotion.views.predict_emotions", side_effect=fake_predictions)
+    def test_one_batched_prediction(self, mock_predict):
+        """成功的影像合併成一次推論，失敗的影像逐張回報錯誤"""
+        frames = [self.upload("normal_face.jpg"), self.upload("no_face.jpg"), self.upload("normal_face.jpg")]
+        response = self.client.post(reverse("emotion_detect_batch"), {"frames": frames})
+
+        self.assertEqual(response.status_code, 200, response.content)
+        mock_predict.assert_called_once()
+        self.assertEqual(mock_predict.call_args[0][0].shape, (2, 224, 224, 1))
+
+        data = response.json()
+        self.assertEqual([r["index"] for r in data["results"]], [0, 1, 2])
+        self.assertIn("error", data["results"][1])
+        self.assertEqual(data["results"][2]["emotion"], "投入")
+        self.assertEqual(data["aggregate"]["counts"], {"投入": 2})
+        self.assertEqual(self.mock_record.call_count, 2)
+
+    @patch("emotion.views.predict_emotions", side_effect=fake_predictions)
+    def test_no_usable_frame(self, mock_predict):
+        response = self.client.post(reverse("emotion_detect_batch"), {"frames": [self.upload("no_face.jpg")]})
+        self.assertEqual(response.status_code, 422)
+        self.assertIsNone(response.json()["aggregate"])
+        mock_predict.assert_not_called()
+
+    @override_settings(EMOTION_MAX_BATCH_FRAMES=1)
+    def test_too_many_frames(self):
+        frames = [self.upload("no_face.jpg"), self.upload("no_face.jpg")]
+        response = self.client.post(reverse("emotion_detect_batch"), {"frames": frames})
+        self.assertEqual(response.status_code, 400)
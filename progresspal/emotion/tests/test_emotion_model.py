@@ -16,7 +16,7 @@ class TestEmotionModel(unittest.TestCase):
         """
         如果輸入影像 shape 不是 (1,224,224,1)，應該拋出 InputShapeError
         """
-        mock_model.predict.return_value = np.zeros((1, 6))
+        mock_model.predict_on_batch.return_value = np.zeros((1, 6))
 
         wrong_input = np.zeros((224, 224, 1), dtype=np.float32)
 
@@ -31,7 +31,7 @@ class TestEmotionModel(unittest.TestCase):
         print("Mock Model =", mock_model)
         
         # 模擬預測結果 → 第 2 類別（index=2）最大
-        mock_model.predict.return_value = np.array([[0.1, 0.2, 0.5, 0.1, 0.05, 0.05]])
+        mock_model.predict_on_batch.return_value = np.array([[0.1, 0.2, 0.5, 0.1, 0.05, 0.05]])
 
         result = predict_emotion(self.fake_face)
 
@@ -41,13 +41,14 @@ class TestEmotionModel(unittest.TestCase):
     @patch("emotion.emotion_model.model")
     def test_model_predict_called_once(self, mock_model):
         """
-        確認 model.predict 是否被呼叫一次
+        確認走 predict_on_batch 且只呼叫一次，不經過 model.predict
         """
-        mock_model.predict.return_value = np.array([[0.3, 0.1, 0.2, 0.1, 0.2, 0.1]])
+        mock_model.predict_on_batch.return_value = np.array([[0.3, 0.1, 0.2, 0.1, 0.2, 0.1]])
 
         predict_emotion(self.fake_face)
 
-        mock_model.predict.assert_called_once()
+        mock_model.predict_on_batch.assert_called_once()
+        mock_model.predict.assert_not_called()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,116 @@
+# emotion/tests/test_engagement.py
+import itertools
+import random
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from emotion.models import EmotionRecord
+from emotion.services import engagement, recorder
+from emotion.services.engagement import (
+    build_state, cache, current_ema, state_level, update_engagement, get_engagement, get_recent_emotions,
+)
+from emotion.services.utils import compute_engagement, map_emotion_to_score, EMA_ALPHA
+
+User = get_user_model()
+
+LOCMEM_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "shared": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "shared"},
+}
+
+LABELS = ["挫折", "困惑", "無聊", "喜悅", "投入", "驚訝"]
+
+
+def reference_ema(emotions):
+    scores = map_emotion_to_score(emotions)
+    ema = scores[0]
+    for x in scores[1:]:
+        ema = EMA_ALPHA * x + (1 - EMA_ALPHA) * ema
+    return ema
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TestEngagementState(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user(username="eng_user", email="eng@example.com", password="pw123456")
+
+    def test_matches_compute_engagement(self):
+        """最多 6 筆時，增量結果與 compute_engagement 完全相同（含困惑看下一筆的規則）"""
+        sequences = [list(p) for n in (1, 2, 3) for p in itertools.product(LABELS, repeat=n)]
+        rng = random.Random(0)
+        sequences += [[rng.choice(LABELS) for _ in range(6)] for _ in range(300)]
+        for emotions in sequences:
+            state = build_state(emotions)
+            self.assertAlmostEqual(current_ema(state), reference_ema(emotions), msg=emotions)
+            self.assertEqual(state_level(state), compute_engagement(emotions), msg=emotions)
+
+    def test_new_user_is_high(self):
+        self.assertEqual(get_engagement(self.user), compute_engagement(["None"]))
+        self.assertEqual(get_recent_emotions(self.user), ["None"])
+
+    def test_lookup_after_update_needs_no_query(self):
+        for emotion in ["無聊", "挫折", "困惑", "無聊", "無聊", "挫折", "無聊", "無聊"]:
+            update_engagement(self.user.id, emotion)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_engagement(self.user), "low")
+            self.assertEqual(get_recent_emotions(self.user), ["困惑", "無聊", "無聊", "挫折", "無聊", "無聊"])
+
+    def test_db_fallback_when_cache_is_empty(self):
+        now = timezone.now()
+        codes = ["bored", "bored", "engaged", "confused", "happy", "happy", "confused"]
+        EmotionRecord.objects.bulk_create([
+            EmotionRecord(user=self.user, emotion=code, timestamp=now + timedelta(seconds=i))
+            for i, code in enumerate(codes)
+        ])
+        recent = self.user.recent_emotion_history
+        with self.assertNumQueries(1):
+            self.assertEqual(get_engagement(self.user), compute_engagement(recent))
+        with self.assertNumQueries(0):
+            self.assertEqual(get_recent_emotions(self.user), recent)
+
+    def test_buffered_records_are_used_when_rebuilding(self):
+        now = timezone.now()
+        EmotionRecord.objects.bulk_create([
+            EmotionRecord(user=self.user, emotion=code, timestamp=now + timedelta(seconds=i))
+            for i, code in enumerate(["bored", "bored", "bored"])
+        ])
+        buffer = recorder.EmotionRecordBuffer()
+        buffer._stopped.set()  # 不啟動背景執行緒
+        for emotion in ["喜悅", "投入"]:
+            buffer.add(self.user.id, emotion, 0.9)
+        with mock.patch.object(recorder, "_buffer", buffer):
+            self.assertEqual(get_recent_emotions(self.user), ["無聊", "無聊", "無聊", "喜悅", "投入"])
+
+    def test_concurrent_updates_are_not_lost(self):
+        update_engagement(self.user.id, "無聊")
+        apply_emotion = engagement.apply_emotion
+
+        def slow_apply(state, emotion):
+            time.sleep(0.02)  # 拉長讀取到寫回之間的時間，沒有鎖時必定互相覆蓋
+            apply_emotion(state, emotion)
+
+        with mock.patch.object(engagement, "apply_emotion", slow_apply), mock.patch.object(engagement, "LOCK_WAIT", 2):
+            threads = [threading.Thread(target=update_engagement, args=(self.user.id, "喜悅")) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(get_recent_emotions(self.user), ["無聊"] + ["喜悅"] * 4)
+
+    def test_lock_wait_backs_off_and_is_bounded(self):
+        """鎖被占用時以加倍的間隔重試，逾時後照常更新"""
+        cache.add(f"emotion:engagement:{self.user.id}:lock", 1, 60)
+        sleeps, real_sleep = [], time.sleep
+        with mock.patch.object(engagement.time, "sleep", side_effect=lambda s: (sleeps.append(s), real_sleep(s))):
+            update_engagement(self.user.id, "喜悅")
+        self.assertEqual(sleeps[:4], [0.005, 0.01, 0.02, 0.04])
+        self.assertLessEqual(len(sleeps), 8)
+        self.assertAlmostEqual(sum(sleeps), engagement.LOCK_WAIT, delta=0.05)
+        self.assertEqual(get_recent_emotions(self.user), ["喜悅"])
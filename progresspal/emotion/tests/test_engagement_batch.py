@@ -0,0 +1,97 @@
+# emotion/tests/test_engagement_batch.py
+import itertools
+import random
+from datetime import timedelta
+import numpy as np
+from django.test import SimpleTestCase, TestCase
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from emotion.models import EmotionRecord
+from emotion.services.engagement_batch import (
+    PAD, LABELS, encode_sequences, score_matrix, ema_trajectories, windowed_engagement,
+    engagement_levels, load_emotion_matrix,
+)
+from emotion.services.utils import compute_engagement, map_emotion_to_score, EMA_ALPHA
+
+User = get_user_model()
+
+
+def reference_ema(emotions):
+    scores = map_emotion_to_score(emotions)
+    ema = scores[0]
+    for x in scores[1:]:
+        ema = EMA_ALPHA * x + (1 - EMA_ALPHA) * ema
+    return ema
+
+
+def sample_sequences():
+    sequences = [list(p) for n in (1, 2, 3) for p in itertools.product(LABELS, repeat=n)]
+    rng = random.Random(0)
+    sequences += [[rng.choice(LABELS) for _ in range(rng.randint(1, 40))] for _ in range(300)]
+    return sequences
+
+
+class TestEngagementBatch(SimpleTestCase):
+
+    def setUp(self):
+        self.sequences = sample_sequences()
+        self.codes = encode_sequences(self.sequences)
+
+    def test_padding(self):
+        codes = encode_sequences([["喜悅", "困惑"], ["None"], ["無聊"]])
+        self.assertEqual(codes.shape, (3, 2))
+        self.assertEqual(list(codes[1]), [PAD, PAD])
+        self.assertEqual(codes[2, 1], PAD)
+        with self.assertRaises(ValueError):
+            encode_sequences([["開心"]])
+
+    def test_scores_match_scalar(self):
+        """困惑看下一筆（含下一筆為 PAD 的情況）與 map_emotion_to_score 相同"""
+        scores = score_matrix(self.codes)
+        for row, emotions in enumerate(self.sequences):
+            n = len(emotions)
+            self.assertEqual(list(scores[row, :n]), map_emotion_to_score(emotions), msg=emotions)
+            self.assertTrue(np.isnan(scores[row, n:]).all())
+
+    def test_trajectory_matches_scalar(self):
+        trajectories = ema_trajectories(self.codes)
+        levels = engagement_levels(trajectories)
+        for row, emotions in enumerate(self.sequences):
+            n = len(emotions)
+            self.assertAlmostEqual(trajectories[row, n - 1], reference_ema(emotions), msg=emotions)
+            self.assertEqual(levels[row, n - 1], compute_engagement(emotions), msg=emotions)
+            self.assertTrue(np.isnan(trajectories[row, n:]).all())
+            self.assertTrue(all(level is None for level in levels[row, n:]))
+
+    def test_windowed_matches_live_engagement(self):
+        """每個時間點與 compute_engagement(最近 6 筆) 相同"""
+        windowed = windowed_engagement(self.codes)
+        levels = engagement_levels(windowed)
+        for row, emotions in enumerate(self.sequences):
+            for t in range(len(emotions)):
+                window = emotions[max(0, t - 5):t + 1]
+                self.assertAlmostEqual(windowed[row, t], reference_ema(window), msg=window)
+                self.assertEqual(levels[row, t], compute_engagement(window), msg=window)
+            self.assertTrue(np.isnan(windowed[row, len(emotions):]).all())
+
+
+class TestLoadEmotionMatrix(TestCase):
+
+    def test_rows_follow_timestamps(self):
+        users = [User.objects.create_user(username=f"batch{i}", email=f"batch{i}@example.com", password="pw123456")
+                 for i in range(3)]
+        now = timezone.now()
+        history = {users[0]: ["engaged", "confused", "bored"], users[2]: ["happy"]}
+        for user, codes in history.items():
+            # 反向寫入，確認依 timestamp 排序
+            for i, code in reversed(list(enumerate(codes))):
+                EmotionRecord.objects.create(user=user, emotion=code, timestamp=now + timedelta(seconds=i))
+
+        with self.assertNumQueries(1):
+            user_ids, codes = load_emotion_matrix()
+        self.assertEqual(user_ids, [users[0].pk, users[2].pk])
+        self.assertEqual(codes.shape, (2, 3))
+        np.testing.assert_array_equal(codes, encode_sequences([["投入", "困惑", "無聊"], ["喜悅"]]))
+
+        user_ids, codes = load_emotion_matrix(users=[users[2]])
+        self.assertEqual(user_ids, [users[2].pk])
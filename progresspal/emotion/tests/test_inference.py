@@ -0,0 +1,183 @@
+# emotion/tests/test_inference.py
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+import numpy as np
+from emotion import emotion_model
+from emotion.services.inference import (
+    BatchingPredictor,
+    InferenceConnectionError,
+    InferenceServer,
+    InferenceServiceError,
+    RemotePredictor,
+)
+
+
+def fake_predict(frames):
+    """以每張影像的平均值當作信心分數，方便驗證結果順序"""
+    return [{"emotion": "投入", "confidence": float(f.mean())} for f in frames]
+
+
+class TestBatchingPredictor(unittest.TestCase):
+
+    def test_concurrent_frames_are_batched(self):
+        """時間窗內送達的影像合併成一次推論，結果依序回傳"""
+        calls = []
+
+        def predict_fn(frames):
+            calls.append(len(frames))
+            return fake_predict(frames)
+
+        batcher = BatchingPredictor(predict_fn, max_batch_size=8, window_ms=200)
+        try:
+            futures = [batcher.submit(np.full((1, 4, 4, 1), i, dtype=np.float32)) for i in range(5)]
+            results = [f.result(timeout=5) for f in futures]
+        finally:
+            batcher.stop()
+
+        self.assertEqual(calls, [5])
+        self.assertEqual([r[0]["confidence"] for r in results], [0, 1, 2, 3, 4])
+        metrics = batcher.metrics()
+        self.assertEqual(metrics["total_frames"], 5)
+        self.assertEqual(metrics["total_batches"], 1)
+        self.assertEqual(metrics["avg_batch_size"], 5)
+
+    def test_max_batch_size(self):
+        """超過上限時拆成多批"""
+        calls = []
+
+        def predict_fn(frames):
+            calls.append(len(frames))
+            return fake_predict(frames)
+
+        batcher = BatchingPredictor(predict_fn, max_batch_size=2, window_ms=200)
+        try:
+            futures = [batcher.submit(np.zeros((1, 4, 4, 1), dtype=np.float32)) for _ in range(5)]
+            for f in futures:
+                f.result(timeout=5)
+        finally:
+            batcher.stop()
+        self.assertEqual(sum(calls), 5)
+        self.assertTrue(all(n <= 2 for n in calls))
+
+    def test_errors_propagate(self):
+        def predict_fn(frames):
+            raise RuntimeError("模型推論失敗")
+
+        batcher = BatchingPredictor(predict_fn, window_ms=1)
+        try:
+            with self.assertRaises(RuntimeError):
+                batcher.predict(np.zeros((1, 4, 4, 1), dtype=np.float32), timeout=5)
+        finally:
+            batcher.stop()
+
+    def test_bad_request_fails_alone(self):
+        """形狀錯誤的請求在進入批次前就失敗，同一時間窗的其他請求不受影響"""
+        def check(frames):
+            if frames.shape[1:] != (4, 4, 1):
+                raise ValueError("bad shape")
+
+        batcher = BatchingPredictor(fake_predict, max_batch_size=8, window_ms=100, check_fn=check)
+        try:
+            good = batcher.submit(np.ones((1, 4, 4, 1), dtype=np.float32))
+            bad = batcher.submit(np.ones((1, 5, 5, 1), dtype=np.float32))
+            self.assertEqual(good.result(timeout=5)[0]["confidence"], 1.0)
+            with self.assertRaisesRegex(ValueError, "bad shape"):
+                bad.result(timeout=5)
+        finally:
+            batcher.stop()
+
+    def test_failed_batch_is_retried_per_request(self):
+        """合併批次推論失敗時逐一重試，錯誤只回給造成失敗的請求"""
+        calls = []
+
+        def predict_fn(frames):
+            calls.append(len(frames))
+            if (frames < 0).any():
+                raise RuntimeError("模型推論失敗")
+            return fake_predict(frames)
+
+        batcher = BatchingPredictor(predict_fn, max_batch_size=8, window_ms=200)
+        try:
+            futures = [batcher.submit(np.full((1, 4, 4, 1), v, dtype=np.float32)) for v in (1, -1, 2)]
+            self.assertEqual(futures[0].result(timeout=5)[0]["confidence"], 1.0)
+            self.assertEqual(futures[2].result(timeout=5)[0]["confidence"], 2.0)
+            with self.assertRaises(RuntimeError):
+                futures[1].result(timeout=5)
+        finally:
+            batcher.stop()
+        self.assertEqual(calls, [3, 1, 1, 1])
+
+
+class TestInferenceSocket(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.tmpdir.name, "emotion.sock")
+        self.batcher = BatchingPredictor(fake_predict, window_ms=5, check_fn=self.check)
+        self.server = InferenceServer(self.socket_path, self.batcher)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    @staticmethod
+    def check(frames):
+        if frames.ndim != 4:
+            raise ValueError("輸入影像形狀錯誤")
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.batcher.stop()
+        self.tmpdir.cleanup()
+
+    def test_predict_and_metrics(self):
+        client = RemotePredictor(self.socket_path)
+        frame = np.full((1, 224, 224, 1), 7, dtype=np.float32)
+        self.assertEqual(client.predict(frame), [{"emotion": "投入", "confidence": 7.0}])
+        # 重用同一條連線
+        self.assertEqual(client.predict(frame * 2)[0]["confidence"], 14.0)
+        self.assertEqual(client.metrics()["total_frames"], 2)
+
+    def test_unreachable_service(self):
+        client = RemotePredictor(os.path.join(self.tmpdir.name, "missing.sock"))
+        with self.assertRaises(InferenceConnectionError):
+            client.predict(np.zeros((1, 4, 4, 1), dtype=np.float32))
+
+    def test_server_error_is_not_a_connection_error(self):
+        client = RemotePredictor(self.socket_path)
+        with self.assertRaisesRegex(InferenceServiceError, "形狀錯誤") as ctx:
+            client.predict(np.zeros((4, 4), dtype=np.float32))
+        self.assertNotIsInstance(ctx.exception, InferenceConnectionError)
+        # 連線仍可繼續使用
+        self.assertEqual(len(client.predict(np.zeros((1, 4, 4, 1), dtype=np.float32))), 1)
+
+
+class TestRemoteFallback(unittest.TestCase):
+    """只有連不上推論服務時才在 worker 載入模型"""
+
+    def setUp(self):
+        self.frames = np.zeros((1,) + emotion_model.get_input_shape(), dtype=np.float32)
+
+    def predict_with_remote_error(self, error):
+        with patch.object(emotion_model, "get_remote_predictor") as remote, \
+                patch.object(emotion_model, "predict_batch", return_value=["local"]) as local:
+            remote.return_value.predict.side_effect = error
+            try:
+                return emotion_model.predict_emotions(self.frames)
+            finally:
+                self.local_calls = local.call_count
+
+    def test_connection_error_falls_back(self):
+        self.assertEqual(self.predict_with_remote_error(InferenceConnectionError("refused")), ["local"])
+        self.assertEqual(self.local_calls, 1)
+
+    def test_server_error_is_raised(self):
+        with self.assertRaisesRegex(InferenceServiceError, "模型推論失敗"):
+            self.predict_with_remote_error(InferenceServiceError("模型推論失敗"))
+        self.assertEqual(self.local_calls, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
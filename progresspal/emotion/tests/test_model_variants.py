@@ -0,0 +1,83 @@
+# emotion/tests/test_model_variants.py
+import os
+import tempfile
+from unittest.mock import patch
+import keras
+import numpy as np
+from django.test import SimpleTestCase, override_settings
+from emotion import emotion_model
+from emotion.services.model_variants import (
+    VariantExportError,
+    evaluate_variants,
+    export_int8,
+    export_resized,
+    export_variant,
+)
+
+
+def build_model(flatten=False):
+    """與正式模型輸入/輸出相同的小型 CNN"""
+    return keras.Sequential([
+        keras.Input(shape=(224, 224, 1)),
+        keras.layers.Conv2D(8, 3, strides=4, activation="relu"),
+        keras.layers.Flatten() if flatten else keras.layers.GlobalAveragePooling2D(),
+        keras.layers.Dense(16, activation="relu"),
+        keras.layers.Dense(len(emotion_model.EMOTION_LABELS), activation="softmax"),
+    ])
+
+
+class TestModelVariants(SimpleTestCase):
+
+    def test_input_shape_follows_setting(self):
+        with override_settings(EMOTION_MODEL_VARIANT="half_res"):
+            self.assertEqual(emotion_model.get_input_shape(), (112, 112, 1))
+        with override_settings(EMOTION_MODEL_VARIANT="float32"):
+            self.assertEqual(emotion_model.get_input_shape(), (224, 224, 1))
+        with override_settings(EMOTION_MODEL_VARIANT="unknown"):
+            with self.assertRaises(RuntimeError):
+                emotion_model.get_model_variant()
+
+    def test_export_resized(self):
+        resized = export_resized(build_model(), 112)
+        preds = resized.predict_on_batch(np.zeros((2, 112, 112, 1), dtype="float32"))
+        self.assertEqual(preds.shape, (2, len(emotion_model.EMOTION_LABELS)))
+
+    def test_export_resized_rejects_flatten(self):
+        with self.assertRaises(VariantExportError):
+            export_resized(build_model(flatten=True), 112)
+
+    def test_export_int8_keeps_predictions_close(self):
+        model = build_model()
+        x = np.random.rand(4, 224, 224, 1).astype("float32")
+        before = keras.ops.convert_to_numpy(model.predict_on_batch(x))
+        after = keras.ops.convert_to_numpy(export_int8(model).predict_on_batch(x))
+        self.assertLess(np.abs(before - after).max(), 0.05)
+
+    def test_export_and_evaluate(self):
+        with tempfile.TemporaryDirectory() as tmpdir, patch.object(emotion_model, "MODEL_DIR", tmpdir):
+            build_model().save(emotion_model.get_model_path("float32"))
+            export_variant("int8")
+            export_variant("half_res")
+
+            images = [np.random.randint(0, 256, (64, 64), dtype=np.uint8) for _ in range(4)]
+            labels = np.array([0, 1, -1, 3])
+            reports = {r["variant"]: r for r in evaluate_variants(images, labels, ["int8", "half_res"])}
+
+        self.assertEqual(reports["float32"]["agreement"], 1.0)
+        self.assertIsNotNone(reports["float32"]["accuracy"])
+        for variant in ("int8", "half_res"):
+            self.assertIn("frames_per_sec", reports[variant])
+        self.assertLess(reports["int8"]["weights_mb"], reports["float32"]["weights_mb"])
+
+    def test_evaluate_without_reference(self):
+        """沒有 float32 模型檔時不以其他版本當基準"""
+        with tempfile.TemporaryDirectory() as tmpdir, patch.object(emotion_model, "MODEL_DIR", tmpdir):
+            build_model().save(emotion_model.get_model_path("float32"))
+            export_variant("int8")
+            os.remove(emotion_model.get_model_path("float32"))
+
+            images = [np.random.randint(0, 256, (64, 64), dtype=np.uint8) for _ in range(2)]
+            reports = {r["variant"]: r for r in evaluate_variants(images, np.array([-1, -1]), ["int8"])}
+
+        self.assertIn("error", reports["float32"])
+        self.assertIsNone(reports["int8"]["agreement"])
@@ -1,7 +1,14 @@
+import threading
 import unittest
+from unittest.mock import patch
 import numpy as np
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from emotion.services.preprocess import preprocess_frame, NoFaceDetectedError, InvalidImageError
+from django.test import override_settings
+from emotion.services.preprocess import (
+    preprocess_frame, detect_face, decode_frame, jpeg_dimensions, _track_key, FACE_CASCADE,
+    NoFaceDetectedError, InvalidImageError,
+)
 import cv2
 import os
 
@@ -58,4 +65,72 @@ class TestPreprocessFrame(unittest.TestCase):
                     result = preprocess_frame(uploaded_file)
                     self.assertIsInstance(result, np.ndarray, f"'{name}' 應該要成功回傳 Tensor")
                     # 檢查輸出形狀是否符合模型要求 (Batch, Height, Width, Channel)
-                    self.assertEqual(result.shape, (1, 224, 224, 1), f"'{name}' Shape 錯誤")
\ No newline at end of file
+                    self.assertEqual(result.shape, (1, 224, 224, 1), f"'{name}' Shape 錯誤")
+
+class TestFaceDetection(unittest.TestCase):
+
+    def setUp(self):
+        base_dir = os.path.dirname(__file__)
+        self.face = cv2.imread(os.path.join(base_dir, "images/normal_face.jpg"), cv2.IMREAD_GRAYSCALE)
+        self.no_face = cv2.imread(os.path.join(base_dir, "images/no_face.jpg"), cv2.IMREAD_GRAYSCALE)
+        self.user_id = "test-user"
+        cache.delete(_track_key(self.user_id))
+        self.addCleanup(cache.delete, _track_key(self.user_id))
+
+    def test_downscaled_box_maps_back(self):
+        """縮小後偵測的框換算回原圖，與全解析度偵測結果相近"""
+        full = FACE_CASCADE.detectMultiScale(self.face, 1.1, 5, minSize=(60, 60))
+        fx, fy, fw, fh = max(full, key=lambda b: b[2] * b[3])
+        with override_settings(EMOTION_DETECT_MAX_WIDTH=160):
+            x, y, w, h = detect_face(self.face)
+        self.assertLess(abs(x - fx), fw * 0.15)
+        self.assertLess(abs(y - fy), fh * 0.15)
+        self.assertLess(abs(w - fw), fw * 0.15)
+
+    def test_tracks_last_box(self):
+        """記住上一張臉；位置錯誤時退回全圖搜尋；找不到臉時清除"""
+        box = detect_face(self.face, self.user_id)
+        self.assertEqual(cache.get(_track_key(self.user_id)), box)
+        # 只搜尋追蹤區域時縮放比例不同，框會有幾個像素的差異
+        np.testing.assert_allclose(detect_face(self.face, self.user_id), box, atol=box[2] * 0.05)
+
+        cache.set(_track_key(self.user_id), (0, 0, 40, 40))
+        np.testing.assert_allclose(detect_face(self.face, self.user_id), box, atol=box[2] * 0.05)
+
+        with self.assertRaises(NoFaceDetectedError):
+            detect_face(self.no_face, self.user_id)
+        self.assertIsNone(cache.get(_track_key(self.user_id)))
+
+    @override_settings(EMOTION_FACE_DETECTOR="dnn")
+    def test_dnn_falls_back_to_haar_without_model_file(self):
+        with patch("emotion.services.preprocess.DNN_MODEL_PATH", "/nonexistent.onnx"), \
+             patch("emotion.services.preprocess._local", threading.local()):
+            self.assertEqual(len(detect_face(self.face)), 4)
+
+
+class TestReducedDecode(unittest.TestCase):
+
+    def encode(self, width, height, ext=".jpg"):
+        img = np.full((height, width, 3), 128, dtype=np.uint8)
+        return cv2.imencode(ext, img)[1].tobytes()
+
+    def test_jpeg_dimensions(self):
+        self.assertEqual(jpeg_dimensions(self.encode(1280, 720)), (1280, 720))
+        self.assertIsNone(jpeg_dimensions(self.encode(64, 48, ".png")))
+        self.assertIsNone(jpeg_dimensions(b"\xff\xd8\xff"))
+
+    def test_reduction_factor_follows_header(self):
+        """縮小後寬度不小於 EMOTION_DECODE_MIN_WIDTH"""
+        with override_settings(EMOTION_DECODE_MODE="reduced", EMOTION_DECODE_MIN_WIDTH=640):
+            for width, factor in [(640, 1), (1280, 2), (2560, 4), (4032, 4)]:
+                with self.subTest(width=width):
+                    frame, got = decode_frame(self.encode(width, width * 3 // 4))
+                    self.assertEqual(got, factor)
+                    self.assertEqual(frame.shape, (width * 3 // 4 // factor, width // factor))
+
+    def test_png_and_color_mode_decode_to_gray(self):
+        frame, factor = decode_frame(self.encode(64, 48, ".png"))
+        self.assertEqual((frame.shape, factor), ((48, 64), 1))
+        with override_settings(EMOTION_DECODE_MODE="color"):
+            frame, factor = decode_frame(self.encode(1280, 720))
+        self.assertEqual((frame.shape, factor), ((720, 1280), 1))
@@ -0,0 +1,97 @@
+# emotion/tests/test_recorder.py
+from datetime import timedelta
+from unittest.mock import patch
+from django.db import IntegrityError, OperationalError, connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from emotion.models import EmotionRecord
+from emotion.services.recorder import EmotionRecordBuffer
+from emotion.tests.helpers import create_student
+
+
+class TestEmotionRecordBuffer(TestCase):
+
+    def setUp(self):
+        self.user = create_student("rec_user")
+
+    def test_flush_writes_with_one_bulk_insert(self):
+        buffer = EmotionRecordBuffer(flush_size=100, flush_interval=60)
+        for emotion in ["投入", "困惑", "喜悅"]:
+            buffer.add(self.user.id, emotion, 0.8)
+        buffer.add(self.user.id, "未知情緒", 0.8)  # 不在對照表中，不記錄
+        self.assertEqual(EmotionRecord.objects.count(), 0)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(buffer.flush(), 3)
+        # 一次 bulk insert（其餘為每日統計的累加）
+        inserts = [q for q in queries if q["sql"].startswith('INSERT INTO "emotion_emotionrecord"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(self.user.daily_stats.get().emotion_engaged, 1)
+        self.assertEqual(
+            sorted(EmotionRecord.objects.values_list("emotion", flat=True)),
+            ["confused", "engaged", "happy"],
+        )
+        self.assertEqual(buffer.flush(), 0)
+
+    def test_full_buffer_wakes_writer_thread(self):
+        buffer = EmotionRecordBuffer(flush_size=2, flush_interval=60)
+        with patch.object(EmotionRecord.objects, "bulk_create") as mock_bulk:
+            buffer.add(self.user.id, "投入", 0.9)
+            buffer.add(self.user.id, "投入", 0.9)
+            for _ in range(50):
+                if mock_bulk.called:
+                    break
+                buffer._stopped.wait(0.05)
+            buffer._stopped.set()
+            buffer._wakeup.set()
+            buffer._thread.join(timeout=5)
+        self.assertEqual(len(mock_bulk.call_args[0][0]), 2)
+        self.assertEqual(len(buffer), 0)
+
+    def test_failed_flush_keeps_records(self):
+        """資料庫暫時無法寫入時保留紀錄，下次再寫"""
+        buffer = EmotionRecordBuffer(flush_size=100, flush_interval=60)
+        buffer.add(self.user.id, "無聊", 0.7)
+        with patch.object(EmotionRecord.objects, "bulk_create", side_effect=OperationalError("db down")), \
+                patch.object(EmotionRecord, "save", side_effect=OperationalError("db down")):
+            self.assertEqual(buffer.flush(), 0)
+        self.assertEqual(len(buffer), 1)
+        self.assertEqual(buffer.stop(), 1)
+
+    def test_invalid_record_is_dropped(self):
+        """整批失敗時逐筆重試，只丟棄有問題的紀錄，不會讓之後每次寫入都失敗"""
+        deleted_user_id = self.user.id + 1000
+        original_save = EmotionRecord.save
+
+        def save(record, *args, **kwargs):
+            if record.user_id == deleted_user_id:
+                raise IntegrityError("FOREIGN KEY constraint failed")
+            return original_save(record, *args, **kwargs)
+
+        buffer = EmotionRecordBuffer(flush_size=100, flush_interval=60)
+        buffer.add(self.user.id, "投入", 0.9)
+        buffer.add(deleted_user_id, "投入", 0.9)
+        buffer.add(self.user.id, "喜悅", 0.9)
+        with patch.object(EmotionRecord.objects, "bulk_create", side_effect=IntegrityError("FOREIGN KEY constraint failed")), \
+                patch.object(EmotionRecord, "save", save):
+            self.assertEqual(buffer.flush(), 2)
+        self.assertEqual(len(buffer), 0)
+        self.assertEqual(EmotionRecord.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(self.user.daily_stats.get().emotion_engaged, 1)
+
+    def test_pending_is_capped(self):
+        buffer = EmotionRecordBuffer(flush_size=2, flush_interval=60, max_pending=3)
+        buffer._stopped.set()  # 不啟動背景執行緒
+        for emotion in ["挫折", "困惑", "無聊", "喜悅", "投入"]:
+            buffer.add(self.user.id, emotion, 0.9)
+        self.assertEqual([r.emotion for r in buffer._pending], ["bored", "happy", "engaged"])
+
+    def test_recent_emotion_history(self):
+        self.assertEqual(self.user.recent_emotion_history, ["None"])
+        now = timezone.now()
+        EmotionRecord.objects.bulk_create([
+            EmotionRecord(user=self.user, emotion=code, timestamp=now + timedelta(seconds=i))
+            for i, code in enumerate(["bored", "confused", "engaged", "happy", "happy", "happy", "surprised"])
+        ])
+        self.assertEqual(self.user.recent_emotion_history, ["困惑", "投入", "喜悅", "喜悅", "喜悅", "驚訝"])
@@ -0,0 +1,39 @@
+# emotion/tests/test_sampling.py
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from emotion.services.sampling import next_interval, record_latency, get_load_factor, LATENCY_KEY
+
+SAMPLING = {
+    "base_ms": 5000, "min_ms": 2000, "max_ms": 20000, "backoff": 2.0,
+    "stable_confidence": 0.7, "target_latency_ms": 100, "max_load_factor": 3.0, "latency_alpha": 1.0,
+}
+
+
+@override_settings(EMOTION_SAMPLING=SAMPLING)
+class TestAdaptiveInterval(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_backs_off_when_stable_and_resets_on_change(self):
+        self.assertEqual(next_interval(1, "投入", 0.9), 5000)
+        self.assertEqual(next_interval(1, "投入", 0.9), 10000)
+        self.assertEqual(next_interval(1, "投入", 0.9), 20000)
+        self.assertEqual(next_interval(1, "投入", 0.9), 20000)   # 上限
+        self.assertEqual(next_interval(1, "困惑", 0.9), 2000)    # 情緒改變
+        self.assertEqual(next_interval(1, "困惑", 0.4), 5000)    # 信心低
+        self.assertEqual(next_interval(1), 5000)                 # 找不到臉
+        self.assertEqual(next_interval(2, "投入", 0.9), 5000)    # 各使用者獨立
+
+    def test_load_factor_scales_interval(self):
+        self.assertEqual(get_load_factor(), 1.0)
+        record_latency(250)
+        self.assertAlmostEqual(get_load_factor(), 2.5)
+        self.assertEqual(next_interval(1, "投入", 0.9), 12500)
+
+        record_latency(1000)
+        self.assertEqual(get_load_factor(), 3.0)
+        record_latency(50)
+        self.assertEqual(get_load_factor(), 1.0)
+        self.assertIsNotNone(cache.get(LATENCY_KEY))
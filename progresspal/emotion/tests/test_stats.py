@@ -0,0 +1,43 @@
+# emotion/tests/test_stats.py
+from unittest.mock import patch
+from django.urls import reverse
+from emotion.services import stats
+from emotion.tests.helpers import EmotionViewTestCase, read_image
+
+
+class TestFrameCounters(EmotionViewTestCase):
+
+    def setUp(self):
+        super().setUp()
+        stats.reset_frame_counters()
+        self.addCleanup(stats.reset_frame_counters)
+
+    def post_image(self, name, **extra):
+        return self.client.post(reverse("emotion_detect"), read_image(name), content_type="image/jpeg", **extra)
+
+    @patch("emotion.views.predict_emotion", return_value={"emotion": "投入", "confidence": 0.9})
+    def test_rejections_are_counted(self, mock_predict):
+        self.assertEqual(self.post_image("no_face.jpg", HTTP_X_EMOTION_SKIPPED="3").status_code, 422)
+        self.assertEqual(self.post_image("normal_face.jpg").status_code, 200)
+        self.client.post(reverse("emotion_detect"), b"not an image", content_type="image/jpeg")
+
+        counters = stats.get_frame_counters()
+        self.assertEqual(counters[stats.ACCEPTED], 1)
+        self.assertEqual(counters[stats.NO_FACE], 1)
+        self.assertEqual(counters[stats.INVALID_IMAGE], 1)
+        self.assertEqual(counters[stats.CLIENT_SKIPPED], 3)
+        self.assertEqual(counters["rejected"], 2)
+        self.assertAlmostEqual(counters["rejected_ratio"], 2 / 3)
+
+    def test_metrics_and_config_endpoints(self):
+        stats.record_frames(stats.NO_FACE, 2)
+        self.assertEqual(self.client.get(reverse("emotion_metrics")).status_code, 302)
+
+        self.user.is_staff = True
+        self.user.save()
+        data = self.client.get(reverse("emotion_metrics")).json()
+        self.assertEqual(data["frames"][stats.NO_FACE], 2)
+
+        config = self.client.get(reverse("emotion_config")).json()
+        self.assertIn("interval_ms", config)
+        self.assertIn("min_frame_diff", config["precheck"])
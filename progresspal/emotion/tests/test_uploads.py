@@ -0,0 +1,80 @@
+# emotion/tests/test_uploads.py
+from unittest.mock import patch
+from django.test import SimpleTestCase, Client, override_settings
+from django.urls import reverse
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadhandler import StopFutureHandlers
+from django.middleware.csrf import _get_new_csrf_token
+from emotion.services.preprocess import preprocess_frame
+from emotion.services.uploads import FrameUpload, FrameUploadHandler
+from emotion.tests.helpers import EmotionViewTestCase, read_image
+
+RESULT = {"emotion": "投入", "confidence": 0.9}
+
+
+class TestFrameUploadHandler(SimpleTestCase):
+
+    def test_files_share_one_buffer(self):
+        """同一請求的多個檔案寫入同一塊預先配置的緩衝區"""
+        handler = FrameUploadHandler()
+        handler.handle_raw_input(None, {}, 100, b"boundary")
+        files = []
+        for data in (b"abcdef", b"xyz"):
+            with self.assertRaises(StopFutureHandlers):
+                handler.new_file("image", "a.jpg", "image/jpeg", None)
+            handler.receive_data_chunk(data[:2], 0)
+            handler.receive_data_chunk(data[2:], 2)
+            files.append(handler.file_complete(len(data)))
+
+        self.assertEqual([f.read() for f in files], [b"abcdef", b"xyz"])
+        self.assertIs(files[0].getbuffer().obj, handler.buffer)
+        self.assertIs(files[1].getbuffer().obj, handler.buffer)
+
+    @override_settings(EMOTION_MAX_UPLOAD_BYTES=10)
+    def test_oversized_body_is_not_read(self):
+        handler = FrameUploadHandler()
+        result = handler.handle_raw_input(None, {}, 11, b"boundary")
+        self.assertIsNotNone(result)
+        self.assertTrue(handler.too_large)
+        self.assertIsNone(handler.buffer)
+
+
+@patch("emotion.views.predict_emotion", return_value=RESULT)
+class TestDetectEmotionUpload(EmotionViewTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client = Client(enforce_csrf_checks=True)
+        self.client.force_login(self.user)
+        token = _get_new_csrf_token()
+        self.client.cookies["csrftoken"] = token
+        self.csrf = {"HTTP_X_CSRFTOKEN": token}
+        self.image = read_image("normal_face.jpg")
+
+    def post_multipart(self, **extra):
+        upload = SimpleUploadedFile("snapshot.jpg", self.image, content_type="image/jpeg")
+        return self.client.post(reverse("emotion_detect"), {"image": upload}, **extra)
+
+    def test_multipart_frame_is_passed_as_buffer(self, mock_predict):
+        with patch("emotion.views.preprocess_frame", wraps=preprocess_frame) as mock_pre:
+            response = self.post_multipart(**self.csrf)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual({k: response.json()[k] for k in RESULT}, RESULT)
+        frame = mock_pre.call_args[0][0]
+        self.assertIsInstance(frame, FrameUpload)
+        self.assertEqual(bytes(frame.getbuffer()), self.image)
+
+    def test_raw_jpeg_body(self, mock_predict):
+        response = self.client.post(reverse("emotion_detect"), self.image, content_type="image/jpeg", **self.csrf)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual({k: response.json()[k] for k in RESULT}, RESULT)
+
+    @override_settings(EMOTION_MAX_UPLOAD_BYTES=1024)
+    def test_oversized_upload_rejected(self, mock_predict):
+        self.assertEqual(self.post_multipart(**self.csrf).status_code, 413)
+        response = self.client.post(reverse("emotion_detect"), self.image, content_type="image/jpeg", **self.csrf)
+        self.assertEqual(response.status_code, 413)
+        mock_predict.assert_not_called()
+
+    def test_csrf_still_enforced(self, mock_predict):
+        self.assertEqual(self.post_multipart().status_code, 403)
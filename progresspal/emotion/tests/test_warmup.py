@@ -0,0 +1,85 @@
+# emotion/tests/test_warmup.py
+from unittest.mock import patch
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from emotion.services import warmup
+
+
+def ok():
+    pass
+
+
+def broken():
+    raise RuntimeError("找不到向量資料庫")
+
+
+class TestPreload(SimpleTestCase):
+
+    def setUp(self):
+        warmup.reset_state()
+        self.addCleanup(warmup.reset_state)
+
+    def test_should_preload(self):
+        """只有提供服務的行程預載"""
+        self.assertTrue(warmup.should_preload(["gunicorn", "progresspal.wsgi"]))
+        self.assertFalse(warmup.should_preload(["manage.py", "migrate"]))
+        self.assertFalse(warmup.should_preload(["manage.py", "test"]))
+        self.assertFalse(warmup.should_preload(["benchmarks/bench_face_detection.py"]))
+        self.assertTrue(warmup.should_preload(["manage.py", "runserver", "--noreload"]))
+        with patch.dict("os.environ", {"RUN_MAIN": "true"}):
+            self.assertTrue(warmup.should_preload(["manage.py", "runserver"]))
+
+    def test_blocking_preload_marks_components_ready(self):
+        with patch.dict(warmup.COMPONENTS, {"model": ok, "haar_cascades": ok, "embeddings": ok}):
+            warmup.start_preload("blocking")
+            data = warmup.get_readiness()
+        self.assertTrue(data["ready"])
+        self.assertEqual({c["status"] for c in data["components"].values()}, {warmup.READY})
+
+    def test_failed_component_is_reported(self):
+        """單一元件失敗不影響其他元件，整體未就緒"""
+        with patch.dict(warmup.COMPONENTS, {"model": ok, "haar_cascades": ok, "embeddings": broken}):
+            warmup.start_preload("blocking")  # 失敗的元件留給背景重試，cleanup 時停止
+            data = warmup.get_readiness()
+        self.assertFalse(data["ready"])
+        self.assertEqual(data["components"]["model"]["status"], warmup.READY)
+        self.assertEqual(data["components"]["embeddings"]["status"], warmup.FAILED)
+        self.assertIn("向量資料庫", data["components"]["embeddings"]["error"])
+
+    def test_failed_component_is_retried(self):
+        """推論服務晚於 worker 啟動時，重試成功後回報就緒"""
+        attempts = []
+
+        def flaky():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise ConnectionRefusedError("推論服務尚未啟動")
+
+        with patch.dict(warmup.COMPONENTS, {"model": flaky, "haar_cascades": ok, "embeddings": ok}), \
+                patch.object(warmup, "RETRY_BASE_SECONDS", 0.01):
+            thread = warmup.start_preload("blocking")
+            self.assertFalse(warmup.get_readiness()["ready"])
+            thread.join(timeout=5)
+            data = warmup.get_readiness()
+        self.assertTrue(data["ready"])
+        self.assertEqual(len(attempts), 3)
+
+    @override_settings(EMOTION_PRELOAD="off")
+    def test_off_does_nothing(self):
+        """不預載時元件於第一次使用時載入，就緒探測不會一直回傳 503"""
+        with patch.dict(warmup.COMPONENTS, {"model": broken}):
+            self.assertIsNone(warmup.start_preload())
+        data = warmup.get_readiness()
+        self.assertTrue(data["ready"])
+        self.assertEqual({c["status"] for c in data["components"].values()}, {warmup.LAZY})
+        self.assertEqual(self.client.get(reverse("emotion_ready")).status_code, 200)
+
+    def test_readiness_endpoint(self):
+        url = reverse("emotion_ready")
+        self.assertEqual(self.client.get(url).status_code, 503)
+
+        with patch.dict(warmup.COMPONENTS, {"model": ok, "haar_cascades": ok, "embeddings": ok}):
+            warmup.start_preload("blocking")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["ready"])
@@ -1,41 +1,70 @@
 # emotion/views.py
 from django.shortcuts import render
 from django.http import JsonResponse
-from django.contrib.auth.decorators import login_required
-from .emotion_model import predict_emotion, InputShapeError
-from .services.preprocess import preprocess_frame, NoFaceDetectedError, InvalidImageError 
-from .models import EmotionRecord
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from django.conf import settings
+from .emotion_model import predict_emotion, predict_emotions, aggregate_predictions, InputShapeError, get_remote_predictor
+from .services.inference import InferenceServiceError
+from .services.preprocess import preprocess_frame, preprocess_frames, NoFaceDetectedError, InvalidImageError 
+from .services.uploads import FrameUploadHandler, FrameTooLargeError, get_uploaded_frame, get_uploaded_frames
+from .services.warmup import get_readiness
+from .services import stats
+from .services.sampling import next_interval, record_latency
+from .services.recorder import record_emotion
+from .services.engagement import update_engagement
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
 
+@csrf_exempt
 @login_required
 def detect_emotion(request):
+    # 必須在 CsrfViewMiddleware 讀取 request.POST 之前換上 upload handler，
+    # 因此外層 csrf_exempt，內層再以 csrf_protect 檢查
+    request.upload_handlers = [FrameUploadHandler(request)]
+    return _detect_emotion(request)
+
+
+@csrf_protect
+def _detect_emotion(request):
     if request.method != "POST":
         return JsonResponse({"error": "POST only"}, status=405)
+    start = time.perf_counter()
 
-    image_file = request.FILES.get("image")
+    # 接受 multipart 欄位 image，或 Content-Type: image/jpeg 的原始 body
+    stats.record_client_skipped(request)
+    try:
+        image_file = get_uploaded_frame(request)
+    except FrameTooLargeError as e:
+        stats.record_frames(stats.TOO_LARGE)
+        return JsonResponse({"error": str(e)}, status=413)
 
     if not image_file:
         return JsonResponse({"error": "No image provided"}, status=400)
     
     # 1. Preprocess (含例外處理)
     try:
-        frame = preprocess_frame(image_file)
+        frame = preprocess_frame(image_file, user_id=request.user.id)
     except NoFaceDetectedError as e:
         # 預期錯誤：臉不明顯、無臉、多臉、模糊
-        return JsonResponse({"error": str(e)}, status=422)
+        stats.record_frames(stats.NO_FACE)
+        return JsonResponse({"error": str(e), "next_interval_ms": next_interval(request.user.id)}, status=422)
 
     except InvalidImageError as e:
         # 非法圖片格式
-        return JsonResponse({"error": str(e)}, status=422)
+        stats.record_frames(stats.INVALID_IMAGE)
+        return JsonResponse({"error": str(e), "next_interval_ms": next_interval(request.user.id)}, status=422)
 
     except Exception as e:
         # 預防預處理未知錯誤導致系統 crash
         print(f"Unexpected preprocessing error: {e}")
         return JsonResponse({"error": "Failed to preprocess image"}, status=500)
 
+    stats.record_frames(stats.ACCEPTED)
+
     # 2. 模型推論
     try:
         result = predict_emotion(frame)
@@ -52,15 +81,114 @@ def detect_emotion(request):
     except Exception as e:
         print(f"Unexpected inference error: {e}")
         return JsonResponse({"error": "Failed to perform emotion detection"}, status=500)
-    '''
-    # 3. 存進資料庫
+
+    # 3. 更新參與度狀態，並存進資料庫（先放入緩衝區，由背景執行緒批次寫入）
+    try:
+        update_engagement(request.user.id, result["emotion"])
+        record_emotion(request.user.id, result["emotion"], result["confidence"])
+    except Exception as e:
+        logger.error(f"Database save error: {e}")
+
+    # 4. 建議下一次取樣間隔（情緒穩定時拉長，改變時縮短，並依伺服器負載放大）
+    record_latency((time.perf_counter() - start) * 1000)
+    interval = next_interval(request.user.id, result["emotion"], result["confidence"])
+    return JsonResponse({**result, "next_interval_ms": interval})
+
+
+@csrf_exempt
+@login_required
+def detect_emotion_batch(request):
+    """一次上傳多張影像（multipart 欄位 frames），回傳逐張結果與整體情緒"""
+    request.upload_handlers = [FrameUploadHandler(request)]
+    return _detect_emotion_batch(request)
+
+
+@csrf_protect
+def _detect_emotion_batch(request):
+    if request.method != "POST":
+        return JsonResponse({"error": "POST only"}, status=405)
+    start = time.perf_counter()
+
+    stats.record_client_skipped(request)
     try:
-        EmotionRecord.objects.create(
-            user=request.user,
-            emotion=result["emotion"],
-            confidence=result["confidence"]
+        image_files = get_uploaded_frames(request)
+    except FrameTooLargeError as e:
+        stats.record_frames(stats.TOO_LARGE)
+        return JsonResponse({"error": str(e)}, status=413)
+
+    if not image_files:
+        return JsonResponse({"error": "No image provided"}, status=400)
+    max_frames = getattr(settings, "EMOTION_MAX_BATCH_FRAMES", 12)
+    if len(image_files) > max_frames:
+        return JsonResponse({"error": f"一次最多 {max_frames} 張影像"}, status=400)
+
+    # 1. Preprocess：逐張偵測臉部，成功的合併成一個 (N, H, W, 1) 批次
+    try:
+        batch, indices, errors = preprocess_frames(image_files, user_id=request.user.id)
+    except Exception as e:
+        print(f"Unexpected preprocessing error: {e}")
+        return JsonResponse({"error": "Failed to preprocess image"}, status=500)
+
+    results = [{"index": i, "error": str(e)} for i, e in sorted(errors.items())]
+    no_face = sum(isinstance(e, NoFaceDetectedError) for e in errors.values())
+    stats.record_frames(stats.NO_FACE, no_face)
+    stats.record_frames(stats.INVALID_IMAGE, len(errors) - no_face)
+    stats.record_frames(stats.ACCEPTED, len(indices))
+    if batch is None:
+        return JsonResponse(
+            {"results": results, "aggregate": None, "next_interval_ms": next_interval(request.user.id)},
+            status=422,
         )
+
+    # 2. 整批一次推論
+    try:
+        predictions = predict_emotions(batch)
+    except (InputShapeError, ValueError, RuntimeError) as e:
+        return JsonResponse({"error": str(e)}, status=500)
+    except Exception as e:
+        print(f"Unexpected inference error: {e}")
+        return JsonResponse({"error": "Failed to perform emotion detection"}, status=500)
+
+    results += [{"index": i, **pred} for i, pred in zip(indices, predictions)]
+    results.sort(key=lambda r: r["index"])
+    aggregate = aggregate_predictions(predictions)
+
+    try:
+        for pred in predictions:
+            update_engagement(request.user.id, pred["emotion"])
+            record_emotion(request.user.id, pred["emotion"], pred["confidence"])
     except Exception as e:
         logger.error(f"Database save error: {e}")
-    '''
-    return JsonResponse(result)
\ No newline at end of file
+
+    # 延遲以每張計，與單張端點可比較
+    record_latency((time.perf_counter() - start) * 1000 / len(image_files))
+    return JsonResponse({
+        "results": results,
+        "aggregate": aggregate,
+        "next_interval_ms": next_interval(request.user.id, aggregate["emotion"], aggregate["confidence"]),
+    })
+
+
+@login_required
+def client_config(request):
+    """camera.js 的取樣與預檢設定（EMOTION_CLIENT_CONFIG）"""
+    return JsonResponse(getattr(settings, "EMOTION_CLIENT_CONFIG", {}))
+
+
+@user_passes_test(lambda u: u.is_staff)
+def inference_metrics(request):
+    """推論服務的批次大小與延遲統計、影像拒絕計數（僅管理員）"""
+    frames = stats.get_frame_counters()
+    remote = get_remote_predictor()
+    if remote is None:
+        return JsonResponse({"mode": "local", "frames": frames})
+    try:
+        return JsonResponse({"mode": "service", "metrics": remote.metrics(), "frames": frames})
+    except InferenceServiceError as e:
+        return JsonResponse({"mode": "service", "error": str(e), "frames": frames}, status=503)
+
+
+def readiness(request):
+    """模型、Haar cascades、embeddings 是否皆已載入（供負載平衡器 / 部署探測）"""
+    data = get_readiness()
+    return JsonResponse(data, status=200 if data["ready"] else 503)
@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import Chapter, Unit, QuizQuestion
+from .services.quiz import invalidate_chapter_cache, recount_question_stats
 
 # Register your models here.
 class ChapterAdmin(admin.ModelAdmin):
@@ -11,8 +12,40 @@ class UnitAdmin(admin.ModelAdmin):
     list_filter = ('chapter',)
 
 class QuizQuestionAdmin(admin.ModelAdmin):
-    list_display = ('chapter', 'difficulty', 'question', 'answer')
+    list_display = ('chapter', 'difficulty', 'question', 'answer', 'attempt_count', 'correct_rate')
     list_filter = ('chapter', 'difficulty')
+    exclude = tuple(QuizQuestion.HTML_FIELD_MAP.values())
+    readonly_fields = QuizQuestion.STATS_FIELDS + ('correct_rate',)
+    actions = ['recount_stats']
+
+    def save_model(self, request, obj, form, change):
+        # 儲存前重新產生 HTML
+        obj.render_html()
+        if change:
+            # 不寫回作答統計，避免覆蓋編輯期間其他提交累加的次數
+            fields = [f.name for f in obj._meta.concrete_fields
+                      if not f.primary_key and f.name not in QuizQuestion.STATS_FIELDS]
+            obj.save(update_fields=fields)
+        else:
+            super().save_model(request, obj, form, change)
+        invalidate_chapter_cache(obj.chapter_id)
+        if change and 'chapter' in form.changed_data:
+            invalidate_chapter_cache(form.initial.get('chapter'))
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        invalidate_chapter_cache(obj.chapter_id)
+
+    @admin.action(description='重新計算作答統計')
+    def recount_stats(self, request, queryset):
+        count = recount_question_stats(queryset)
+        self.message_user(request, f"已重新計算 {count} 題的作答統計")
+
+    def delete_queryset(self, request, queryset):
+        chapter_ids = set(queryset.values_list('chapter_id', flat=True))
+        super().delete_queryset(request, queryset)
+        for chapter_id in chapter_ids:
+            invalidate_chapter_cache(chapter_id)
 
 admin.site.register(Chapter,ChapterAdmin)
 admin.site.register(Unit,UnitAdmin)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class LearningConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'learning'
+
+    def ready(self):
+        # 註冊系統檢查（共用 cache）
+        from . import checks  # noqa: F401
@@ -0,0 +1,49 @@
+# learning/checks.py
+"""
+系統檢查：CACHES['shared'] 必須為所有行程共用
+
+測驗 id 池與答案表（import_quizzes 等指令在另一個行程清除）、參與度狀態存在 shared cache；
+行程內的 LocMemCache / DummyCache 會讓各 worker 各自一份，清除快取與狀態更新都無法跨行程生效。
+資料庫 cache 可以共用，但每次偵測都要讀寫參與度狀態，正式環境（DEBUG=False）另外提出警告。
+"""
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+
+SHARED_CACHE_ALIAS = "shared"
+
+PROCESS_LOCAL_CACHES = {
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+}
+DATABASE_CACHE = "django.core.cache.backends.db.DatabaseCache"
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    if SHARED_CACHE_ALIAS not in settings.CACHES:
+        return [
+            Error(
+                "CACHES 沒有 'shared'，測驗快取與參與度狀態無法在各 worker 之間共用。",
+                hint="設定 MEMCACHED_LOCATION 使用 Memcached，或將 CACHES['shared'] 設為 DatabaseCache。",
+                id="learning.E001",
+            )
+        ]
+    backend = settings.CACHES[SHARED_CACHE_ALIAS].get("BACKEND")
+    if backend in PROCESS_LOCAL_CACHES:
+        return [
+            Error(
+                f"CACHES['shared'] 為行程內的 {backend.rsplit('.', 1)[-1]}，各 worker 與 manage.py 指令無法共用快取與狀態。",
+                hint="設定 MEMCACHED_LOCATION 使用 Memcached，或改用 DatabaseCache；"
+                     "確定只有單一行程時可加入 SILENCED_SYSTEM_CHECKS 忽略。",
+                id="learning.E001",
+            )
+        ]
+    if backend == DATABASE_CACHE and not settings.DEBUG:
+        return [
+            Warning(
+                "CACHES['shared'] 為資料庫 cache，每次情緒偵測都會讀寫參與度狀態，與紀錄寫入競爭資料庫鎖。",
+                hint="正式環境請設定 MEMCACHED_LOCATION 使用 Memcached。",
+                id="learning.W002",
+            )
+        ]
+    return []
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from learning.services.quiz import import_all_quizzes, import_quiz_files
+
+
+class Command(BaseCommand):
+    help = "匯入測驗題目 CSV（未指定檔案時匯入 learning/resources/ 下所有 CSV）"
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='*', help='CSV 檔案路徑')
+        parser.add_argument('--batch-size', type=int, default=500, help='每批寫入筆數')
+
+    def handle(self, *args, **options):
+        if options['files']:
+            import_quiz_files(options['files'], batch_size=options['batch_size'])
+        else:
+            import_all_quizzes(batch_size=options['batch_size'])
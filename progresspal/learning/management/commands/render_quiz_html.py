@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from learning.models import QuizQuestion
+
+
+class Command(BaseCommand):
+    help = "為測驗題目產生預先轉換的 HTML（預設只處理尚未轉換的題目）"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='重新轉換所有題目')
+        parser.add_argument('--batch-size', type=int, default=500, help='每批寫入筆數')
+
+    def handle(self, *args, **options):
+        queryset = QuizQuestion.objects.all()
+        if not options['all']:
+            queryset = queryset.filter(question_html='')
+
+        fields = list(QuizQuestion.HTML_FIELD_MAP.values())
+        batch_size = options['batch_size']
+        batch = []
+        total = 0
+
+        for question in queryset.iterator(chunk_size=batch_size):
+            question.render_html()
+            batch.append(question)
+            if len(batch) >= batch_size:
+                QuizQuestion.objects.bulk_update(batch, fields)
+                total += len(batch)
+                batch = []
+
+        if batch:
+            QuizQuestion.objects.bulk_update(batch, fields)
+            total += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"已轉換 {total} 筆題目"))
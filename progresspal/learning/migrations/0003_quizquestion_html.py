@@ -0,0 +1,43 @@
+# Generated by Django 3.2.25 on 2026-10-19 15:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0002_quizquestion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizquestion',
+            name='explanation_html',
+            field=models.TextField(blank=True, default='', verbose_name='解析 HTML'),
+        ),
+        migrations.AddField(
+            model_name='quizquestion',
+            name='option_a_html',
+            field=models.TextField(blank=True, default='', verbose_name='選項 A HTML'),
+        ),
+        migrations.AddField(
+            model_name='quizquestion',
+            name='option_b_html',
+            field=models.TextField(blank=True, default='', verbose_name='選項 B HTML'),
+        ),
+        migrations.AddField(
+            model_name='quizquestion',
+            name='option_c_html',
+            field=models.TextField(blank=True, default='', verbose_name='選項 C HTML'),
+        ),
+        migrations.AddField(
+            model_name='quizquestion',
+            name='option_d_html',
+            field=models.TextField(blank=True, default='', verbose_name='選項 D HTML'),
+        ),
+        migrations.AddField(
+            model_name='quizquestion',
+            name='question_html',
+            field=models.TextField(blank=True, default='', verbose_name='題目 HTML'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.25 on 2026-10-19 15:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0003_quizquestion_html'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='quizquestion',
+            index=models.Index(fields=['chapter', 'difficulty'], name='quiz_chapter_difficulty_idx'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 3.2.25 on 2026-10-19 15:37
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def fill_content_hash(apps, schema_editor):
+    """
+    為既有題目補上內容雜湊。同章節內容相同的題目只保留 id 最小的一題：
+    其他重複題的作答明細改指向保留的題目後刪除（否則重複題一儲存就會與保留題的雜湊衝突）。
+    """
+    QuizQuestion = apps.get_model('learning', 'QuizQuestion')
+    QuizResultQuestion = apps.get_model('accounts', 'QuizResultQuestion')
+    keepers = {}
+    duplicates = {}
+    batch = []
+    for q in QuizQuestion.objects.order_by('id').only('id', 'chapter_id', 'question').iterator():
+        content_hash = hashlib.sha1(f"{q.chapter_id}\n{q.question.strip()}".encode('utf-8')).hexdigest()
+        if content_hash in keepers:
+            duplicates[q.id] = keepers[content_hash]
+            continue
+        keepers[content_hash] = q.id
+        q.content_hash = content_hash
+        batch.append(q)
+    for duplicate_id, keeper_id in duplicates.items():
+        QuizResultQuestion.objects.filter(question_id=duplicate_id).update(question_id=keeper_id)
+    QuizQuestion.objects.filter(id__in=list(duplicates)).delete()
+    QuizQuestion.objects.bulk_update(batch, ['content_hash'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0004_quizquestion_chapter_difficulty_idx'),
+        ('accounts', '0004_auto_20251216_1400'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizquestion',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, max_length=40, null=True, unique=True, verbose_name='內容雜湊'),
+        ),
+        migrations.RunPython(fill_content_hash, migrations.RunPython.noop),
+    ]
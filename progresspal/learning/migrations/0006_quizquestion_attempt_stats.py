@@ -0,0 +1,42 @@
+# Generated by Django 3.2.25 on 2026-10-19 16:14
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_attempt_stats(apps, schema_editor):
+    """由既有的 QuizResultQuestion 計算作答統計"""
+    QuizQuestion = apps.get_model('learning', 'QuizQuestion')
+    QuizResultQuestion = apps.get_model('accounts', 'QuizResultQuestion')
+
+    def count(**filters):
+        rows = (
+            QuizResultQuestion.objects.filter(question=OuterRef('pk'), **filters)
+            .values('question').annotate(n=Count('id')).values('n')
+        )
+        return Coalesce(Subquery(rows, output_field=IntegerField()), Value(0))
+
+    QuizQuestion.objects.update(attempt_count=count(), correct_count=count(is_correct=True))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0005_quizquestion_content_hash'),
+        ('accounts', '0006_remove_quizresult_total_questions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizquestion',
+            name='attempt_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='作答次數'),
+        ),
+        migrations.AddField(
+            model_name='quizquestion',
+            name='correct_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='答對次數'),
+        ),
+        migrations.RunPython(backfill_attempt_stats, migrations.RunPython.noop),
+    ]
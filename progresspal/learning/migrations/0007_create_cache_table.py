@@ -0,0 +1,20 @@
+# Generated by Django 3.2.25 on 2026-10-19 20:10
+
+from django.core.management import call_command
+from django.db import migrations
+
+
+def create_cache_table(apps, schema_editor):
+    """建立 settings.CACHES 中資料庫 cache 的資料表（CACHES['shared'] 未設定 Memcached 時使用）；已存在時略過"""
+    call_command('createcachetable', database=schema_editor.connection.alias, verbosity=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0006_quizquestion_attempt_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_cache_table, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,8 @@
 from django.db import models
+from django.core.exceptions import ValidationError
+import hashlib
 import random
+from learning.services.utils import to_markdown
 # Create your models here.
 class Chapter(models.Model):
     chapter_number = models.PositiveIntegerField(unique=True, verbose_name="章節數字")
@@ -75,12 +78,93 @@ class QuizQuestion(models.Model):
     )
     
     explanation = models.TextField(verbose_name="解析")
+
+    # 預先轉換的 HTML（匯入或後台儲存時產生），測驗 API 直接回傳
+    question_html = models.TextField(blank=True, default="", verbose_name="題目 HTML")
+    option_a_html = models.TextField(blank=True, default="", verbose_name="選項 A HTML")
+    option_b_html = models.TextField(blank=True, default="", verbose_name="選項 B HTML")
+    option_c_html = models.TextField(blank=True, default="", verbose_name="選項 C HTML")
+    option_d_html = models.TextField(blank=True, default="", verbose_name="選項 D HTML")
+    explanation_html = models.TextField(blank=True, default="", verbose_name="解析 HTML")
     
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="建立時間")
 
+    # 作答統計（提交測驗時以 F() 累加，見 learning.services.quiz.record_attempts）
+    attempt_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="作答次數")
+    correct_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="答對次數")
+
+    # 章節 + 題目內容的雜湊，用於匯入時去除重複題目
+    content_hash = models.CharField(
+        max_length=40,
+        unique=True,
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="內容雜湊"
+    )
+
+    STATS_FIELDS = ('attempt_count', 'correct_count')
+
+    # 原始欄位 → HTML 欄位
+    HTML_FIELD_MAP = {
+        'question': 'question_html',
+        'option_a': 'option_a_html',
+        'option_b': 'option_b_html',
+        'option_c': 'option_c_html',
+        'option_d': 'option_d_html',
+        'explanation': 'explanation_html',
+    }
+
     class Meta:
         verbose_name = "測驗題目"
         verbose_name_plural = "測驗題目"
+        indexes = [
+            # 出題時依章節 + 難度篩選
+            models.Index(fields=['chapter', 'difficulty'], name='quiz_chapter_difficulty_idx'),
+        ]
 
     def __str__(self):
-        return f"[{self.chapter.chapter_number}-{self.difficulty}] {self.question[:20]}..."
\ No newline at end of file
+        return f"[{self.chapter.chapter_number}-{self.difficulty}] {self.question[:20]}..."
+
+    @staticmethod
+    def compute_content_hash(chapter_id, question):
+        """同一章節中相同題目文字會得到相同雜湊"""
+        return hashlib.sha1(f"{chapter_id}\n{question.strip()}".encode('utf-8')).hexdigest()
+
+    DUPLICATE_MESSAGE = '此章節已有相同的題目'
+
+    def validate_unique(self, exclude=None):
+        """content_hash 不在表單中，改以章節與題目檢查重複，錯誤顯示在題目欄位"""
+        super().validate_unique(exclude)
+        if self.chapter_id and self.question:
+            content_hash = self.compute_content_hash(self.chapter_id, self.question)
+            if QuizQuestion.objects.filter(content_hash=content_hash).exclude(pk=self.pk).exists():
+                raise ValidationError({'question': self.DUPLICATE_MESSAGE})
+
+    def save(self, *args, **kwargs):
+        """儲存時重新計算內容雜湊（update_fields 不含章節與題目時不變）"""
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or {'chapter', 'chapter_id', 'question'} & set(update_fields):
+            self.content_hash = self.compute_content_hash(self.chapter_id, self.question)
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'content_hash'}
+        super().save(*args, **kwargs)
+
+    @property
+    def correct_rate(self):
+        """答對率；尚無作答時為 None"""
+        return round(self.correct_count / self.attempt_count, 2) if self.attempt_count else None
+
+    def render_html(self):
+        """將題目、選項與解析轉成 HTML 存入對應欄位（不會自動儲存）"""
+        for source, target in self.HTML_FIELD_MAP.items():
+            setattr(self, target, to_markdown(getattr(self, source)))
+
+    def get_html(self, field):
+        """取得預先轉換的 HTML；尚未轉換時即時轉換"""
+        html = getattr(self, self.HTML_FIELD_MAP[field])
+        return html if html else to_markdown(getattr(self, field))
+
+    def get_options_html(self):
+        """依 A~D 順序回傳選項 HTML"""
+        return [self.get_html(f) for f in ('option_a', 'option_b', 'option_c', 'option_d')]
@@ -0,0 +1,103 @@
+# learning/services/adaptive.py
+"""
+適性出題：依學生在本章的作答紀錄與題目的全體答對率選題
+
+固定兩次查詢（與作答紀錄多寡無關）：
+1. 本章所有題目的 id、難度、作答統計（走 chapter+difficulty 索引）
+2. 該學生對這些題目的作答彙總（每題一列：作答次數、答對次數、最近一次是否答錯）
+
+選題規則：
+- 難度配額以 DIFFICULTY_QUOTA 為基準，本章答對率高的學生多一題困難、低的多一題簡單
+- 同一難度內優先順序：上次答錯 > 沒做過 > 做過且答對
+- 同一優先順序內，題目的全體答對率越接近學生的答對率越優先（加上隨機擾動，避免每次都一樣）
+"""
+import random
+
+from django.db.models import Count, Max, Q
+
+from accounts.models import QuizResultQuestion
+from learning.models import QuizQuestion
+
+HIGH_ACCURACY = 0.8
+LOW_ACCURACY = 0.4
+JITTER = 0.15
+
+REVIEW, UNSEEN, MASTERED = 0, 1, 2
+
+
+def smoothed_rate(correct, attempts):
+    """Laplace 平滑的答對率，沒有資料時為 0.5"""
+    return (correct + 1) / (attempts + 2)
+
+
+def load_chapter_questions(chapter_id):
+    """[(id, difficulty, attempt_count, correct_count), ...]"""
+    return list(
+        QuizQuestion.objects.filter(chapter_id=chapter_id)
+        .values_list("id", "difficulty", "attempt_count", "correct_count")
+    )
+
+
+def load_student_history(user, question_ids):
+    """{question_id: (作答次數, 答對次數, 最近一次是否答錯)}"""
+    rows = (
+        QuizResultQuestion.objects.filter(quiz_result__user=user, question_id__in=question_ids)
+        .values("question_id")
+        .annotate(
+            seen=Count("id"),
+            correct=Count("id", filter=Q(is_correct=True)),
+            last_seen=Max("quiz_result_id"),
+            last_wrong=Max("quiz_result_id", filter=Q(is_correct=False)),
+        )
+        .order_by()
+    )
+    return {
+        row["question_id"]: (row["seen"], row["correct"], row["last_wrong"] == row["last_seen"])
+        for row in rows
+    }
+
+
+def adjust_quota(quota, accuracy):
+    """依學生答對率在簡單與困難之間移動一題"""
+    quota = dict(quota)
+    if accuracy >= HIGH_ACCURACY and quota.get("easy", 0) > 0:
+        quota["easy"] -= 1
+        quota["hard"] = quota.get("hard", 0) + 1
+    elif accuracy <= LOW_ACCURACY and quota.get("hard", 0) > 0:
+        quota["hard"] -= 1
+        quota["easy"] = quota.get("easy", 0) + 1
+    return quota
+
+
+def select_question_ids(questions, history, quota, rng=random):
+    """
+    questions：load_chapter_questions 的結果；history：load_student_history 的結果。
+    回傳選出的題目 id（已打亂）。某難度題目不足時，缺額不補（與隨機出題相同）。
+    """
+    seen = sum(h[0] for h in history.values())
+    correct = sum(h[1] for h in history.values())
+    accuracy = smoothed_rate(correct, seen)
+    quota = adjust_quota(quota, accuracy) if seen else dict(quota)
+
+    by_level = {}
+    for q_id, difficulty, attempts, corrects in questions:
+        if q_id in history:
+            tier = REVIEW if history[q_id][2] else MASTERED
+        else:
+            tier = UNSEEN
+        # 全體答對率與學生答對率的差距，越小越適合
+        distance = abs(smoothed_rate(corrects, attempts) - accuracy) + rng.random() * JITTER
+        by_level.setdefault(difficulty, []).append((tier, distance, q_id))
+
+    selected = []
+    for level, count in quota.items():
+        candidates = sorted(by_level.get(level, []))
+        selected.extend(q_id for _, _, q_id in candidates[:count])
+    rng.shuffle(selected)
+    return selected
+
+
+def get_adaptive_question_ids(chapter_id, user, quota):
+    questions = load_chapter_questions(chapter_id)
+    history = load_student_history(user, [q[0] for q in questions]) if questions else {}
+    return select_question_ids(questions, history, quota)
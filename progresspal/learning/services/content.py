@@ -151,3 +151,18 @@ def get_chapter(chapter):
   else:
     return None
 
+
+#依據章節，輸出該章節的教材段落清單 [(單元編號, all_docs 索引, 段落文字)]
+def get_chapter_sections(chapter):
+  sections = []
+
+  for idx, doc in enumerate(all_docs):
+    unit_title = doc.metadata.get("單元", "")
+    if unit_title:
+      unit_num = re.match(r"(\d+-\d+)", unit_title).group(0)  # 抓單元編號
+      if unit_num.startswith(f"{chapter}-"):
+        sections.append((unit_num, idx, doc.page_content.strip()))
+
+  # 依單元排序（同單元內維持原順序）
+  sections.sort(key=lambda s: parse_unit_code(s[0]))
+  return sections
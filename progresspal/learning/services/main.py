@@ -3,6 +3,7 @@
 主要服務模組，整合問答、教材生成與測驗功能
 '''
 import os, re, textwrap, time, json,random
+import logging
 from dotenv import load_dotenv
 
 from google import genai
@@ -15,14 +16,19 @@ from learning.services.prompt import (
     generate_prompt,
     generate_materials,
     generate_prompt_extended,
-    set_system_prompt
+    set_system_prompt,
+    budget_materials
 )
 from learning.models import QuizQuestion
 from accounts.models import QuizResult, QuizResultQuestion
-from learning.services.content import get_unit, get_chapter
+from accounts.services import rollups
+from learning.services.content import get_unit, get_chapter_sections
+from learning.services.quiz import get_question_id_pool, get_answer_key, record_attempts
+from learning.services.adaptive import get_adaptive_question_ids
 from learning.services.utils import clean_text_tutoring, clean_text_qa
-from rag.services.rag import retrieve_docs
-from . import utils
+from rag.services.rag import retrieve_docs, get_bm25_scores
+
+logger = logging.getLogger(__name__)
 
 class RotationalGeminiClient:
     """
@@ -116,8 +122,8 @@ def get_gen_config(engagement,role):
 
 # 教材顯示
 def display_materials(chapter_id, unit_id, engagement, role):
-    unit = get_unit(chapter_id, unit_id)
-    prompt = generate_materials(engagement, unit)
+    docs, usage = get_budgeted_unit(chapter_id, unit_id)
+    prompt = generate_materials(engagement, docs)
     gen_config = get_gen_config(engagement, role)
     client = get_rotational_client()
     resp = client.models.generate_content(
@@ -130,7 +136,8 @@ def display_materials(chapter_id, unit_id, engagement, role):
         "teaching": result.get("teaching"),
         "example": result.get("example"),
         "summary": result.get("summary"),
-        "extended_questions": result.get("extended_question")
+        "extended_questions": result.get("extended_question"),
+        "token_usage": usage,
     }
 
 # 問答回應
@@ -151,19 +158,60 @@ def answer_question(mode, question, engagement, role, chapter_id=None, unit_id=N
         return {"error": "Invalid mode"}
 
 def answer_extended_question(question, engagement, chapter_id, unit_id, extended_question, role):
-    docs = get_chapter(chapter_id)
+    docs, usage = get_budgeted_chapter(chapter_id, f"{extended_question or ''} {question}", "extended_answer")
     prompt = generate_prompt_extended(
         engagement, question, docs,extended_question,
     )
-    return respond_to_question(prompt, engagement, role)
+    result = respond_to_question(prompt, engagement, role)
+    result["token_usage"] = usage
+    return result
+
+def get_budgeted_chapter(chapter_id, query, mode):
+    """
+    依 BM25 相關度挑選章節段落，使教材不超過該模式的 token 預算。
+    回傳: (段落 list, token 使用報告)
+    """
+    sections = get_chapter_sections(chapter_id)
+    scores = get_bm25_scores(query)
+    chunks = [f"=== {unit_num} ===\n{text}" for unit_num, _, text in sections]
+    chunk_scores = [scores[idx] for _, idx, _ in sections]
+    docs, usage = budget_materials(chunks, chunk_scores, mode)
+    log_token_usage(usage)
+    return docs, usage
+
+def get_budgeted_unit(chapter_id, unit_id):
+    """
+    單元教材依 tutoring 預算截取，超過時保留前面的段落（教學依段落順序進行）。
+    回傳: (段落 list, token 使用報告)
+    """
+    unit_code = f"{chapter_id}-{unit_id}"
+    chunks = [text for unit_num, _, text in get_chapter_sections(chapter_id) if unit_num == unit_code]
+    docs, usage = budget_materials(chunks, [-i for i in range(len(chunks))], "tutoring")
+    log_token_usage(usage)
+    return docs, usage
+
+def get_budgeted_docs(docs):
+    """檢索結果（已依融合分數排序）依 qa 預算挑選，回傳: (段落 list, token 使用報告)"""
+    docs = docs or []
+    chunks = [doc.page_content for doc in docs]
+    scores = [doc.metadata.get("score", 0.0) for doc in docs]
+    materials, usage = budget_materials(chunks, scores, "qa")
+    log_token_usage(usage)
+    return materials, usage
+
+def log_token_usage(usage):
+    logger.info("[Token] %s: 教材 %s → %s tokens，節省 %s",
+                usage["mode"], usage["original_tokens"], usage["used_tokens"], usage["saved_tokens"])
 
 def answer_relevant_question(question, engagement, role):
     analysis = classify_question(question)
     if analysis["category"] != "relevant":
         return {"error": "這個問題與教材無關"}
-    docs = retrieve_docs(analysis, top_k=5)
+    docs, usage = get_budgeted_docs(retrieve_docs(analysis, top_k=5))
     prompt = generate_prompt(engagement, question, docs)
-    return respond_to_question(prompt, engagement, role)
+    result = respond_to_question(prompt, engagement, role)
+    result["token_usage"] = usage
+    return result
 
 def answer_demand_question(question, engagement, unit_id, role):
     analysis = classify_question(question)
@@ -187,36 +235,51 @@ def respond_to_question(prompt, engagement, role):
         "extended_question": result.get("extended_question")
     }
 
-def get_exam_questions(chapter):
+# 每次測驗各難度題數
+DIFFICULTY_QUOTA = {
+    "easy": 4,
+    "medium": 3,
+    "hard": 3,
+}
+
+def get_exam_questions(chapter, user=None):
     """
-    根據指定章節回傳隨機 10 題（簡單 4、中等 3、困難 3）。若題庫不足，會自動縮減。
+    根據指定章節回傳 10 題（簡單 4、中等 3、困難 3）。若題庫不足，會自動縮減。
+    先只取 id 選題，再用一次 in_bulk 載入選中的題目。
+    傳入已登入的 user 且 QUIZ_ADAPTIVE 為 True 時依作答紀錄適性選題（選題 2 次 + in_bulk 共 3 次查詢，
+    /quiz/api/ 另有 1 次章節查詢，開始測驗共 4 次），否則隨機抽樣。
     """
-    # 讀取題庫
-    difficulty_map = {
-        "easy": 4,
-        "medium": 3,
-        "hard": 3,
-    }
-    selected = []
-    for level, required_num in difficulty_map.items():
-        qs = list(QuizQuestion.objects.filter(chapter=chapter, difficulty=level))
-        count = min(required_num, len(qs))
-        if count > 0:
-            selected.extend(random.sample(qs, count))
-    # 打亂
-    random.shuffle(selected)
-    return selected
+    if user is not None and user.is_authenticated and getattr(settings, 'QUIZ_ADAPTIVE', True):
+        selected_ids = get_adaptive_question_ids(chapter.id, user, DIFFICULTY_QUOTA)
+    else:
+        pool = get_question_id_pool(chapter.id)
+        selected_ids = []
+        for level, required_num in DIFFICULTY_QUOTA.items():
+            ids = pool.get(level, [])
+            count = min(required_num, len(ids))
+            if count > 0:
+                selected_ids.extend(random.sample(ids, count))
+        # 打亂
+        random.shuffle(selected_ids)
+    question_map = QuizQuestion.objects.in_bulk(selected_ids)
+    # 快取中的 id 可能已被刪除，略過即可
+    return [question_map[q_id] for q_id in selected_ids if q_id in question_map]
 
 def process_quiz_submission(user, chapter_code, user_answers_list):
     """
     處理測驗提交：計算分數、生成詳細結果並寫入資料庫。回傳: (score, results) tuple
+    答案與解析取自章節答案表（快取），資料庫只用於寫入 QuizResult / QuizResultQuestion
+    （提交的題目不在答案表時多一次 exists 查詢）。
     """
     if not user_answers_list:
         return 0, []
-    # 1. 取得所有題目資料
-    question_ids = [item.get('question_id') for item in user_answers_list]
-    questions = QuizQuestion.objects.filter(id__in=question_ids)
-    question_map = {q.id: q for q in questions}
+    # 1. 取得章節答案表；不屬於本章節的題目略過
+    answer_key = get_answer_key(chapter_code)
+    missing = [item.get('question_id') for item in user_answers_list if item.get('question_id') not in answer_key]
+    missing = [q_id for q_id in missing if isinstance(q_id, int)]
+    # 快取可能早於題目新增：缺少的題目確實在本章節時才重建（偽造或其他章節的 id 只多一次 exists 查詢）
+    if missing and QuizQuestion.objects.filter(id__in=missing, chapter__chapter_number=chapter_code).exists():
+        answer_key = get_answer_key(chapter_code, refresh=True)
     results = []
     score = 0
     details_to_create = []
@@ -224,30 +287,25 @@ def process_quiz_submission(user, chapter_code, user_answers_list):
     for item in user_answers_list:
         q_id = item.get('question_id')
         user_selected = item.get('selected_index')        
-        question_obj = question_map.get(q_id)
-        if not question_obj:
+        entry = answer_key.get(q_id)
+        if not entry:
             continue            
-        is_correct = (user_selected == question_obj.answer)       
+        is_correct = (user_selected == entry["answer"])       
         if is_correct:
             score += 1
         # 準備回傳給前端的資料結構
         results.append({
-            "question_id": question_obj.id,
-            "question": question_obj.question,
-            "options": [
-                utils.to_markdown(question_obj.option_a),
-                utils.to_markdown(question_obj.option_b),
-                utils.to_markdown(question_obj.option_c),
-                utils.to_markdown(question_obj.option_d),
-            ],
+            "question_id": q_id,
+            "question": entry["question"],
+            "options": entry["options"],
             "user_answer": user_selected,
-            "answer": question_obj.answer,
-            "explanation": utils.to_markdown(question_obj.explanation),
+            "answer": entry["answer"],
+            "explanation": entry["explanation"],
             "is_correct": is_correct,
         })
         # 準備寫入資料庫的明細物件
         details_to_create.append({
-            "question": question_obj,
+            "question_id": q_id,
             "user_answer": user_selected,
             "is_correct": is_correct
         })
@@ -259,16 +317,19 @@ def process_quiz_submission(user, chapter_code, user_answers_list):
             chapter_code=chapter_code,
             score=score,
         )
+        rollups.record_quiz(quiz_result)
         # 建立測驗明細紀錄
         QuizResultQuestion.objects.bulk_create([
             QuizResultQuestion(
                 quiz_result=quiz_result,
-                question=d['question'],
+                question_id=d['question_id'],
                 selected_answer=d['user_answer'],
                 is_correct=d['is_correct'],
             )
             for d in details_to_create
         ])
+        # 題目作答統計（同一 transaction）
+        record_attempts((d['question_id'], d['is_correct']) for d in details_to_create)
     return score, results
 
 
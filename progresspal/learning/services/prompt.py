@@ -4,6 +4,8 @@
 '''
 設定動態指令
 '''
+import math
+import re
 
 PROMPT_TEMPLATES = {
     # 行為 1：問答（簡短自然語言）
@@ -178,4 +180,72 @@ def generate_prompt_extended(engagement, answer, materials,topic):
       answer=answer,
       materials=materials_text
   )
-  return prompt_text
\ No newline at end of file
+  return prompt_text
+
+
+# 各模式教材的 token 預算（僅計算教材部分，不含模板與系統指令）
+MATERIAL_TOKEN_BUDGETS = {
+    "qa": 1500,
+    "tutoring": 3000,
+    "extended_answer": 2000,
+}
+
+# 中日韓文字與全形標點，約 1 字 1 token
+_CJK_PATTERN = re.compile(r"[\u3000-\u303f\u3400-\u9fff\uf900-\ufaff\uff00-\uffef]")
+
+def estimate_tokens(text):
+  '''
+  粗估文字的 token 數：中文字約 1 字 1 token，其餘字元約 4 字元 1 token
+  '''
+  if not text:
+    return 0
+  cjk = len(_CJK_PATTERN.findall(text))
+  return cjk + math.ceil((len(text) - cjk) / 4)
+
+def _truncate_to_tokens(text, budget):
+  '''將文字截斷至不超過 budget 個 token'''
+  used = 0
+  for i, ch in enumerate(text):
+    used += 1 if _CJK_PATTERN.match(ch) else 0.25
+    if used > budget:
+      return text[:i]
+  return text
+
+# 依預算挑選教材段落
+def budget_materials(chunks, scores, mode):
+  '''
+  chunks=list(教材段落)
+  scores=list(各段落相關度分數，例如 BM25)
+  mode=qa/tutoring/extended_answer
+  return: (選取的段落 list，維持原順序, token 使用報告 dict)
+  '''
+  budget = MATERIAL_TOKEN_BUDGETS.get(mode)
+  costs = [estimate_tokens(c) for c in chunks]
+  original = sum(costs)
+
+  if budget is None or original <= budget:
+    selected = list(chunks)
+  else:
+    # 由相關度高到低放入，放不下的段落略過
+    order = sorted(range(len(chunks)), key=lambda i: scores[i], reverse=True)
+    keep = []
+    used = 0
+    for i in order:
+      if used + costs[i] <= budget:
+        keep.append(i)
+        used += costs[i]
+    if keep:
+      selected = [chunks[i] for i in sorted(keep)]
+    else:
+      # 單一段落就超過預算：保留最相關段落的開頭
+      selected = [_truncate_to_tokens(chunks[order[0]], budget)] if chunks else []
+
+  used = sum(estimate_tokens(c) for c in selected)
+  report = {
+      "mode": mode,
+      "budget": budget,
+      "original_tokens": original,
+      "used_tokens": used,
+      "saved_tokens": original - used,
+  }
+  return selected, report
@@ -1,10 +1,156 @@
+import codecs
 import csv
+import io
 import os
+import time
 from django.core.exceptions import ObjectDoesNotExist
 import glob
 from django.conf import settings
-from django.db import transaction
+from django.core.cache import caches
+from django.utils.connection import ConnectionProxy
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
 from learning.models import Chapter, QuizQuestion 
+from accounts.models import QuizResultQuestion
+
+# id 池與答案表由 import_quizzes、admin 等其他行程清除，放在所有行程共用的 cache
+cache = ConnectionProxy(caches, "shared")
+
+# ==========================================
+# 題目 id 池 (出題用)
+# ==========================================
+def _id_pool_cache_key(chapter_id):
+    return f"quiz:id_pool:{chapter_id}"
+
+def get_question_id_pool(chapter_id):
+    """
+    取得章節各難度的題目 id 清單 {"easy": [...], "medium": [...], "hard": [...]}。
+    只查詢 id 與難度（走 chapter+difficulty 索引）；
+    QUIZ_ID_POOL_CACHE_TIMEOUT > 0 時會快取結果（存在 CACHES['shared']，import_quizzes 等其他行程的清除對所有 worker 生效）。
+    """
+    timeout = getattr(settings, 'QUIZ_ID_POOL_CACHE_TIMEOUT', 0)
+    key = _id_pool_cache_key(chapter_id)
+    if timeout:
+        pool = cache.get(key)
+        if pool is not None:
+            return pool
+
+    pool = {}
+    rows = QuizQuestion.objects.filter(chapter_id=chapter_id).values_list('id', 'difficulty')
+    for q_id, difficulty in rows:
+        pool.setdefault(difficulty, []).append(q_id)
+
+    if timeout:
+        cache.set(key, pool, timeout)
+    return pool
+
+def invalidate_chapter_cache(chapter_id, chapter_number=None):
+    """
+    題目新增、修改或刪除後清除該章節的快取（id 池與答案表）。
+    答案表以章節代碼為鍵，未傳入 chapter_number 時查詢一次。
+    """
+    keys = [_id_pool_cache_key(chapter_id)]
+    if chapter_number is None:
+        chapter_number = Chapter.objects.filter(pk=chapter_id).values_list('chapter_number', flat=True).first()
+    if chapter_number is not None:
+        keys.append(_answer_key_cache_key(chapter_number))
+    cache.delete_many(keys)
+
+# ==========================================
+# 答案表 (批改用)
+# ==========================================
+def _answer_key_cache_key(chapter_number):
+    return f"quiz:answer_key:{chapter_number}"
+
+def get_answer_key(chapter_number, refresh=False):
+    """
+    取得章節的答案表 {question_id: {"answer", "question", "options", "explanation"}}，
+    options 與 explanation 為預先轉換的 HTML。批改時只查這張表，不必讀取 QuizQuestion。
+    以 chapter_number（網址中的章節代碼）為鍵；QUIZ_ANSWER_KEY_CACHE_TIMEOUT > 0 時快取於 CACHES['shared']，
+    題目儲存、刪除或匯入時由 invalidate_chapter_cache 清除。refresh=True 時略過快取直接重建。
+    """
+    timeout = getattr(settings, 'QUIZ_ANSWER_KEY_CACHE_TIMEOUT', 0)
+    key = _answer_key_cache_key(chapter_number)
+    if timeout and not refresh:
+        answer_key = cache.get(key)
+        if answer_key is not None:
+            return answer_key
+
+    answer_key = {}
+    questions = QuizQuestion.objects.filter(chapter__chapter_number=chapter_number).defer('content_hash')
+    for q in questions.iterator():
+        answer_key[q.id] = {
+            "answer": q.answer,
+            "question": q.question,
+            "options": q.get_options_html(),
+            "explanation": q.get_html('explanation'),
+        }
+
+    if timeout:
+        cache.set(key, answer_key, timeout)
+    return answer_key
+
+# ==========================================
+# 作答統計 (題目分析用)
+# ==========================================
+def record_attempts(answers):
+    """
+    提交測驗時累加題目的作答 / 答對次數；answers 為 (question_id, is_correct) 的 iterable。
+    以 F() 在資料庫端累加（不會覆蓋其他同時提交的結果），增量相同的題目合併成一次 UPDATE，
+    一般一次提交只需兩次 UPDATE（答對、答錯）。應在寫入 QuizResultQuestion 的同一個 transaction 內呼叫。
+    """
+    increments = {}
+    for q_id, is_correct in answers:
+        attempts, correct = increments.get(q_id, (0, 0))
+        increments[q_id] = (attempts + 1, correct + int(bool(is_correct)))
+
+    groups = {}
+    for q_id, increment in increments.items():
+        groups.setdefault(increment, []).append(q_id)
+    for (attempts, correct), ids in groups.items():
+        QuizQuestion.objects.filter(id__in=ids).update(
+            attempt_count=F('attempt_count') + attempts,
+            correct_count=F('correct_count') + correct,
+        )
+
+def question_stats_row(question):
+    """題目統計的 JSON 格式；question 可為 QuizQuestion 或含相同欄位的 dict"""
+    get = question.get if isinstance(question, dict) else lambda field: getattr(question, field)
+    attempts, correct = get('attempt_count'), get('correct_count')
+    return {
+        "question_id": get('id'),
+        "difficulty": get('difficulty'),
+        "attempts": attempts,
+        "correct": correct,
+        "correct_rate": round(correct / attempts, 2) if attempts else None,
+    }
+
+def get_question_stats(question_id):
+    """單題統計（一次主鍵查詢，只讀統計欄位）；題目不存在時拋出 QuizQuestion.DoesNotExist"""
+    row = QuizQuestion.objects.values('id', 'difficulty', 'attempt_count', 'correct_count').get(pk=question_id)
+    return question_stats_row(row)
+
+def get_chapter_question_stats(chapter_id):
+    """章節所有題目的統計（走 chapter+difficulty 索引）"""
+    rows = (
+        QuizQuestion.objects.filter(chapter_id=chapter_id)
+        .values('id', 'difficulty', 'attempt_count', 'correct_count')
+        .order_by('difficulty', 'id')
+    )
+    return [question_stats_row(row) for row in rows]
+
+def recount_question_stats(queryset=None):
+    """由 QuizResultQuestion 重新計算作答統計（例如刪除測驗紀錄後校正），回傳更新的題目數"""
+    def count(**filters):
+        rows = (
+            QuizResultQuestion.objects.filter(question=OuterRef('pk'), **filters)
+            .values('question').annotate(n=Count('id')).values('n')
+        )
+        return Coalesce(Subquery(rows, output_field=IntegerField()), Value(0))
+
+    queryset = QuizQuestion.objects.all() if queryset is None else queryset
+    return queryset.update(attempt_count=count(), correct_count=count(is_correct=True))
 
 # ==========================================
 # 使用範例 (如何在 Django Shell 中執行)
@@ -14,9 +160,10 @@ from learning.models import Chapter, QuizQuestion
 2. 進入 Shell 後，輸入以下指令執行：
     from learning.services.quiz import import_all_quizzes
     import_all_quizzes()
+或直接執行：python manage.py import_quizzes [CSV 路徑 ...]
 '''
 
-def import_all_quizzes():
+def import_all_quizzes(batch_size=500):
     """
     自動掃描 learning/resources/ 下的所有 CSV 檔並執行匯入
     """
@@ -35,81 +182,89 @@ def import_all_quizzes():
     print(f"發現 {len(csv_files)} 個 CSV 檔案，準備開始匯入...")
     print("="*50)
 
-    for filename in csv_files:
-        file_path = os.path.join(resources_dir, filename)
-        print(f"正在處理檔案: {filename}")
-        import_quiz_from_csv(file_path)
-        print("-" * 50)
+    file_paths = [os.path.join(resources_dir, filename) for filename in csv_files]
+    return import_quiz_files(file_paths, batch_size=batch_size)
 
-def import_quiz_from_csv(file_path):
+def import_quiz_from_csv(file_path, batch_size=500):
     """
     讀取單一 CSV 檔案並匯入資料庫 (防止重複儲存版)
     """
-    if os.path.getsize(file_path) == 0:
-        print(f"失敗: 檔案是空的 (0 bytes)。")
-        return
+    return import_quiz_files([file_path], batch_size=batch_size)
 
-    questions_to_create = []
-    success_count = 0
-    skip_count = 0  # 新增跳過計數
-    error_count = 0
-
-    encodings_to_try = ['utf-8-sig', 'utf-8', 'big5', 'cp950']
-    decoded_file = None
-    used_encoding = None
+# ==========================================
+# 批次匯入
+# ==========================================
+ENCODINGS_TO_TRY = ['utf-8-sig', 'big5', 'cp950']
+ENCODING_SAMPLE_SIZE = 64 * 1024
 
-    for enc in encodings_to_try:
+def detect_encoding(binary_file):
+    """
+    讀取檔案開頭判斷編碼，判斷後把檔案指標移回開頭。
+    utf-8-sig 可同時處理有無 BOM 的 UTF-8。
+    """
+    sample = binary_file.read(ENCODING_SAMPLE_SIZE)
+    binary_file.seek(0)
+    for enc in ENCODINGS_TO_TRY:
         try:
-            f = open(file_path, mode='r', encoding=enc)
-            f.readline()
-            f.seek(0)
-            decoded_file = f
-            used_encoding = enc
-            break
+            # final=False：樣本結尾被截斷的多位元組字元不算錯誤
+            codecs.getincrementaldecoder(enc)().decode(sample, final=False)
+            return enc
         except UnicodeDecodeError:
-            f.close()
             continue
-    
-    if not decoded_file:
-        print(f"失敗: 無法辨識檔案編碼。")
-        return
-
-    print(f"使用編碼: {used_encoding}")
+    return None
 
+def _parse_csv(file_path, chapters, seen_hashes, batch_size, stats):
+    """
+    串流解析單一 CSV，每滿 batch_size 筆產生一批 QuizQuestion 物件（generator）。
+    chapters / seen_hashes 為所有檔案共用的預載資料，不會查詢資料庫。
+    統計寫入 stats，訊息放在 stats["messages"]，由呼叫端依檔案順序輸出。
+    """
+    log = stats["messages"].append
     try:
-        with decoded_file as csvfile:
+        if os.path.getsize(file_path) == 0:
+            log("失敗: 檔案是空的 (0 bytes)。")
+            return
+
+        with open(file_path, mode='rb') as binary_file:
+            used_encoding = detect_encoding(binary_file)
+            if not used_encoding:
+                log("失敗: 無法辨識檔案編碼。")
+                return
+            log(f"使用編碼: {used_encoding}")
+
+            csvfile = io.TextIOWrapper(binary_file, encoding=used_encoding, newline='')
             reader = csv.DictReader(csvfile)
-            
             if not reader.fieldnames:
-                print(f"失敗: 讀取不到標題。")
+                log("失敗: 讀取不到標題。")
                 return
-            
             reader.fieldnames = [name.strip() for name in reader.fieldnames]
 
+            batch = []
             for row_index, row in enumerate(reader, start=1):
                 try:
                     if not row.get('chapter') or not row.get('question'):
                         continue
+                    stats["rows"] += 1
 
                     # 1. 取得章節
                     try:
-                        chapter_num = int(row['chapter'].strip())
-                        chapter_obj = Chapter.objects.get(chapter_number=chapter_num)
-                    except (ValueError, Chapter.DoesNotExist):
-                        print(f"第 {row_index} 行跳過: 章節錯誤")
-                        error_count += 1
+                        chapter_id = chapters[int(row['chapter'].strip())]
+                    except (ValueError, KeyError):
+                        log(f"第 {row_index} 行跳過: 章節錯誤")
+                        stats["errors"] += 1
                         continue
 
-                    # 2. 【關鍵修改】檢查題目是否已存在
+                    # 2. 以內容雜湊檢查題目是否已存在（含其他檔案）
                     question_text = row.get('question', '').strip()
-                    if QuizQuestion.objects.filter(chapter=chapter_obj, question=question_text).exists():
-                        # print(f" 第 {row_index} 行跳過: 題目已存在") # 如果覺得訊息太多可以註解掉這行
-                        skip_count += 1
+                    content_hash = QuizQuestion.compute_content_hash(chapter_id, question_text)
+                    if content_hash in seen_hashes:
+                        stats["skipped"] += 1
                         continue
+                    seen_hashes.add(content_hash)
 
                     # 3. 準備建立物件
                     question = QuizQuestion(
-                        chapter=chapter_obj,
+                        chapter_id=chapter_id,
                         difficulty=row.get('difficulty', 'easy').strip(),
                         question=question_text,
                         option_a=row.get('option_A', '').strip(),
@@ -117,30 +272,92 @@ def import_quiz_from_csv(file_path):
                         option_c=row.get('option_C', '').strip(),
                         option_d=row.get('option_D', '').strip(),
                         answer=row.get('answer', '').strip(),
-                        explanation=row.get('explanation', '').strip()
+                        explanation=row.get('explanation', '').strip(),
+                        content_hash=content_hash,
                     )
-                    questions_to_create.append(question)
-                    success_count += 1
+                    question.render_html()
+                    batch.append(question)
+                    stats["queued"] += 1
 
                 except Exception as e:
-                    print(f"第 {row_index} 行錯誤: {e}")
-                    error_count += 1
-
-        # 4. 寫入資料庫
-        if questions_to_create:
-            QuizQuestion.objects.bulk_create(questions_to_create)
-            print(f"成功新增 {success_count} 筆題目")
-        else:
-            print(f"沒有需要新增的題目")
-
-        if skip_count > 0:
-            print(f"跳過 {skip_count} 筆重複的題目")
-        
-        if error_count > 0:
-            print(f"發生 {error_count} 筆錯誤")
+                    log(f"第 {row_index} 行錯誤: {e}")
+                    stats["errors"] += 1
+
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+
+            if batch:
+                yield batch
 
     except Exception as e:
-        print(f"錯誤: {e}")
-    finally:
-        if decoded_file and not decoded_file.closed:
-            decoded_file.close()
\ No newline at end of file
+        log(f"錯誤: {e}")
+
+def _insert_batch(batch, batch_size):
+    """
+    寫入一批題目，回傳實際新增的筆數。
+    與資料庫中的雜湊衝突時（例如其他行程同時匯入）查出衝突的題目、略過後重試，只有這種情況多一次查詢。
+    """
+    while batch:
+        try:
+            with transaction.atomic():
+                QuizQuestion.objects.bulk_create(batch, batch_size=batch_size)
+            return len(batch)
+        except IntegrityError:
+            existing = set(
+                QuizQuestion.objects.filter(content_hash__in=[q.content_hash for q in batch])
+                .values_list('content_hash', flat=True)
+            )
+            if not existing:
+                raise
+            batch = [q for q in batch if q.content_hash not in existing]
+    return 0
+
+def import_quiz_files(file_paths, batch_size=500):
+    """
+    依序解析多個 CSV，以 bulk_create 分批寫入，全部在同一個交易中完成。
+    - 章節與既有題目雜湊各只查詢一次
+    - 解析（CSV、Markdown、雜湊）是純 Python 的 CPU 工作，寫入在 SQLite 只有一個寫入者，
+      多執行緒兩邊都不會變快，因此在單一執行緒中邊解析邊寫入，記憶體只保留一批
+    - 寫入失敗時整個交易回復，例外拋給呼叫端
+    回傳統計 dict（created 為實際新增的筆數，conflicts 為同時匯入等原因被唯一限制略過的筆數），並印出每秒處理筆數。
+    """
+    start = time.perf_counter()
+
+    chapters = dict(Chapter.objects.values_list('chapter_number', 'id'))
+    seen_hashes = set(
+        QuizQuestion.objects.exclude(content_hash__isnull=True).values_list('content_hash', flat=True)
+    )
+    touched_chapters = set()
+    created = 0
+    file_stats = []
+
+    with transaction.atomic():
+        for path in file_paths:
+            stats = {"file": os.path.basename(path), "rows": 0, "queued": 0, "skipped": 0, "errors": 0,
+                     "messages": []}
+            file_stats.append(stats)
+            for batch in _parse_csv(path, chapters, seen_hashes, batch_size, stats):
+                # 4. 寫入資料庫（雜湊唯一，同時匯入時的衝突略過）
+                created += _insert_batch(batch, batch_size)
+                touched_chapters.update(q.chapter_id for q in batch)
+
+    chapter_numbers = {chapter_id: number for number, chapter_id in chapters.items()}
+    for chapter_id in touched_chapters:
+        invalidate_chapter_cache(chapter_id, chapter_numbers[chapter_id])
+
+    elapsed = time.perf_counter() - start
+    totals = {key: sum(s[key] for s in file_stats) for key in ("rows", "queued", "skipped", "errors")}
+    totals["created"] = created
+    totals["conflicts"] = totals["queued"] - totals["created"]
+    totals["files"] = file_stats
+    totals["seconds"] = elapsed
+    totals["rows_per_sec"] = totals["rows"] / elapsed if elapsed > 0 else 0.0
+
+    for s in file_stats:
+        for message in s["messages"]:
+            print(f"[{s['file']}] {message}")
+        print(f"[{s['file']}] 新題目 {s['queued']} 筆，跳過重複 {s['skipped']} 筆，錯誤 {s['errors']} 筆")
+    print(f"共處理 {totals['rows']} 筆，實際新增 {totals['created']} 筆"
+          f"（唯一限制略過 {totals['conflicts']} 筆），耗時 {elapsed:.2f} 秒 ({totals['rows_per_sec']:.0f} rows/sec)")
+    return totals
@@ -2,12 +2,22 @@
 # utils.py
 import textwrap
 import re
-from markdown import markdown
+import threading
+from markdown import Markdown
 
 """格式整理工具"""
 
+# 預先編譯的解析規則
+TUTORING_SECTION_PATTERN = re.compile(r"###\s*(教學重點|範例|總結|引導提問)\s*([\s\S]*?)(?=\n###|\Z)")
+QA_SECTION_PATTERN = re.compile(r"###\s*(回答問題|引導提問)\s*([\s\S]*?)(?=\n###|\Z)")
+LIST_PREFIX_PATTERN = re.compile(r"^(\d+\.|\d+\)|[-•])\s*")
+
+MARKDOWN_EXTENSIONS = ['fenced_code', 'nl2br', 'tables']
+
+# 每個執行緒共用一個 Markdown 轉換器，避免每次呼叫都重新載入 extensions
+_renderer_local = threading.local()
+
 def clean_text_tutoring(raw_text: str) -> dict:
-  import re
   """
   將 Markdown 格式 (含 ### 教學重點、範例、總結、引導提問) 轉成 dict
   """
@@ -22,8 +32,7 @@ def clean_text_tutoring(raw_text: str) -> dict:
   raw_text = raw_text.strip() + "\n"
 
   # 改良正則，多行匹配
-  pattern = r"###\s*(教學重點|範例|總結|引導提問)\s*([\s\S]*?)(?=\n###|\Z)"
-  matches = re.findall(pattern, raw_text)
+  matches = TUTORING_SECTION_PATTERN.findall(raw_text)
 
   for title, content in matches:
     content = content.strip()
@@ -45,7 +54,6 @@ def clean_text_tutoring(raw_text: str) -> dict:
   return sections
 
 def clean_text_qa(raw_text: str) -> dict:
-  import re
   """
   將 QA 模式回應解析成 dict
   {
@@ -59,8 +67,7 @@ def clean_text_qa(raw_text: str) -> dict:
   raw_text = raw_text.strip() + "\n"
 
   # 匹配兩個區塊
-  pattern = r"###\s*(回答問題|引導提問)\s*([\s\S]*?)(?=\n###|\Z)"
-  matches = re.findall(pattern, raw_text)
+  matches = QA_SECTION_PATTERN.findall(raw_text)
 
   for title, content in matches:
       content = content.strip()
@@ -76,9 +83,20 @@ def clean_text_qa(raw_text: str) -> dict:
 
   return sections
 
+def get_markdown_renderer():
+  """
+  取得目前執行緒的 Markdown 轉換器（首次呼叫時建立）
+  """
+  renderer = getattr(_renderer_local, "renderer", None)
+  if renderer is None:
+    renderer = Markdown(extensions=MARKDOWN_EXTENSIONS)
+    _renderer_local.renderer = renderer
+  return renderer
+
 def to_markdown(text):
   text = text.replace('•', '  *')
-  html_output = markdown(text, extensions=['fenced_code', 'nl2br', 'tables'])
+  # reset() 清除上一次轉換的狀態，結果與每次新建 Markdown 相同
+  html_output = get_markdown_renderer().reset().convert(text)
   return html_output
 
 def split_extended_questions(text):
@@ -96,7 +114,7 @@ def split_extended_questions(text):
         if not line:
             continue
 
-        cleaned = re.sub(r"^(\d+\.|\d+\)|[-•])\s*", "", line)
+        cleaned = LIST_PREFIX_PATTERN.sub("", line)
         if cleaned:
             questions.append(cleaned)
 
@@ -0,0 +1,78 @@
+import unittest
+from unittest.mock import patch
+from langchain.schema import Document
+from learning.services import main
+from learning.services.prompt import (
+    estimate_tokens,
+    budget_materials,
+    generate_prompt_extended,
+    MATERIAL_TOKEN_BUDGETS,
+)
+
+
+class TestTokenBudget(unittest.TestCase):
+
+    def test_estimate_tokens(self):
+        """中文字 1 字 1 token，英數約 4 字元 1 token"""
+        self.assertEqual(estimate_tokens(""), 0)
+        self.assertEqual(estimate_tokens("陣列"), 2)
+        self.assertEqual(estimate_tokens("abcd"), 1)
+        self.assertEqual(estimate_tokens("陣列 array"), 2 + 2)
+
+    def test_under_budget_keeps_all(self):
+        """教材未超過預算時全部保留"""
+        chunks = ["陣列", "堆疊"]
+        selected, usage = budget_materials(chunks, [0.0, 1.0], "extended_answer")
+        self.assertEqual(selected, chunks)
+        self.assertEqual(usage["saved_tokens"], 0)
+
+    def test_over_budget_keeps_relevant_in_order(self):
+        """超過預算時保留分數最高的段落，並維持原順序"""
+        budget = MATERIAL_TOKEN_BUDGETS["extended_answer"]
+        size = budget // 2
+        chunks = ["甲" * size, "乙" * size, "丙" * size]
+        selected, usage = budget_materials(chunks, [0.1, 0.9, 0.5], "extended_answer")
+        self.assertEqual(selected, [chunks[1], chunks[2]])
+        self.assertEqual(usage["original_tokens"], size * 3)
+        self.assertEqual(usage["saved_tokens"], size)
+        self.assertLessEqual(usage["used_tokens"], budget)
+
+    def test_single_oversized_chunk_is_truncated(self):
+        """單一段落超過預算時截斷"""
+        budget = MATERIAL_TOKEN_BUDGETS["qa"]
+        selected, usage = budget_materials(["字" * (budget * 2)], [1.0], "qa")
+        self.assertEqual(len(selected), 1)
+        self.assertEqual(usage["used_tokens"], budget)
+
+    def test_prompt_lists_chunks(self):
+        """教材以段落為單位編號，而不是逐字元"""
+        prompt = generate_prompt_extended("high", "回答", ["第一段", "第二段"], "題目")
+        self.assertIn("1. 第一段\n2. 第二段", prompt)
+
+
+class TestModeBudgets(unittest.TestCase):
+
+    @patch("learning.services.main.get_chapter_sections")
+    def test_tutoring_keeps_leading_unit_sections(self, mock_sections):
+        """教學只取該單元的段落，超過 tutoring 預算時保留前面的段落"""
+        size = MATERIAL_TOKEN_BUDGETS["tutoring"] // 2
+        mock_sections.return_value = [
+            ("1-1", 0, "甲" * size), ("1-1", 1, "乙" * size), ("1-1", 2, "丙" * size), ("1-2", 3, "丁"),
+        ]
+        docs, usage = main.get_budgeted_unit(1, 1)
+        self.assertEqual(docs, ["甲" * size, "乙" * size])
+        self.assertEqual((usage["mode"], usage["saved_tokens"]), ("tutoring", size))
+
+    def test_qa_keeps_highest_scored_docs(self):
+        """問答依檢索分數挑選段落，檢索不到時教材為空"""
+        size = MATERIAL_TOKEN_BUDGETS["qa"] // 2
+        docs = [Document(page_content=text * size, metadata={"score": score})
+                for text, score in (("甲", 0.9), ("乙", 0.2), ("丙", 0.5))]
+        materials, usage = main.get_budgeted_docs(docs)
+        self.assertEqual(materials, ["甲" * size, "丙" * size])
+        self.assertEqual(usage["mode"], "qa")
+        self.assertEqual(main.get_budgeted_docs(None)[0], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
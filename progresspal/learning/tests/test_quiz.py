@@ -0,0 +1,516 @@
+import importlib
+import random
+from io import StringIO
+from unittest.mock import patch
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from learning.models import Chapter, QuizQuestion
+from learning.services import main
+from accounts.models import QuizResult, QuizResultQuestion
+from learning.services.quiz import (
+    get_question_id_pool, invalidate_chapter_cache, record_attempts, get_answer_key,
+    get_question_stats, get_chapter_question_stats, recount_question_stats, cache,
+)
+from learning.services.adaptive import adjust_quota, select_question_ids
+from learning.services.utils import to_markdown
+from learning.checks import check_shared_cache
+
+User = get_user_model()
+
+# 計算查詢次數的測試使用行程內 cache，cache 讀寫不算在資料庫查詢中
+LOCMEM_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "shared": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "shared"},
+}
+
+
+class QuizQuestionHtmlTest(TestCase):
+    """測試題目 HTML 預先轉換"""
+
+    def setUp(self):
+        self.chapter = Chapter.objects.create(chapter_number=1, title="陣列(Array)")
+
+    def create_question(self, **kwargs):
+        data = dict(
+            chapter=self.chapter,
+            difficulty="easy",
+            question="**陣列**的索引從幾開始？",
+            option_a="0",
+            option_b="1",
+            option_c="`-1`",
+            option_d="不一定",
+            answer="A",
+            explanation="索引從 0 開始",
+        )
+        data.update(kwargs)
+        return QuizQuestion.objects.create(**data)
+
+    def test_render_html(self):
+        q = self.create_question()
+        q.render_html()
+        self.assertEqual(q.question_html, to_markdown(q.question))
+        self.assertEqual(q.option_c_html, to_markdown("`-1`"))
+        self.assertEqual(q.get_options_html()[2], q.option_c_html)
+
+    def test_get_html_falls_back_when_empty(self):
+        q = self.create_question()
+        self.assertEqual(q.question_html, "")
+        self.assertEqual(q.get_html('question'), to_markdown(q.question))
+
+    def test_get_html_uses_stored(self):
+        q = self.create_question(question_html="<p>stored</p>")
+        self.assertEqual(q.get_html('question'), "<p>stored</p>")
+
+    def test_backfill_command(self):
+        self.create_question()
+        self.create_question(question="第二題", question_html="<p>舊</p>")
+        out = StringIO()
+        call_command("render_quiz_html", stdout=out)
+        self.assertIn("1", out.getvalue())
+        self.assertFalse(QuizQuestion.objects.filter(question_html="").exists())
+        self.assertTrue(QuizQuestion.objects.filter(question_html="<p>舊</p>").exists())
+
+        call_command("render_quiz_html", "--all", stdout=out)
+        self.assertFalse(QuizQuestion.objects.filter(question_html="<p>舊</p>").exists())
+
+
+class QuizQuestionDuplicateTest(TestCase):
+    """內容雜湊重複的處理"""
+
+    def setUp(self):
+        self.chapter = Chapter.objects.create(chapter_number=1, title="陣列(Array)")
+
+    def make(self, question, **kwargs):
+        return QuizQuestion(chapter=self.chapter, difficulty="easy", question=question,
+                            option_a="a", option_b="b", option_c="c", option_d="d",
+                            answer="A", explanation="", **kwargs)
+
+    def test_duplicate_fails_validation(self):
+        self.make("題目一").save()
+        other = self.make("題目二")
+        other.save()
+        other.question = " 題目一 "
+        with self.assertRaisesMessage(ValidationError, QuizQuestion.DUPLICATE_MESSAGE):
+            other.full_clean()
+        # 不含題目的 update_fields 不重新計算雜湊
+        other.refresh_from_db()
+        other.answer = "B"
+        other.save(update_fields=["answer"])
+
+    def test_admin_shows_duplicate_as_form_error(self):
+        self.make("題目一").save()
+        other = self.make("題目二")
+        other.save()
+        admin = User.objects.create_superuser(username="quiz_admin", email="qa@example.com", password="pw123456")
+        self.client.force_login(admin)
+        data = {"chapter": self.chapter.id, "difficulty": "easy", "question": "題目一", "option_a": "a",
+                "option_b": "b", "option_c": "c", "option_d": "d", "answer": "A", "explanation": ""}
+        response = self.client.post(reverse("admin:learning_quizquestion_change", args=[other.id]), data)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, QuizQuestion.DUPLICATE_MESSAGE)
+        other.refresh_from_db()
+        self.assertEqual(other.question, "題目二")
+
+    def test_migration_merges_legacy_duplicates(self):
+        from django.apps import apps
+        migration = importlib.import_module("learning.migrations.0005_quizquestion_content_hash")
+
+        original = self.make("題目一")
+        # 0005 之前沒有雜湊的題目，其中一題與 original 重複
+        QuizQuestion.objects.bulk_create([original, self.make(" 題目一 "), self.make("題目三")])
+        original = QuizQuestion.objects.get(question="題目一")
+        legacy = QuizQuestion.objects.get(question=" 題目一 ")
+        user = User.objects.create_user(username="legacy", email="legacy@example.com", password="pw123456")
+        result = QuizResult.objects.create(user=user, chapter_code="1", score=1)
+        answer = QuizResultQuestion.objects.create(quiz_result=result, question=legacy,
+                                                   selected_answer="A", is_correct=True)
+
+        migration.fill_content_hash(apps, None)
+
+        self.assertFalse(QuizQuestion.objects.filter(pk=legacy.pk).exists())
+        self.assertFalse(QuizQuestion.objects.filter(content_hash__isnull=True).exists())
+        answer.refresh_from_db()
+        self.assertEqual(answer.question_id, original.pk)
+
+
+class ExamQuestionSamplingTest(TestCase):
+    """測試出題抽樣"""
+
+    def setUp(self):
+        cache.clear()
+        self.chapter = Chapter.objects.create(chapter_number=1, title="陣列(Array)")
+        other = Chapter.objects.create(chapter_number=2, title="鏈結串列")
+        for chapter in (self.chapter, other):
+            for difficulty, count in (("easy", 6), ("medium", 5), ("hard", 2)):
+                for i in range(count):
+                    QuizQuestion.objects.create(
+                        chapter=chapter, difficulty=difficulty, question=f"{difficulty}-{i}",
+                        option_a="a", option_b="b", option_c="c", option_d="d",
+                        answer="A", explanation="",
+                    )
+
+    @override_settings(QUIZ_ID_POOL_CACHE_TIMEOUT=0)
+    def test_quota_and_query_count(self):
+        """各難度依配額抽題（不足時縮減），只需 id 查詢 + in_bulk 兩次查詢"""
+        with self.assertNumQueries(2):
+            questions = main.get_exam_questions(self.chapter)
+        counts = {}
+        for q in questions:
+            self.assertEqual(q.chapter_id, self.chapter.id)
+            counts[q.difficulty] = counts.get(q.difficulty, 0) + 1
+        self.assertEqual(counts, {"easy": 4, "medium": 3, "hard": 2})
+        self.assertEqual(len({q.id for q in questions}), 9)
+
+    @override_settings(QUIZ_ID_POOL_CACHE_TIMEOUT=60, CACHES=LOCMEM_CACHES)
+    def test_cached_pool(self):
+        """快取 id 池後只剩 in_bulk 一次查詢，清除快取後重新查詢"""
+        get_question_id_pool(self.chapter.id)
+        with self.assertNumQueries(1):
+            main.get_exam_questions(self.chapter)
+
+        QuizQuestion.objects.filter(chapter=self.chapter, difficulty="hard").delete()
+        invalidate_chapter_cache(self.chapter.id)
+        self.assertNotIn("hard", get_question_id_pool(self.chapter.id))
+
+    @override_settings(QUIZ_ID_POOL_CACHE_TIMEOUT=60)
+    def test_stale_ids_are_skipped(self):
+        """快取中已刪除的題目不會出現在結果中"""
+        get_question_id_pool(self.chapter.id)
+        QuizQuestion.objects.filter(chapter=self.chapter, difficulty="hard").delete()
+        questions = main.get_exam_questions(self.chapter)
+        self.assertEqual(len(questions), 7)
+
+
+class SharedCacheCheckTest(TestCase):
+    """快取必須跨行程共用（import_quizzes 在另一個行程清除快取）"""
+
+    def test_process_local_cache_is_rejected(self):
+        with override_settings(CACHES=LOCMEM_CACHES):
+            self.assertEqual([e.id for e in check_shared_cache(None)], ["learning.E001"])
+        with override_settings(CACHES={"default": LOCMEM_CACHES["default"]}):
+            self.assertEqual([e.id for e in check_shared_cache(None)], ["learning.E001"])
+
+    def test_database_cache_warns_in_production(self):
+        with override_settings(DEBUG=True):
+            self.assertEqual(check_shared_cache(None), [])
+        self.assertEqual([e.id for e in check_shared_cache(None)], ["learning.W002"])
+        memcached = {"BACKEND": "django.core.cache.backends.memcached.PyMemcacheCache", "LOCATION": "127.0.0.1:11211"}
+        with override_settings(CACHES={**LOCMEM_CACHES, "shared": memcached}):
+            self.assertEqual(check_shared_cache(None), [])
+
+    def test_cache_table_is_created_by_migration(self):
+        self.assertIn(settings.CACHES["shared"]["LOCATION"], connection.introspection.table_names())
+
+
+class QuizCsvImportTest(TestCase):
+    """測試 CSV 批次匯入"""
+
+    HEADER = "chapter,difficulty,question,option_A,option_B,option_C,option_D,answer,explanation\n"
+
+    def setUp(self):
+        import tempfile
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.chapter = Chapter.objects.create(chapter_number=1, title="陣列(Array)")
+        Chapter.objects.create(chapter_number=2, title="鏈結串列")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write_csv(self, name, rows, encoding="utf-8-sig"):
+        import os
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, "w", encoding=encoding, newline="") as f:
+            f.write(self.HEADER)
+            for row in rows:
+                f.write(row + "\n")
+        return path
+
+    def test_import_dedups_and_reports(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from learning.services.quiz import import_quiz_files
+
+        QuizQuestion.objects.create(
+            chapter=self.chapter, difficulty="easy", question="已存在的題目",
+            option_a="a", option_b="b", option_c="c", option_d="d", answer="A", explanation="",
+        )
+        first = self.write_csv("a.csv", [
+            '1,easy,已存在的題目,a,b,c,d,A,解析',
+            '1,easy,**陣列**題目,a,b,c,d,B,解析',
+            '2,hard,串列題目,a,b,c,d,C,解析',
+            '9,hard,不存在的章節,a,b,c,d,C,解析',
+        ])
+        second = self.write_csv("b.csv", [
+            '1,medium,**陣列**題目,a,b,c,d,B,另一個檔案的重複題',
+            '1,medium,中文編碼題目,a,b,c,d,D,解析',
+        ], encoding="big5")
+
+        with CaptureQueriesContext(connection) as ctx:
+            stats = import_quiz_files([first, second], batch_size=1)
+
+        selects = [q for q in ctx.captured_queries if q['sql'].lstrip().upper().startswith('SELECT')]
+        self.assertEqual(len(selects), 2)  # 章節 + 既有雜湊
+        self.assertEqual((stats["queued"], stats["created"], stats["conflicts"]), (3, 3, 0))
+        self.assertEqual(stats["skipped"], 2)
+        self.assertEqual(stats["errors"], 1)
+        self.assertIn("rows_per_sec", stats)
+        self.assertEqual(QuizQuestion.objects.count(), 4)
+
+        q = QuizQuestion.objects.get(question="**陣列**題目")
+        self.assertEqual(q.question_html, to_markdown("**陣列**題目"))
+        self.assertEqual(q.content_hash, QuizQuestion.compute_content_hash(self.chapter.id, q.question))
+        self.assertTrue(QuizQuestion.objects.filter(question="中文編碼題目").exists())
+
+        # 重複匯入不會新增
+        stats = import_quiz_files([first, second])
+        self.assertEqual(stats["created"], 0)
+        self.assertEqual(QuizQuestion.objects.count(), 4)
+
+    def test_conflicts_are_not_counted_as_created(self):
+        """預載雜湊之後才由其他行程寫入的題目被唯一限制略過，不算在 created"""
+        from learning.services.quiz import import_quiz_files
+
+        QuizQuestion.objects.create(chapter=self.chapter, difficulty="easy", question="題目一",
+                                    option_a="a", option_b="b", option_c="c", option_d="d",
+                                    answer="A", explanation="")
+        path = self.write_csv("a.csv", ['1,easy,題目一,a,b,c,d,A,解析', '1,easy,題目二,a,b,c,d,A,解析'])
+        # 預載雜湊時還看不到這一題
+        with patch.object(QuizQuestion.objects, "exclude", return_value=QuizQuestion.objects.none()):
+            stats = import_quiz_files([path])
+        self.assertEqual((stats["queued"], stats["created"], stats["conflicts"]), (2, 1, 1))
+        self.assertEqual(QuizQuestion.objects.count(), 2)
+
+    def test_write_error_does_not_hang(self):
+        """寫入失敗時整個匯入回復，例外傳給呼叫端"""
+        from learning.services.quiz import import_quiz_files
+
+        paths = [
+            self.write_csv(f"{n}.csv", [f'1,easy,{n}-{i},a,b,c,d,A,解析' for i in range(50)])
+            for n in range(4)
+        ]
+        with patch.object(QuizQuestion.objects, "bulk_create", side_effect=RuntimeError("disk full")):
+            with self.assertRaisesMessage(RuntimeError, "disk full"):
+                import_quiz_files(paths, batch_size=1)
+        self.assertFalse(QuizQuestion.objects.exists())
+
+    def test_messages_are_grouped_per_file(self):
+        """解析訊息依檔案收集，依檔案順序輸出"""
+        from learning.services.quiz import import_quiz_files
+
+        paths = [self.write_csv("a.csv", ['1,easy,甲,a,b,c,d,A,解析']),
+                 self.write_csv("b.csv", ['9,easy,乙,a,b,c,d,A,解析'], encoding="big5")]
+        with patch("sys.stdout", new_callable=StringIO) as out:
+            stats = import_quiz_files(paths)
+        self.assertEqual(stats["files"][0]["messages"], ["使用編碼: utf-8-sig"])
+        self.assertEqual(stats["files"][1]["messages"], ["使用編碼: big5", "第 1 行跳過: 章節錯誤"])
+        lines = out.getvalue().splitlines()
+        self.assertIn("[a.csv] 使用編碼: utf-8-sig", lines)
+        self.assertIn("[b.csv] 第 1 行跳過: 章節錯誤", lines)
+
+
+class QuestionStatsTest(TestCase):
+    """題目作答統計"""
+
+    def setUp(self):
+        cache.clear()
+        self.chapter = Chapter.objects.create(chapter_number=1, title="陣列(Array)")
+        self.questions = [
+            QuizQuestion.objects.create(
+                chapter=self.chapter, difficulty="easy", question=f"q{i}",
+                option_a="a", option_b="b", option_c="c", option_d="d", answer="A", explanation="",
+            )
+            for i in range(4)
+        ]
+        self.user = User.objects.create_user(username="stats_user", email="stats@example.com", password="pw123456")
+
+    def submit(self, answers):
+        return main.process_quiz_submission(
+            self.user, "1", [{"question_id": q.id, "selected_index": a} for q, a in answers])
+
+    def test_submission_updates_counters(self):
+        q = self.questions
+        with CaptureQueriesContext(connection) as queries:
+            self.submit([(q[0], "A"), (q[1], "B"), (q[2], "A"), (q[3], "C")])
+        updates = [x for x in queries if x["sql"].startswith('UPDATE "learning_quizquestion"')]
+        self.assertEqual(len(updates), 2)  # 答對一次、答錯一次
+        self.submit([(q[0], "A"), (q[1], "A")])
+
+        stats = {row["question_id"]: row for row in get_chapter_question_stats(self.chapter.id)}
+        self.assertEqual((stats[q[0].id]["attempts"], stats[q[0].id]["correct"]), (2, 2))
+        self.assertEqual(stats[q[1].id]["correct_rate"], 0.5)
+        self.assertEqual(stats[q[3].id]["correct_rate"], 0.0)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(get_question_stats(q[1].id)["attempts"], 2)
+
+        # 重新計算與累加結果相同
+        QuizQuestion.objects.update(attempt_count=0, correct_count=0)
+        self.assertEqual(recount_question_stats(), 4)
+        self.assertEqual({row["question_id"]: row for row in get_chapter_question_stats(self.chapter.id)}, stats)
+
+    def test_repeated_question_in_one_submission(self):
+        record_attempts([(self.questions[0].id, True), (self.questions[0].id, False)])
+        self.questions[0].refresh_from_db()
+        self.assertEqual((self.questions[0].attempt_count, self.questions[0].correct_count), (2, 1))
+
+    def test_api(self):
+        self.client.force_login(self.user)
+        url = reverse("question-stats-api", args=[self.questions[0].id])
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        admin = User.objects.create_superuser(username="stats_admin", email="admin@example.com", password="pw123456")
+        self.client.force_login(admin)
+        self.assertEqual(self.client.get(url).json()["attempts"], 0)
+        self.assertEqual(self.client.get(reverse("question-stats-api", args=[999999])).status_code, 404)
+        response = self.client.get(reverse("quiz-stats-api", args=[1]))
+        self.assertEqual(len(response.json()["questions"]), 4)
+
+
+class AdaptiveSelectionTest(TestCase):
+    """適性出題"""
+
+    def setUp(self):
+        cache.clear()
+        self.chapter = Chapter.objects.create(chapter_number=1, title="陣列(Array)")
+        self.by_level = {}
+        for difficulty, count in (("easy", 6), ("medium", 5), ("hard", 2)):
+            self.by_level[difficulty] = [
+                QuizQuestion.objects.create(
+                    chapter=self.chapter, difficulty=difficulty, question=f"{difficulty}-{i}",
+                    option_a="a", option_b="b", option_c="c", option_d="d", answer="A", explanation="",
+                )
+                for i in range(count)
+            ]
+        self.user = User.objects.create_user(username="adaptive", email="adaptive@example.com", password="pw123456")
+
+    def submit(self, answers):
+        main.process_quiz_submission(
+            self.user, "1", [{"question_id": q.id, "selected_index": a} for q, a in answers])
+
+    def test_quiz_api_query_count(self):
+        """開始測驗共 4 次查詢：章節、適性選題 2 次、in_bulk（另加 session 與使用者各 1 次）"""
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("quiz-api", args=[1]))
+        self.assertEqual(response.status_code, 200)
+        tables = [q["sql"].split(" FROM ", 1)[1].split()[0].strip('"') for q in queries]
+        quiz_tables = [t for t in tables if t not in ("django_session", "accounts_customuser")]
+        self.assertEqual(quiz_tables, ["learning_chapter", "learning_quizquestion",
+                                       "accounts_quizresultquestion", "learning_quizquestion"])
+        self.assertEqual(len(tables), 6)
+
+    def test_prefers_missed_then_unseen(self):
+        easy = self.by_level["easy"]
+        self.submit([(easy[0], "A"), (easy[1], "A"), (easy[2], "B")])
+        self.submit([(easy[0], "B"), (easy[2], "A"), (easy[3], "A")])  # easy[0] 最近一次答錯，easy[2] 已訂正
+
+        with self.assertNumQueries(3):
+            questions = main.get_exam_questions(self.chapter, self.user)
+        selected = {q.id for q in questions if q.difficulty == "easy"}
+        self.assertEqual(len(selected), 4)
+        self.assertTrue({easy[0].id, easy[4].id, easy[5].id} <= selected)
+
+    def test_query_budget_independent_of_history(self):
+        questions = [q for level in self.by_level.values() for q in level]
+        for i in range(20):
+            self.submit([(q, "A" if (i + q.id) % 3 else "B") for q in questions])
+        with self.assertNumQueries(3):
+            self.assertEqual(len(main.get_exam_questions(self.chapter, self.user)), 9)
+
+    def test_quota_follows_accuracy(self):
+        quota = main.DIFFICULTY_QUOTA
+        self.assertEqual(adjust_quota(quota, 0.9), {"easy": 3, "medium": 3, "hard": 4})
+        self.assertEqual(adjust_quota(quota, 0.2), {"easy": 5, "medium": 3, "hard": 2})
+        self.assertEqual(adjust_quota(quota, 0.6), quota)
+
+        # 全部答對：困難題多一題
+        questions = [(i, "hard" if i < 6 else "easy", 0, 0) for i in range(12)]
+        history = {i: (3, 3, False) for i in range(6, 12)}
+        selected = select_question_ids(questions, history, quota, rng=random.Random(0))
+        self.assertEqual(sum(1 for i in selected if i < 6), 4)
+
+    @override_settings(QUIZ_ADAPTIVE=False)
+    def test_disabled_uses_random_sampling(self):
+        with patch("learning.services.main.get_adaptive_question_ids") as mock_adaptive:
+            self.assertEqual(len(main.get_exam_questions(self.chapter, self.user)), 9)
+        mock_adaptive.assert_not_called()
+
+
+@override_settings(QUIZ_ANSWER_KEY_CACHE_TIMEOUT=60, CACHES=LOCMEM_CACHES)
+class AnswerKeyTest(TestCase):
+    """批改使用快取的答案表"""
+
+    def setUp(self):
+        cache.clear()
+        self.chapter = Chapter.objects.create(chapter_number=1, title="陣列(Array)")
+        self.questions = [
+            QuizQuestion.objects.create(
+                chapter=self.chapter, difficulty="easy", question=f"q{i}",
+                option_a="a", option_b="b", option_c="c", option_d="d", answer="A", explanation=f"**解析{i}**",
+            )
+            for i in range(3)
+        ]
+        for q in self.questions:
+            q.render_html()
+            q.save()
+        self.user = User.objects.create_user(username="key_user", email="key@example.com", password="pw123456")
+
+    def submit(self, answers):
+        return main.process_quiz_submission(
+            self.user, 1, [{"question_id": q_id, "selected_index": a} for q_id, a in answers])
+
+    def test_grading_does_not_read_questions(self):
+        get_answer_key(1)
+        q = self.questions
+        with CaptureQueriesContext(connection) as queries:
+            score, results = self.submit([(q[0].id, "A"), (q[1].id, "B")])
+        self.assertFalse([x for x in queries if x["sql"].startswith("SELECT")])
+        self.assertEqual(score, 1)
+        self.assertEqual([r["question_id"] for r in results], [q[0].id, q[1].id])
+        self.assertEqual(results[1]["explanation"], to_markdown("**解析1**"))
+        self.assertEqual(results[1]["options"], q[1].get_options_html())
+        self.assertEqual(QuizResultQuestion.objects.filter(quiz_result__user=self.user).count(), 2)
+
+    def test_invalidated_on_change(self):
+        self.assertEqual(get_answer_key(1)[self.questions[0].id]["answer"], "A")
+        QuizQuestion.objects.filter(pk=self.questions[0].pk).update(answer="C")
+        self.assertEqual(get_answer_key(1)[self.questions[0].id]["answer"], "A")  # 仍為快取
+
+        invalidate_chapter_cache(self.chapter.id)
+        self.assertEqual(get_answer_key(1)[self.questions[0].id]["answer"], "C")
+        score, _ = self.submit([(self.questions[0].id, "C")])
+        self.assertEqual(score, 1)
+
+    def test_missing_question_rebuilds_key_once(self):
+        get_answer_key(1)
+        # 未經 save() 新增的題目不會清除快取
+        QuizQuestion.objects.bulk_create([QuizQuestion(
+            chapter=self.chapter, difficulty="easy", question="new", content_hash="new",
+            option_a="a", option_b="b", option_c="c", option_d="d", answer="B", explanation="")])
+        new = QuizQuestion.objects.get(question="new")
+        with CaptureQueriesContext(connection) as queries:
+            score, results = self.submit([(new.id, "B"), (999999, "A")])
+        self.assertEqual(len([x for x in queries if x["sql"].startswith("SELECT")]), 2)  # exists + 重建一次
+        self.assertEqual(score, 1)
+        self.assertEqual([r["question_id"] for r in results], [new.id])
+        self.assertIn(new.id, get_answer_key(1))  # 重建結果寫回快取
+
+    def test_unknown_question_does_not_rebuild_key(self):
+        """偽造或其他章節的 id 不會觸發重建"""
+        other = Chapter.objects.create(chapter_number=2, title="鏈結串列")
+        foreign = QuizQuestion.objects.create(
+            chapter=other, difficulty="easy", question="other", option_a="a", option_b="b", option_c="c",
+            option_d="d", answer="A", explanation="")
+        get_answer_key(1)
+        with patch("learning.services.main.get_answer_key", wraps=get_answer_key) as mock_key, \
+                CaptureQueriesContext(connection) as queries:
+            score, results = self.submit([(foreign.id, "A"), (999999, "A"), ("forged", "A")])
+        self.assertEqual((score, results), (0, []))
+        self.assertEqual(len([x for x in queries if x["sql"].startswith("SELECT")]), 1)  # 只有 exists
+        self.assertEqual(mock_key.call_count, 1)
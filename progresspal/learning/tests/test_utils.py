@@ -0,0 +1,50 @@
+import threading
+import unittest
+from markdown import markdown
+from learning.services import utils
+
+
+class TestMarkdownRenderer(unittest.TestCase):
+
+    def test_matches_fresh_markdown(self):
+        """共用轉換器的輸出需與每次新建 Markdown 相同"""
+        samples = [
+            "```python\nprint(1)\n```",
+            "| a | b |\n| --- | --- |\n| 1 | 2 |",
+            "第一行\n第二行",
+            "• 項目一\n• 項目二",
+        ]
+        for text in samples:
+            with self.subTest(text=text):
+                expected = markdown(text.replace('•', '  *'), extensions=['fenced_code', 'nl2br', 'tables'])
+                self.assertEqual(utils.to_markdown(text), expected)
+
+    def test_no_state_between_calls(self):
+        """前一次轉換的內容不會殘留到下一次"""
+        utils.to_markdown("```python\nsecret = 1\n```")
+        self.assertNotIn("secret", utils.to_markdown("普通文字"))
+
+    def test_renderer_per_thread(self):
+        """每個執行緒各自持有轉換器"""
+        main_renderer = utils.get_markdown_renderer()
+        renderers = []
+        t = threading.Thread(target=lambda: renderers.append(utils.get_markdown_renderer()))
+        t.start()
+        t.join()
+        self.assertIs(utils.get_markdown_renderer(), main_renderer)
+        self.assertIsNot(renderers[0], main_renderer)
+
+
+class TestCleanText(unittest.TestCase):
+
+    def test_clean_text_qa(self):
+        result = utils.clean_text_qa("### 回答問題\n陣列\n### 引導提問\n1. 為什麼？")
+        self.assertEqual(result["answer"], "陣列")
+        self.assertEqual(result["extended_question"], "1. 為什麼？")
+
+    def test_split_extended_questions(self):
+        self.assertEqual(utils.split_extended_questions("1. 甲\n2) 乙\n- 丙"), ["甲", "乙", "丙"])
+
+
+if __name__ == "__main__":
+    unittest.main()
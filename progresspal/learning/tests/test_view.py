@@ -32,7 +32,7 @@ class LearningViewsIntegrationTest(TestCase):
             unit_number="1", title="陣列概論", chapter=self.chapter
         )
 
-    @patch("learning.views.compute_engagement")
+    @patch("learning.views.get_engagement")
     @patch("learning.services.main.client.models.generate_content")
     def test_generate_materials_view(self, mock_gemini, mock_engagement):
         """測試教材生成 view 實際執行是否正常"""
@@ -59,7 +59,7 @@ class LearningViewsIntegrationTest(TestCase):
         self.assertIn("這是教學內容", response.content.decode("utf-8")) or self.assertIn("陣列", response.content.decode("utf-8"))
         print("\n✅ generate_materials_view 測試成功")
 
-    @patch("learning.views.compute_engagement")
+    @patch("learning.views.get_engagement")
     @patch("learning.services.main.client.models.generate_content")
     def test_answer_question_view(self, mock_gemini, mock_engagement):
         """測試教材問答 view (JSON 回傳) 實際執行是否正常"""
@@ -1,14 +1,15 @@
 # learning/views.py
-from django.shortcuts import render
+from django.shortcuts import render, get_object_or_404
 from django.views.decorators.csrf import csrf_exempt
 from django.utils import timezone
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
 from django.db import transaction
-from emotion.services.utils import compute_engagement
-from .services import main,utils
+from emotion.services.engagement import get_engagement
+from .services import main,utils,quiz
 from .forms import StudyForm
 from accounts.models import QuestionLog, LearningRecord
+from accounts.services import rollups
 from .models import Chapter, Unit, QuizQuestion
 import json
 
@@ -45,9 +46,8 @@ def generate_materials_view(request, chapter_code, unit_code):
     user = request.user
     role = user.role
 
-    # Engagement
-    emotions = user.recent_emotion_history
-    engagement = compute_engagement(emotions)
+    # Engagement（cache 中的參與度狀態，不查資料庫）
+    engagement = get_engagement(user)
 
     # 呼叫教材生成
     result = main.display_materials(chapter_code, unit_code, engagement, role)
@@ -108,9 +108,8 @@ def answer_question_view(request, chapter_code, unit_code):
     user = request.user
     role = user.role
 
-    # Engagement
-    emotions = user.recent_emotion_history
-    engagement = compute_engagement(emotions)
+    # Engagement（cache 中的參與度狀態，不查資料庫）
+    engagement = get_engagement(user)
 
     # 讀取 session 延伸提問
     extended_questions = request.session.get("extended_questions", [])
@@ -148,7 +147,7 @@ def answer_question_view(request, chapter_code, unit_code):
         extended_questions = new_list
     
     # 儲存問答記錄
-    QuestionLog.objects.create(
+    log = QuestionLog.objects.create(
         user=user,
         chapter_code=chapter_code,
         unit_code=unit_code,
@@ -157,6 +156,7 @@ def answer_question_view(request, chapter_code, unit_code):
         engagement=engagement,
         created_at=timezone.now(),
     )
+    rollups.record_question(log)
     # 回傳 JSON
     return JsonResponse({
         "answer": answer,
@@ -172,11 +172,14 @@ def end_study(request):
 
         try:
             record = LearningRecord.objects.get(id=record_id)
-            record.end_time = timezone.now()
-            record.save()
-            return JsonResponse({"status": "ok"})
         except LearningRecord.DoesNotExist:
             return JsonResponse({"status": "error", "msg": "not found"}, status=400)
+        # 只有尚未結束的紀錄才寫入結束時間並累加統計，重複送出（重新整理、重送）不會重複計算
+        end_time = timezone.now()
+        if LearningRecord.objects.filter(id=record.id, end_time__isnull=True).update(end_time=end_time):
+            record.end_time = end_time
+            rollups.record_study(record)
+        return JsonResponse({"status": "ok"})
 
     return JsonResponse({"status": "error", "msg": "invalid request"}, status=400)
 
@@ -191,12 +194,12 @@ def chapter_quiz_view(request, chapter_code):
 # json 回傳測驗問題與選項給前端
 def chapter_quiz_api(request, chapter_code):
     chapter = Chapter.objects.get(chapter_number=chapter_code)
-    quiz_questions = main.get_exam_questions(chapter)
+    quiz_questions = main.get_exam_questions(chapter, request.user)
     serialized = [
         {
             "question_id": q.id,
-            "question": utils.to_markdown(q.question),
-            "options": [utils.to_markdown(q.option_a),utils.to_markdown(q.option_b), utils.to_markdown(q.option_c), utils.to_markdown(q.option_d)],
+            "question": q.get_html('question'),
+            "options": q.get_options_html(),
         }
         for q in quiz_questions
     ]
@@ -218,4 +221,23 @@ def check_answers(request, chapter_code):
         })
     except Exception as e:
         # 錯誤處理
-        return JsonResponse({'error': str(e)}, status=500)
\ No newline at end of file
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+# 題目作答統計（JSON，僅 superuser）
+@login_required(login_url='login')
+def question_stats_api(request, question_id):
+    if not request.user.is_superuser:
+        return JsonResponse({"error": "Permission denied"}, status=403)
+    try:
+        return JsonResponse(quiz.get_question_stats(question_id))
+    except QuizQuestion.DoesNotExist:
+        return JsonResponse({"error": "Question not found"}, status=404)
+
+
+@login_required(login_url='login')
+def chapter_question_stats_api(request, chapter_code):
+    if not request.user.is_superuser:
+        return JsonResponse({"error": "Permission denied"}, status=403)
+    chapter = get_object_or_404(Chapter, chapter_number=chapter_code)
+    return JsonResponse({"chapter": chapter_code, "questions": quiz.get_chapter_question_stats(chapter.id)})
@@ -43,6 +43,15 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 #教材路徑
 TEACHING_MATERIAL_DIR = os.path.join(BASE_DIR, 'teaching_material')
 
+# 測驗題目 id 池快取秒數（0 表示不快取，每次出題都查詢資料庫）
+QUIZ_ID_POOL_CACHE_TIMEOUT = 300
+
+# 測驗答案表（答案、選項與解析 HTML）快取秒數，題目儲存或匯入時自動清除（0 表示不快取）
+QUIZ_ANSWER_KEY_CACHE_TIMEOUT = 60 * 60
+
+# 依學生作答紀錄與題目答對率適性出題（False 時為隨機抽題）
+QUIZ_ADAPTIVE = os.getenv('QUIZ_ADAPTIVE', 'true').lower() != 'false'
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
@@ -114,6 +123,31 @@ DATABASES = {
 }
 
 
+# Cache
+# default：行程內的 LocMemCache，只放可遺失、不需跨行程的逐幀狀態（人臉追蹤框、畫面計數、取樣間隔與負載係數），
+#          偵測請求讀寫這些狀態不會碰到資料庫。
+# shared：所有 worker 與 manage.py 指令必須共用的資料（測驗 id 池與答案表、參與度狀態），不可為行程內 cache（見 learning.checks）。
+#         設定 MEMCACHED_LOCATION（host:port）時使用 Memcached（正式環境請設定，參與度狀態每幀都會讀寫）；
+#         未設定時使用資料庫 cache，資料表由 learning 的 migration 建立。
+
+SHARED_CACHE = {
+    'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+    'LOCATION': 'progresspal_cache',
+}
+if os.getenv('MEMCACHED_LOCATION'):
+    SHARED_CACHE = {
+        'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+        'LOCATION': os.getenv('MEMCACHED_LOCATION'),
+    }
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': SHARED_CACHE,
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -161,4 +195,57 @@ LOGOUT_REDIRECT_URL = '/'
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
-DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
\ No newline at end of file
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# 情緒辨識推論服務
+# 設定 socket 路徑後，各 worker 會把影像送到 `python manage.py run_emotion_server` 批次推論；
+# 留空則每個 worker 自行載入模型
+EMOTION_INFERENCE_SOCKET = os.getenv('EMOTION_INFERENCE_SOCKET', '')
+EMOTION_BATCH_WINDOW_MS = 20   # 合併批次的等待時間
+EMOTION_MAX_BATCH_SIZE = 32    # 單次推論最多張數
+EMOTION_INFERENCE_MODE = 'predict_on_batch'  # predict / predict_on_batch / direct
+EMOTION_MODEL_VARIANT = 'float32'  # float32 / int8 / half_res，見 emotion.emotion_model.MODEL_VARIANTS
+# 啟動預載：off / background（背景執行緒，不延遲啟動）/ blocking（載入完成才接受請求）
+# 就緒狀態見 /emotion/ready/
+EMOTION_PRELOAD = os.getenv('EMOTION_PRELOAD', 'background')
+# 人臉偵測：haar / dnn（OpenCV YuNet，模型檔放在 emotion/face_detection_yunet_2023mar.onnx，缺檔時退回 haar）
+EMOTION_FACE_DETECTOR = 'haar'
+EMOTION_DETECT_MAX_WIDTH = 320    # 偵測前先把影像縮到此寬度，0 表示不縮小
+EMOTION_FACE_TRACK_TIMEOUT = 30   # 記住使用者上一張臉位置的秒數
+# 影像解碼：reduced（依 JPEG 標頭尺寸以 IMREAD_REDUCED_GRAYSCALE_2/4 直接解碼為縮小灰階）/ color（完整 BGR 解碼後轉灰階）
+EMOTION_DECODE_MODE = 'reduced'
+EMOTION_DECODE_MIN_WIDTH = 640    # 縮小解碼後影像寬度的下限
+EMOTION_MAX_UPLOAD_BYTES = 2 * 1024 * 1024  # /emotion/detect/（含 batch）請求 body 上限，超過回傳 413
+EMOTION_MAX_BATCH_FRAMES = 12  # /emotion/detect/batch/ 單次最多張數
+# camera.js 由 /emotion/config/ 取得，可在不改前端的情況下調整
+EMOTION_CLIENT_CONFIG = {
+    'interval_ms': 5000,             # 第一次的取樣間隔，之後依回應的 next_interval_ms
+    'confidence_threshold': 0.5,     # 低於此信心分數不更新畫面
+    'precheck': {
+        'enabled': True,             # 上傳前先在瀏覽器檢查
+        'sample_width': 64,          # 縮圖寬度（亮度與畫面差異都在縮圖上計算）
+        'min_brightness': 30,        # 平均亮度低於此值（過暗、鏡頭遮住）不上傳
+        'max_brightness': 235,       # 高於此值（過曝）不上傳
+        'min_frame_diff': 4,         # 與上次上傳的平均灰階差異低於此值視為畫面無變化
+        'max_skipped': 5,            # 連續略過達此張數時仍強制上傳一次
+        'face_detector': True,       # 瀏覽器支援 FaceDetector (Shape Detection API) 時，無臉不上傳
+    },
+}
+# 取樣間隔建議值（回應中的 next_interval_ms），見 emotion.services.sampling
+EMOTION_SAMPLING = {
+    'base_ms': 5000,
+    'min_ms': 2000,               # 情緒改變時
+    'max_ms': 30000,              # 情緒穩定時最多拉長到
+    'backoff': 1.5,               # 情緒相同且信心 >= stable_confidence 時每次乘上的倍數
+    'stable_confidence': 0.7,
+    'target_latency_ms': 300,     # 處理延遲超過此值時，所有人的間隔依比例放大
+    'max_load_factor': 4.0,
+}
+# EmotionRecord 批次寫入：累積 flush_size 筆或每 flush_interval 秒以 bulk_create 寫入，行程結束時寫入剩餘資料
+EMOTION_RECORD_BUFFER = {
+    'enabled': True,      # False 時每次偵測直接 INSERT
+    'flush_size': 50,
+    'flush_interval': 10,
+    'max_pending': 5000,  # 資料庫無法寫入時緩衝區的上限，超過時丟棄最舊的紀錄
+}
+EMOTION_ENGAGEMENT_STATE_TIMEOUT = 30 * 60  # 共用 cache 中參與度狀態的保存秒數，過期後由資料庫重建
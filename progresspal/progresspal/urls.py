@@ -32,6 +32,8 @@ urlpatterns = [
     path('user/logout/', accounts.logout_view, name='logout'), # 登出動作
     path('user/profile/', accounts.profile, name='profile'),  # 會員中心（需登入）
     path('user/delete/', accounts.delete_account, name='delete_account'),  # 刪除帳號（需登入）
+    path('user/study/api/logs/<str:kind>/', accounts.portfolio_logs, name='portfolio-logs'),  # 學習歷程紀錄（分頁 JSON）
+    path('user/analytics/', accounts.cohort_analytics, name='cohort-analytics'),  # 全班學習分析(管理)
     path('user/study/', accounts.learning_portfolio, name='learning-portfolio-self'),  # 學習歷程頁面(本人)
     path('user/study/<str:username>', accounts.learning_portfolio, name='learning-portfolio'),  # 學習歷程頁面(管理)
 
@@ -44,6 +46,8 @@ urlpatterns = [
     path('lesson/<int:chapter_code>/quiz/', learning.chapter_quiz_view, name='quiz'),
     path('lesson/<int:chapter_code>/quiz/api/', learning.chapter_quiz_api, name='quiz-api'), 
     path('lesson/<int:chapter_code>/quiz/check/api/', learning.check_answers, name='quiz-check-api'),
+    path('lesson/<int:chapter_code>/quiz/stats/api/', learning.chapter_question_stats_api, name='quiz-stats-api'),  # 章節題目作答統計
+    path('lesson/quiz/question/<int:question_id>/stats/api/', learning.question_stats_api, name='question-stats-api'),  # 單題作答統計
 
     # 結束學習並更新學習記錄
     # path("lesson/end/", learning.end_study, name="end-study"),
@@ -53,5 +57,9 @@ urlpatterns = [
 
     # 情緒相關
     path("emotion/detect/", emotion.detect_emotion, name="emotion_detect"),
+    path("emotion/detect/batch/", emotion.detect_emotion_batch, name="emotion_detect_batch"),
+    path("emotion/config/", emotion.client_config, name="emotion_config"),
+    path("emotion/metrics/", emotion.inference_metrics, name="emotion_metrics"),
+    path("emotion/ready/", emotion.readiness, name="emotion_ready"),
 
 ]
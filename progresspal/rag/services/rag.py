@@ -42,6 +42,15 @@ def get_vectorstore():
     )
     return _vectorstore
 
+def warm_up_embeddings():
+    """
+    啟動時預先載入向量資料庫與 embedding 模型，並對一段文字做一次向量化。
+    找不到資料庫時拋出 RuntimeError。
+    """
+    if get_vectorstore() is None:
+        raise RuntimeError(f"找不到向量資料庫: {db_path}")
+    _embeddings.embed_query("warm up")
+
 """**Chroma + BM25 混合搜尋**"""
 def get_bm25():
     """
@@ -72,6 +81,26 @@ def get_bm25():
     print("BM25 索引建立完成。")
     return _bm25
 
+STOP_WORDS = {'的', '是', '什麼', '甚麼', '嗎', '與', '和', '?', '定義', ' ', '。', '，'}
+
+def tokenize_query(query):
+    """
+    Query 分詞並去除停用詞；若全部被濾掉則保留原分詞結果。
+    """
+    query_tokens = list(jieba.cut(query, cut_all=False))
+    filtered_tokens = [t for t in query_tokens if t not in STOP_WORDS]
+    return filtered_tokens if filtered_tokens else query_tokens
+
+def get_bm25_scores(query):
+    """
+    回傳 query 對每一段教材的 BM25 分數，索引與 all_docs 對齊。
+    BM25 無法建立時回傳全 0。
+    """
+    bm25_model = get_bm25()
+    if not bm25_model:
+        return np.zeros(len(all_docs))
+    return bm25_model.get_scores(tokenize_query(query))
+
 def retrieve_docs(query, top_k=3, weight_bm25=0.7, weight_vector=0.3):
     vectorstore = get_vectorstore()
     bm25_model = get_bm25()
@@ -88,11 +117,7 @@ def retrieve_docs(query, top_k=3, weight_bm25=0.7, weight_vector=0.3):
     
     # 關鍵字搜尋 (BM25)
     # 前處理 Query
-    query_tokens = list(jieba.cut(query, cut_all=False))
-    stop_words = {'的', '是', '什麼', '甚麼', '嗎', '與', '和', '?', '定義', ' ', '。', '，'}
-    filtered_tokens = [t for t in query_tokens if t not in stop_words]
-    if not filtered_tokens: 
-        filtered_tokens = query_tokens
+    filtered_tokens = tokenize_query(query)
     
     # 計算 BM25 分數
     if bm25_model:
@@ -5,12 +5,42 @@ document.addEventListener("DOMContentLoaded", () => {
     const resultElement = document.getElementById('emotion-display'); // 情緒
     const context = canvasElement.getContext('2d');
 
-    // 設定參數
-    const INTERVAL_MS = 5000; // 5秒
-    const CONFIDENCE_THRESHOLD = 0.5; // 信心門檻
+    // 設定參數（預設值，啟動時由 /emotion/config/ 覆寫）
+    let config = {
+        interval_ms: 5000, // 5秒
+        confidence_threshold: 0.5, // 信心門檻
+        precheck: { enabled: false }
+    };
+
+    // 上傳前預檢用的縮圖與狀態
+    const sampleCanvas = document.createElement('canvas');
+    const sampleContext = sampleCanvas.getContext('2d', { willReadFrequently: true });
+    let lastSentGray = null; // 上次上傳影像的灰階縮圖
+    let skippedCount = 0;    // 自上次上傳後略過的張數（隨下次上傳回報給伺服器）
+    let faceDetector = null;
+    let nextIntervalMs = config.interval_ms; // 伺服器依情緒穩定度與負載建議的下一次間隔
+
+    async function loadConfig() {
+        try {
+            const response = await fetch('/emotion/config/');
+            if (response.ok) {
+                config = { ...config, ...(await response.json()) };
+            }
+        } catch (err) {
+            console.warn("無法取得情緒辨識設定，使用預設值:", err);
+        }
+        if (config.precheck.enabled && config.precheck.face_detector && 'FaceDetector' in window) {
+            try {
+                faceDetector = new window.FaceDetector({ fastMode: true, maxDetectedFaces: 1 });
+            } catch (err) {
+                faceDetector = null;
+            }
+        }
+    }
 
     // 啟動 Webcam
     async function initCamera() {
+        await loadConfig();
         try {
             const stream = await navigator.mediaDevices.getUserMedia({ video: true }); // 請求使用者的攝影機權限
             videoElement.srcObject = stream;
@@ -18,7 +48,8 @@ document.addEventListener("DOMContentLoaded", () => {
             // 確保影片載入後開始定時截圖
             videoElement.onloadedmetadata = () => {
                 console.log("Webcam started.");
-                setInterval(captureAndSend, INTERVAL_MS); // 每5秒呼叫一次
+                nextIntervalMs = config.interval_ms;
+                setTimeout(captureAndSend, nextIntervalMs);
             };
         } catch (err) {
             console.error("無法存取 Webcam:", err);
@@ -26,11 +57,74 @@ document.addEventListener("DOMContentLoaded", () => {
         }
     }
 
-    // 截圖並傳給後端
-    function captureAndSend() {
+    // 將畫面縮成小張灰階，回傳 { gray, brightness }
+    function sampleFrame() {
+        const width = config.precheck.sample_width;
+        const height = Math.round(width * videoElement.videoHeight / videoElement.videoWidth);
+        sampleCanvas.width = width;
+        sampleCanvas.height = height;
+        sampleContext.drawImage(videoElement, 0, 0, width, height);
+
+        const pixels = sampleContext.getImageData(0, 0, width, height).data;
+        const gray = new Uint8Array(width * height);
+        let total = 0;
+        for (let i = 0, j = 0; j < gray.length; i += 4, j++) {
+            gray[j] = (pixels[i] * 77 + pixels[i + 1] * 150 + pixels[i + 2] * 29) >> 8;
+            total += gray[j];
+        }
+        return { gray, brightness: total / gray.length };
+    }
+
+    function meanDiff(a, b) {
+        if (!a || !b || a.length !== b.length) return Infinity;
+        let total = 0;
+        for (let i = 0; i < a.length; i++) total += Math.abs(a[i] - b[i]);
+        return total / a.length;
+    }
+
+    // 上傳前預檢：過暗/過曝、畫面無變化、（支援時）沒有臉 -> 不上傳
+    async function shouldUpload() {
+        const precheck = config.precheck;
+        if (!precheck.enabled) return true;
+
+        const { gray, brightness } = sampleFrame();
+        if (brightness < precheck.min_brightness || brightness > precheck.max_brightness) {
+            return false;
+        }
+        // 畫面沒變化時沿用上一次的結果；連續略過太多張仍強制送一次
+        if (meanDiff(gray, lastSentGray) < precheck.min_frame_diff && skippedCount < precheck.max_skipped) {
+            return false;
+        }
+        if (faceDetector) {
+            try {
+                const faces = await faceDetector.detect(videoElement);
+                if (faces.length === 0) return false;
+            } catch (err) {
+                faceDetector = null; // 瀏覽器實作不完整時停用
+            }
+        }
+        lastSentGray = gray;
+        return true;
+    }
+
+    // 截圖並傳給後端，完成後依建議間隔排定下一次
+    async function captureAndSend() {
+        try {
+            await captureOnce();
+        } finally {
+            setTimeout(captureAndSend, nextIntervalMs);
+        }
+    }
+
+    async function captureOnce() {
         // 確保有畫面
         if (videoElement.videoWidth === 0 || videoElement.videoHeight === 0) return;
 
+        if (!(await shouldUpload())) {
+            skippedCount++;
+            return;
+        }
+
         // 設定 Canvas 大小與 Video 一致
         canvasElement.width = videoElement.videoWidth;
         canvasElement.height = videoElement.videoHeight;
@@ -39,25 +133,25 @@ document.addEventListener("DOMContentLoaded", () => {
         context.drawImage(videoElement, 0, 0, canvasElement.width, canvasElement.height);
 
         // 轉為 Blob (JPG)
-        canvasElement.toBlob((blob) => {
-            if (blob) {
-                uploadImage(blob); 
-            }
-        }, 'image/jpeg', 0.7); // 圖片品質
+        const blob = await new Promise((resolve) => canvasElement.toBlob(resolve, 'image/jpeg', 0.7)); // 圖片品質
+        if (blob) {
+            await uploadImage(blob);
+        }
     }
 
     // 上傳圖片至 API
     async function uploadImage(imageBlob) {
-        const formData = new FormData();
-        formData.append('image', imageBlob, 'snapshot.jpg');
-
+        const skipped = skippedCount;
+        skippedCount = 0;
         try {
             const response = await fetch(`/emotion/detect/`, {
                 method: 'POST',
                 headers: {
-                    'X-CSRFToken': getCookie('csrftoken')  // CSRF Token
+                    'X-CSRFToken': getCookie('csrftoken'),  // CSRF Token
+                    'Content-Type': 'image/jpeg',
+                    'X-Emotion-Skipped': String(skipped)  // 預檢略過的張數
                 },
-                body: formData // Content-Type 為 multipart/form-data
+                body: imageBlob // 直接送出 JPEG，不包 multipart
             });
 
             let data;
@@ -68,6 +162,10 @@ document.addEventListener("DOMContentLoaded", () => {
                 return;
             }
 
+            if (data.next_interval_ms) {
+                nextIntervalMs = data.next_interval_ms;
+            }
+
             if (!response.ok) {
                 console.warn(`API Error: ${response.status}`, data.error);
                 return;
@@ -89,7 +187,7 @@ document.addEventListener("DOMContentLoaded", () => {
         }
 
         // 信心分數低於門檻不更新
-        if (data.confidence < CONFIDENCE_THRESHOLD) {
+        if (data.confidence < config.confidence_threshold) {
             console.log(`Confidence too low: ${data.confidence} (Ignored)`);
             return;
         }
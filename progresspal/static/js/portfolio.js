@@ -0,0 +1,60 @@
+// 學習歷程：提問紀錄分頁載入（keyset 分頁，每次取一頁）
+document.addEventListener("DOMContentLoaded", () => {
+    const tbody = document.getElementById('questionLogBody');
+    const loadMoreButton = document.getElementById('loadMoreQuestions');
+    if (!tbody) return; // 尚無紀錄
+
+    let nextCursor = null;
+    let loading = false;
+
+    function formatTime(iso) {
+        const d = new Date(iso);
+        const pad = (n) => String(n).padStart(2, '0');
+        return `${d.getFullYear()}-${pad(d.getMonth() + 1)}-${pad(d.getDate())} ${pad(d.getHours())}:${pad(d.getMinutes())}`;
+    }
+
+    function appendRow(log) {
+        const row = document.createElement('tr');
+        const cells = [
+            log.chapter_code,
+            log.unit_code,
+            log.question,
+            log.answer || "（尚無回覆）",
+            formatTime(log.created_at)
+        ];
+        for (const value of cells) {
+            const cell = document.createElement('td');
+            cell.textContent = value ?? ''; // 以文字顯示，不解析 HTML
+            row.appendChild(cell);
+        }
+        tbody.appendChild(row);
+    }
+
+    async function loadPage() {
+        if (loading) return;
+        loading = true;
+        loadMoreButton.disabled = true;
+
+        const params = new URLSearchParams({ username: tbody.dataset.username });
+        if (nextCursor) params.set('cursor', nextCursor);
+        try {
+            const response = await fetch(`${tbody.dataset.url}?${params}`);
+            const data = await response.json();
+            if (!response.ok) {
+                console.warn(`API Error: ${response.status}`, data.error);
+                return;
+            }
+            data.results.forEach(appendRow);
+            nextCursor = data.next;
+        } catch (error) {
+            console.error("無法載入提問紀錄:", error);
+        } finally {
+            loading = false;
+            loadMoreButton.disabled = false;
+            loadMoreButton.style.display = nextCursor ? '' : 'none';
+        }
+    }
+
+    loadMoreButton.addEventListener('click', loadPage);
+    loadPage();
+});